@@ -137,6 +137,7 @@ INSTALLED_APPS = [
     'dashboard',  # Added dashboard app
     'timetable',  # Added timetable app
     'attendancerecord',  # Added attendance record app
+    'admission',  # Rush-mode admission queues
 ]
 
 MIDDLEWARE = [
@@ -354,4 +355,26 @@ LOGGING = {
             'propagate': True,
         },
     },
-} 
\ No newline at end of file
+} 
+# Timetable generation: parallel solver runs (default: one worker per CPU core)
+TIMETABLE_SOLVER_WORKERS = int(os.environ.get('TIMETABLE_SOLVER_WORKERS', 0)) or None
+TIMETABLE_PORTFOLIO_RUNS = int(os.environ.get('TIMETABLE_PORTFOLIO_RUNS', 0)) or None
+# Run queued generation jobs on a thread of the web process; set to False when
+# a separate `manage.py run_generation_worker` process drains the queue
+TIMETABLE_GENERATION_IN_PROCESS = os.environ.get('TIMETABLE_GENERATION_IN_PROCESS', 'True').lower() == 'true'
+# Rush mode: comma-separated admission queues (slot_preference, student_course) whose
+# requests are queued and answered with a ticket instead of being run right away
+RUSH_MODE_QUEUES = [q.strip() for q in os.environ.get('RUSH_MODE_QUEUES', '').split(',') if q.strip()]
+# Worker threads per web process running queued tickets; set RUSH_IN_PROCESS to False
+# when separate `manage.py run_admission_worker` processes drain the queues
+RUSH_WORKERS = int(os.environ.get('RUSH_WORKERS', 4))
+RUSH_IN_PROCESS = os.environ.get('RUSH_IN_PROCESS', 'True').lower() == 'true'
+# Hold ticket event streams open until the ticket finishes. Only for gevent or async
+# workers: on sync workers every open stream ties up a whole worker, so by default a
+# stream sends the current status and ends, and the client reconnects (polling)
+ADMISSION_STREAM_HOLD = os.environ.get('ADMISSION_STREAM_HOLD', 'False').lower() == 'true'
+# Refresh stale dashboard snapshots on a thread of the web process; set to False when
+# `manage.py refresh_dashboard_snapshots --stale` runs on a schedule instead
+DASHBOARD_REFRESH_IN_PROCESS = os.environ.get('DASHBOARD_REFRESH_IN_PROCESS', 'True').lower() == 'true'
+# Password checks running at once per process during login; more wait for a free thread
+LOGIN_HASH_WORKERS = int(os.environ.get('LOGIN_HASH_WORKERS', 4))
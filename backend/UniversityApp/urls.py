@@ -59,6 +59,7 @@ api_urlpatterns = [
     path('dashboard/', include('dashboard.urls')),
     path('timetable/', include('timetable.urls')),
     path('attendance/', include('attendancerecord.urls')),
+    path('admission/', include('admission.urls')),
     path('import/<str:resource_name>/', ImportDataView.as_view(), name="import-resource"),
     # Health check endpoint
     path('health/', health_check, name='health_check'),
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from unfold.admin import ModelAdmin
+
+from .models import AdmissionTicket
+
+
+@admin.register(AdmissionTicket)
+class AdmissionTicketAdmin(ModelAdmin):
+    list_display = ('id', 'queue', 'user', 'status', 'response_status', 'created_at', 'completed_at')
+    list_filter = ('queue', 'status')
+    search_fields = ('user__email',)
+    readonly_fields = ('payload', 'response', 'created_at', 'started_at', 'heartbeat_at', 'completed_at')
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class AdmissionConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'admission'
+    verbose_name = 'Rush Admission'
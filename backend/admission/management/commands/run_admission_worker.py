@@ -0,0 +1,30 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from admission.tickets import purge_tickets, run_pending_tickets
+
+
+class Command(BaseCommand):
+    help = 'Runs queued rush-mode admission tickets with a pool of workers; polls for new ones unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tickets run at the same time')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds between queue polls')
+        parser.add_argument('--purge-days', type=int, help='Delete finished tickets older than this many days first')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {purge_tickets(options["purge_days"])} finished tickets'))
+
+        self.stdout.write(self.style.WARNING('Waiting for admission tickets...'))
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                ran = sum(pool.map(lambda _: run_pending_tickets(), range(options['workers'])))
+                if ran:
+                    self.stdout.write(self.style.SUCCESS(f'Ran {ran} admission ticket(s)'))
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
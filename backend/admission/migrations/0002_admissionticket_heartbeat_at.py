@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admission', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='admissionticket',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class AdmissionTicket(models.Model):
+    """A request parked in a rush-mode queue, with its result once a worker has run it"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    queue = models.CharField("Queue", max_length=50)
+    user = models.ForeignKey('authentication.User', on_delete=models.CASCADE, related_name='admission_tickets')
+    payload = models.JSONField("Request Data", encoder=DjangoJSONEncoder)
+    status = models.CharField("Status", max_length=10, choices=STATUS_CHOICES, default='queued')
+    response_status = models.PositiveSmallIntegerField("Response Status", null=True, blank=True)
+    response = models.JSONField("Response Data", null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed while a worker runs the ticket; a running ticket not refreshed for a while is reclaimed
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Admission Ticket"
+        verbose_name_plural = "Admission Tickets"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'queue', 'id'], name='admission_ticket_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.queue} #{self.id} ({self.status})"
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from authentication.models import User
+
+from . import tickets
+from .models import AdmissionTicket
+
+
+def echo(user, data):
+    return {"user": user.email, "echo": data}, 201
+
+
+def refuse(user, data):
+    return {"error": "already enrolled"}, 400
+
+
+@mock.patch.dict(tickets.QUEUES, {'echo': 'admission.tests.echo', 'refuse': 'admission.tests.refuse'})
+class TicketClaimTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='s1@example.com', first_name='S', last_name='One', user_type='student',
+                                        password='x')
+
+    def enqueue(self, queue='echo', data=None):
+        with self.settings(RUSH_IN_PROCESS=False):
+            return tickets.enqueue(queue, self.user, data or {})
+
+    def make_stale(self, ticket):
+        AdmissionTicket.objects.filter(id=ticket.id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=tickets.STALE_SECONDS + 1)
+        )
+
+    def test_claims_a_users_tickets_in_order_and_runs_them(self):
+        first, second = self.enqueue(data={"n": 1}), self.enqueue(data={"n": 2})
+
+        claimed = tickets.claim_next_ticket()
+        self.assertEqual(claimed.id, first.id)
+        # The user's next ticket waits for the first one
+        self.assertIsNone(tickets.claim_next_ticket())
+
+        tickets.run_ticket(claimed)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.response_status), ('done', 201))
+        self.assertEqual(first.response, {"user": self.user.email, "echo": {"n": 1}})
+        self.assertEqual(tickets.claim_next_ticket().id, second.id)
+
+    def test_running_ticket_is_reclaimed_only_after_its_heartbeat_stops(self):
+        ticket = self.enqueue()
+        tickets.claim_next_ticket()
+        self.assertIsNone(tickets.claim_next_ticket())
+
+        self.make_stale(ticket)
+        self.assertEqual(tickets.claim_next_ticket().id, ticket.id)
+        self.assertIsNone(tickets.claim_next_ticket())
+
+    def test_run_that_lost_its_claim_does_not_overwrite_the_result(self):
+        ticket = self.enqueue()
+        slow = tickets.claim_next_ticket()
+        self.make_stale(ticket)
+        tickets.run_ticket(tickets.claim_next_ticket())
+
+        # The slow first run finishes late, seeing the enrollment the second run made
+        slow.queue = 'refuse'
+        tickets.run_ticket(slow)
+
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.status, ticket.response_status), ('done', 201))
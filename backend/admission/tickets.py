@@ -0,0 +1,236 @@
+"""
+Rush-mode admission queues.
+
+When a selection window opens, every teacher or student submits at once and
+the per-request database validation serializes them until requests time out.
+A view whose queue is listed in settings.RUSH_MODE_QUEUES parks the request
+as an AdmissionTicket instead and answers 202 with the ticket straight away;
+the client polls the ticket or follows it over server-sent events.
+
+AdmissionTicket rows are the queue. A pool of worker threads in the web
+process (or run_admission_worker processes) claims tickets oldest first with
+a conditional UPDATE and runs them through the same code as the synchronous
+path. A user's tickets are run one at a time, in the order they were sent.
+While a ticket runs, a lease keeper thread of the process refreshes its
+heartbeat_at; a running ticket whose heartbeat stopped (its worker died) is
+claimed and run again, and a run that lost its claim that way does not
+overwrite the result of the run that took over.
+Queues not listed in RUSH_MODE_QUEUES take the synchronous path as usual.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import AdmissionTicket
+
+logger = logging.getLogger(__name__)
+
+# Queue name -> handler(user, data) returning (response data, HTTP status)
+QUEUES = {
+    'slot_preference': 'slot.views.process_slot_preference_ticket',
+    'student_course': 'studentCourse.views.process_enrollment_ticket',
+}
+
+# Running tickets have their heartbeat refreshed this often ...
+HEARTBEAT_SECONDS = 10
+# ... and one not refreshed for this long is assumed lost with its worker
+STALE_SECONDS = 60
+# Idle workers stop after this long without tickets
+IDLE_SECONDS = 30
+
+_workers_lock = threading.Lock()
+_workers = set()
+_wakeup = threading.Event()
+
+# Ids of the tickets this process is running, for the lease keeper
+_leases_lock = threading.Lock()
+_leases = set()
+_keeper = None
+
+
+def rush_mode(queue):
+    return queue in getattr(settings, 'RUSH_MODE_QUEUES', ())
+
+
+def _request_data(data):
+    # Form posts arrive as a QueryDict
+    return data.dict() if hasattr(data, 'dict') else data
+
+
+def enqueue(queue, user, data):
+    ticket = AdmissionTicket.objects.create(queue=queue, user=user, payload=_request_data(data))
+    if getattr(settings, 'RUSH_IN_PROCESS', True):
+        start_workers()
+    return ticket
+
+
+def queue_position(ticket):
+    """Tickets of the same queue to be run before this one"""
+    if ticket.status != 'queued':
+        return 0
+    return AdmissionTicket.objects.filter(queue=ticket.queue, status='queued', id__lt=ticket.id).count()
+
+
+def ticket_data(ticket):
+    data = {
+        "ticket": ticket.id,
+        "queue": ticket.queue,
+        "status": ticket.status,
+        "position": queue_position(ticket),
+        "created_at": ticket.created_at,
+        "completed_at": ticket.completed_at,
+    }
+    if ticket.status in ('done', 'failed'):
+        data["result"] = {"status_code": ticket.response_status, "data": ticket.response}
+    return data
+
+
+def ticket_request(user):
+    """A stand-in request for serializers that look at the requesting user"""
+    request = Request(HttpRequest())
+    request.user = user
+    return request
+
+
+def enqueue_response(request, queue):
+    """Queue the request and answer 202 with the ticket to poll or stream"""
+    ticket = enqueue(queue, request.user, request.data)
+    data = ticket_data(ticket)
+    data["poll_url"] = reverse('admission-ticket', args=[ticket.id])
+    data["stream_url"] = reverse('admission-ticket-stream', args=[ticket.id])
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+def claim_next_ticket():
+    """Mark the oldest runnable ticket as running and return it, or None if there is none"""
+    stale = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    # Only a user's oldest unfinished ticket can run
+    earlier = AdmissionTicket.objects.filter(
+        user_id=OuterRef('user_id'), status__in=['queued', 'running'], id__lt=OuterRef('id')
+    )
+    candidates = AdmissionTicket.objects.filter(
+        Q(status='queued') | Q(status='running', heartbeat_at__lt=stale) |
+        Q(status='running', heartbeat_at__isnull=True, started_at__lt=stale),
+        queue__in=list(QUEUES)
+    ).exclude(Exists(earlier)).order_by('id')
+    for ticket_id, ticket_status, started_at in candidates.values_list('id', 'status', 'started_at')[:20]:
+        now = timezone.now()
+        claimed = AdmissionTicket.objects.filter(
+            id=ticket_id, status=ticket_status, started_at=started_at
+        ).update(status='running', started_at=now, heartbeat_at=now)
+        if claimed:
+            if ticket_status == 'running':
+                logger.warning(f"Admission ticket {ticket_id} lost its worker; running it again")
+            return AdmissionTicket.objects.select_related('user').get(id=ticket_id)
+    return None
+
+
+def _keep_leases():
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _leases_lock:
+            ticket_ids = list(_leases)
+        if not ticket_ids:
+            continue
+        try:
+            AdmissionTicket.objects.filter(id__in=ticket_ids, status='running').update(heartbeat_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Admission ticket heartbeat failed: {str(e)}", exc_info=True)
+        finally:
+            close_old_connections()
+
+
+def _start_keeper():
+    global _keeper
+    with _leases_lock:
+        if _keeper is None:
+            _keeper = threading.Thread(target=_keep_leases, name='admission-leases', daemon=True)
+            _keeper.start()
+
+
+def run_ticket(ticket):
+    _start_keeper()
+    with _leases_lock:
+        _leases.add(ticket.id)
+    try:
+        data, status_code = import_string(QUEUES[ticket.queue])(ticket.user, ticket.payload)
+        ticket.status = 'done'
+    except Exception as e:
+        logger.error(f"Admission ticket {ticket.id} crashed: {str(e)}", exc_info=True)
+        data, status_code = {"error": "The request could not be processed."}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        ticket.status = 'failed'
+    finally:
+        with _leases_lock:
+            _leases.discard(ticket.id)
+    ticket.response = data
+    ticket.response_status = status_code
+    ticket.completed_at = timezone.now()
+    # Only while still holding the claim: a run that took over the ticket owns its result
+    saved = AdmissionTicket.objects.filter(id=ticket.id, status='running', started_at=ticket.started_at).update(
+        status=ticket.status, response=data, response_status=status_code, completed_at=ticket.completed_at
+    )
+    if not saved:
+        logger.warning(f"Admission ticket {ticket.id} was taken over by another worker; result dropped")
+    return ticket
+
+
+def run_pending_tickets(limit=None):
+    """Run tickets until none is runnable (or limit ran); returns how many ran"""
+    count = 0
+    while limit is None or count < limit:
+        ticket = claim_next_ticket()
+        if ticket is None:
+            break
+        run_ticket(ticket)
+        count += 1
+    return count
+
+
+def _work():
+    me = threading.current_thread()
+    while True:
+        _wakeup.clear()
+        try:
+            if run_pending_tickets():
+                continue
+        except Exception as e:
+            logger.error(f"Admission worker failed: {str(e)}", exc_info=True)
+        if _wakeup.wait(IDLE_SECONDS):
+            continue
+        with _workers_lock:
+            # A ticket queued while giving up gets picked up here
+            if _wakeup.is_set():
+                continue
+            _workers.discard(me)
+        close_old_connections()
+        return
+
+
+def start_workers():
+    """Wake the worker threads of this process, starting up to settings.RUSH_WORKERS of them"""
+    with _workers_lock:
+        _wakeup.set()
+        while len(_workers) < getattr(settings, 'RUSH_WORKERS', 4):
+            worker = threading.Thread(target=_work, name=f'admission-{len(_workers)}', daemon=True)
+            _workers.add(worker)
+            worker.start()
+
+
+def purge_tickets(days):
+    """Delete finished tickets older than this many days; returns how many were deleted"""
+    deleted, _ = AdmissionTicket.objects.filter(
+        status__in=['done', 'failed'], completed_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
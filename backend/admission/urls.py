@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('tickets/<int:pk>/', views.AdmissionTicketView.as_view(), name="admission-ticket"),
+    path('tickets/<int:pk>/stream/', views.AdmissionTicketStreamView.as_view(), name="admission-ticket-stream"),
+]
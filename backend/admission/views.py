@@ -0,0 +1,85 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authentication.authentication import JWTCookieAuthentication
+from .models import AdmissionTicket
+from .tickets import ticket_data
+
+# Server-sent event streams check the ticket this often and give up after this long
+STREAM_INTERVAL = 0.5
+STREAM_TIMEOUT = 120
+# Unless settings.ADMISSION_STREAM_HOLD is set, a stream sends the current status and
+# ends, and the client's EventSource reconnects after this many milliseconds
+STREAM_RETRY_MS = 2000
+
+
+def _get_ticket(request, pk):
+    tickets = AdmissionTicket.objects.all()
+    if not request.user.is_superuser:
+        tickets = tickets.filter(user=request.user)
+    return tickets.filter(pk=pk).first()
+
+
+class AdmissionTicketView(APIView):
+    """Status of a rush-mode ticket, with the response once it has been run"""
+    authentication_classes = [JWTCookieAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        ticket = _get_ticket(request, pk)
+        if ticket is None:
+            return Response({"error": "Ticket not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ticket_data(ticket))
+
+
+class AdmissionTicketStreamView(APIView):
+    """
+    Server-sent events with the ticket's status and position, ending with its result.
+    An open stream ties up a sync worker, so streams are only held open when
+    settings.ADMISSION_STREAM_HOLD says the workers are gevent or async ones.
+    """
+    authentication_classes = [JWTCookieAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        ticket = _get_ticket(request, pk)
+        if ticket is None:
+            return Response({"error": "Ticket not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(self._events(ticket.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _events(self, ticket_id):
+        hold = getattr(settings, 'ADMISSION_STREAM_HOLD', False)
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        last = None
+        try:
+            if not hold:
+                yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while True:
+                ticket = AdmissionTicket.objects.get(id=ticket_id)
+                data = ticket_data(ticket)
+                finished = ticket.status in ('done', 'failed')
+                if data != last:
+                    event = 'result' if finished else 'status'
+                    yield f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+                    last = data
+                if finished or not hold:
+                    return
+                if time.monotonic() > deadline:
+                    yield "event: timeout\ndata: {}\n\n"
+                    return
+                time.sleep(STREAM_INTERVAL)
+        finally:
+            close_old_connections()
@@ -1,6 +1,7 @@
 from django.conf import settings
 from rest_framework import authentication, exceptions, permissions
 from .models import User
+from .tokens import token_user
 import jwt
 
 class IsAuthenticated(authentication.BaseAuthentication):
@@ -23,14 +24,12 @@ class IsAuthenticated(authentication.BaseAuthentication):
             except:
                 raise exceptions.AuthenticationFailed('Authentication Failed')
                 
-            email = payload['id']
-
             try:
-                user = User.objects.get(email=email)
+                user = token_user(payload)
             except User.DoesNotExist:
                 raise exceptions.AuthenticationFailed('Authentication Failed')
 
-            return (user, None)
+            return (user, payload)
         except:
             raise exceptions.AuthenticationFailed('Authentication Failed')
             
@@ -64,9 +63,8 @@ class JWTCookieAuthentication(authentication.BaseAuthentication):
             
         try:
             payload = jwt.decode(token, settings.JWT_KEY, algorithms=['HS256'])
-            email = payload['id']
-            user = User.objects.get(email=email)
-            return (user, None)
+            user = token_user(payload)
+            return (user, payload)
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Token expired')
         except jwt.InvalidTokenError:
@@ -84,11 +82,10 @@ class CheckAuthentication(authentication.BaseAuthentication):
                 payload = jwt.decode(token, settings.JWT_KEY, 'HS256')
             except jwt.ExpiredSignatureError:
                 return (None, None)
-            email=payload['id']
             try:
-                user = User.objects.get(email=email)
+                user = token_user(payload)
             except User.DoesNotExist:
                 return (None, None)
-            return (user, None)
+            return (user, payload)
         except:
             return (None, None)
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Blocked student emails, checked in memory.
+
+Login used to ask the database whether the email is blocked, on every
+attempt. Each process keeps the blocked emails as a set instead, and checks
+the BlockedStudentsVersion counter at most every CHECK_SECONDS to know when
+to reload it; signals (authentication/signals.py) bump the counter inside the
+transaction of every BlockedStudents change and drop this process's set.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import BlockedStudents, BlockedStudentsVersion
+
+CHECK_SECONDS = 5
+
+_lock = threading.Lock()
+_emails = None
+_version = None
+_checked_at = 0.0
+
+
+def blocked_version():
+    return BlockedStudentsVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def blocked_emails():
+    """The set of blocked emails, reloaded when the version counter moved"""
+    global _emails, _version, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _emails is not None and now - _checked_at < CHECK_SECONDS:
+            return _emails
+        emails, version = _emails, _version
+    current = blocked_version()
+    if emails is None or current != version:
+        # Read after the version, so a change in between is reloaded on the next check
+        emails = frozenset(BlockedStudents.objects.values_list('email', flat=True))
+    with _lock:
+        _emails, _version, _checked_at = emails, current, now
+    return emails
+
+
+def is_blocked(email):
+    return email in blocked_emails()
+
+
+def forget_blocked():
+    global _emails
+    with _lock:
+        _emails = None
+
+
+def bump_blocked_version():
+    """Tell every process to reload the blocked emails"""
+    counter = BlockedStudentsVersion.objects.filter(pk=1)
+    if not counter.update(version=F('version') + 1):
+        _, created = BlockedStudentsVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        if not created:
+            counter.update(version=F('version') + 1)
+    transaction.on_commit(forget_blocked)
@@ -0,0 +1,172 @@
+"""
+Who the requesting user is, resolved once.
+
+Views used to work out the caller with queries of their own on every request
+-- Department.objects.get(hod_id=user), Teacher.objects.get(teacher_id=user),
+get_user_department() -- often several times in one request. get_caller()
+resolves the user's teacher and student profiles and the department they are
+HOD of once per request, and keeps the rows for CALLER_TTL seconds in a small
+per-process LRU keyed by user, so later requests skip the queries as well.
+
+Every request gets its own model instances, rebuilt from the cached field
+values, so views can use them like freshly fetched ones. Signals
+(authentication/signals.py) drop the entries a User, Teacher, Student or
+Department change affects in this process; other processes see the change
+within CALLER_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import DEFAULT_DB_ALIAS
+
+from department.models import Department
+from student.models import Student
+from teacher.models import Teacher
+
+CALLER_TTL = 60
+CALLER_CACHE_SIZE = 2048
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+# Bumped by forget_callers(), so rows loaded before a change are not cached after it
+_generation = 0
+
+
+class Caller:
+    """The requesting user with their teacher and student profiles and HOD department, if any"""
+
+    def __init__(self, user, teacher=None, student=None, hod_department=None):
+        self.user = user
+        self.teacher = teacher
+        self.student = student
+        self.hod_department = hod_department
+
+    @property
+    def is_hod(self):
+        return self.hod_department is not None
+
+    @property
+    def role(self):
+        """The teacher role for teachers, the user type otherwise"""
+        return self.teacher.teacher_role if self.teacher else getattr(self.user, 'user_type', None)
+
+    @property
+    def department(self):
+        """The department the user belongs to as a teacher or as a student"""
+        user_type = getattr(self.user, 'user_type', None)
+        if user_type == 'teacher' and self.teacher:
+            return self.teacher.dept_id
+        if user_type == 'student' and self.student:
+            return self.student.dept_id
+        return None
+
+    @property
+    def department_id(self):
+        department = self.department
+        return department.id if department else None
+
+    def get_hod_department(self):
+        """The department the user is HOD of; raises Department.DoesNotExist like a get()"""
+        if self.hod_department is None:
+            raise Department.DoesNotExist("The user is not the HOD of any department.")
+        return self.hod_department
+
+    def get_student(self):
+        """The user's student profile; raises Student.DoesNotExist like a get()"""
+        if self.student is None:
+            raise Student.DoesNotExist("The user has no student profile.")
+        return self.student
+
+    def get_teacher(self):
+        """The user's teacher profile; raises Teacher.DoesNotExist like a get()"""
+        if self.teacher is None:
+            raise Teacher.DoesNotExist("The user has no teacher profile.")
+        return self.teacher
+
+
+def _values(instance):
+    if instance is None:
+        return None
+    return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+
+def _instance(model, values):
+    if values is None:
+        return None
+    return model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in model._meta.concrete_fields], values)
+
+
+def _load(user):
+    """Field values of the user's profiles and HOD department, in one or two queries"""
+    teacher = student = hod_department = None
+    if user.user_type == 'student':
+        student = Student.objects.select_related('dept_id').filter(student_id=user).order_by('id').first()
+    else:
+        teacher = Teacher.objects.select_related('dept_id').filter(teacher_id=user).order_by('id').first()
+        hod_department = Department.objects.filter(hod_id=user).order_by('id').first()
+    return {
+        'teacher': _values(teacher),
+        'teacher_dept': _values(teacher.dept_id) if teacher else None,
+        'student': _values(student),
+        'student_dept': _values(student.dept_id) if student else None,
+        'hod_department': _values(hod_department),
+    }
+
+
+def _entry(user):
+    now = time.monotonic()
+    key = (user.pk, user.user_type)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(key)
+            return entry[1]
+        generation = _generation
+    rows = _load(user)
+    with _lock:
+        if generation != _generation:
+            return rows
+        _entries[key] = (now + CALLER_TTL, rows)
+        _entries.move_to_end(key)
+        while len(_entries) > CALLER_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return rows
+
+
+def caller_for_user(user):
+    """A Caller for the user, from the cache when it is fresh"""
+    if user is None or not user.is_authenticated:
+        return Caller(user)
+    rows = _entry(user)
+    teacher = _instance(Teacher, rows['teacher'])
+    if teacher is not None:
+        teacher.teacher_id = user
+        teacher.dept_id = _instance(Department, rows['teacher_dept'])
+    student = _instance(Student, rows['student'])
+    if student is not None:
+        student.student_id = user
+        student.dept_id = _instance(Department, rows['student_dept'])
+    return Caller(user, teacher, student, _instance(Department, rows['hod_department']))
+
+
+def get_caller(request):
+    """The Caller of the request, resolved once per request"""
+    caller = getattr(request, '_caller', None)
+    if caller is None or caller.user is not request.user:
+        caller = caller_for_user(request.user)
+        request._caller = caller
+    return caller
+
+
+def forget_callers(user_ids=None):
+    """Drop the cached entries of these users (all of them if None) in this process"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if user_ids is None:
+            _entries.clear()
+            return
+        user_ids = set(user_ids)
+        for key in [key for key in _entries if key[0] in user_ids]:
+            del _entries[key]
@@ -2,16 +2,13 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.hashers import make_password
-from django.utils import timezone
 from django.conf import settings
 from django.utils.crypto import get_random_string
 from rest_framework import status
 from rest_framework.response import Response
-from teacher.models import Teacher
 from django.core.exceptions import ValidationError
 # from .utils import send_email
 import uuid
-import jwt
 
 # Create your models here.
 class UserManager(BaseUserManager):
@@ -94,26 +91,16 @@ class User(AbstractUser):
         return f'{self.first_name}'
     
     def generate_login_response(self):
-        payload = {
-            'id': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'exp': timezone.now() + timezone.timedelta(days=30),
-            'iat': timezone.now()
-        }
-        
-        token = jwt.encode(
-            payload=payload,
-            key=settings.JWT_KEY,
-            algorithm='HS256'
-        )
+        from .caller import caller_for_user
+        from .tokens import issue_token
+
+        token = issue_token(self)
         
         user_type = 'student'
         if self.user_type == 'teacher':
-            try:
-                user_type = Teacher.objects.get(teacher_id=self.email).teacher_role
-            except Exception as E:
-                print(E)
+            teacher = caller_for_user(self).teacher
+            if teacher:
+                user_type = teacher.teacher_role
         
         response = Response({
             'id': self.email,
@@ -160,4 +147,8 @@ class BlockedStudents(models.Model):
     email = models.CharField(unique=True, blank=False, max_length=200)
     name = models.CharField(max_length=200, blank=False)
     dept = models.CharField(max_length=50, blank=False)
-    year = models.IntegerField(blank=False)
\ No newline at end of file
+    year = models.IntegerField(blank=False)
+
+class BlockedStudentsVersion(models.Model):
+    """Bumped on every BlockedStudents change, so each process knows to reload its blocked emails"""
+    version = models.PositiveBigIntegerField(default=0)
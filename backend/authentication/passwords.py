@@ -0,0 +1,57 @@
+"""
+Password checks on a bounded pool of threads.
+
+A PBKDF2 check costs tens of milliseconds of CPU. Under gevent workers the
+greenlet running it holds up every other request of the worker, so a login
+storm freezes the whole site. verify_password() hashes on a pool of at most
+LOGIN_HASH_WORKERS real threads per process (hashlib releases the GIL while
+hashing) and waits for the result cooperatively; further checks queue. The
+pool is gevent's when threading is monkey-patched, a ThreadPoolExecutor
+otherwise. Only the hashing runs there: the user is read, and an outdated
+hash rewritten, on the request's own thread and database connection.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def _run(fn, *args):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            size = getattr(settings, 'LOGIN_HASH_WORKERS', 4)
+            if _gevent_patched():
+                from gevent.threadpool import ThreadPool
+                _pool = ThreadPool(size)
+            else:
+                _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix='password-hash')
+    if isinstance(_pool, ThreadPoolExecutor):
+        return _pool.submit(fn, *args).result()
+    return _pool.spawn(fn, *args).get()
+
+
+def verify_password(user, password):
+    """user.check_password(password), hashing on the pool; False for no user"""
+    if user is None:
+        # Hash anyway, so the response time does not tell which emails have accounts
+        _run(make_password, password)
+        return False
+    if not _run(check_password, password, user.password):
+        return False
+    if identify_hasher(user.password).must_update(user.password):
+        user.password = _run(make_password, password)
+        user.save(update_fields=['password'])
+    return True
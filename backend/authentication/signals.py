@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from department.models import Department
+from student.models import Student
+from teacher.models import Teacher
+from .blocklist import bump_blocked_version
+from .caller import forget_callers
+from .models import BlockedStudents, User
+from .tokens import forget_tokens
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_callers([instance.pk])
+    # A changed password or deactivation revokes the user's tokens
+    forget_tokens([instance.pk])
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def teacher_changed(sender, instance, **kwargs):
+    # The profile may have moved from another user
+    forget_callers([instance.teacher_id_id] if kwargs.get('created') else None)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    forget_callers([instance.student_id_id] if kwargs.get('created') else None)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def department_changed(sender, instance, **kwargs):
+    # Cached copies of the department are held by its HOD, teachers and students alike
+    forget_callers()
+
+
+@receiver(post_save, sender=BlockedStudents)
+@receiver(post_delete, sender=BlockedStudents)
+def blocked_students_changed(sender, instance, **kwargs):
+    bump_blocked_version()
@@ -0,0 +1,100 @@
+"""
+Login tokens and the users behind them.
+
+issue_token() signs a JWT with the user's email and name, a token id (jti)
+and the user's password version (pwv). Roles and departments are left out on
+purpose: they can change during the token's 30 days, so views resolve them
+through get_caller() (authentication/caller.py) instead. The authentication
+classes hand the verified claims to views as request.auth.
+
+token_user() keeps the users of recently seen tokens for USER_CACHE_TTL
+seconds in a bounded per-process LRU keyed by (jti, pwv), so most requests
+authenticate without touching the database. A miss loads the user and checks
+that they are still active and that their password has not changed since the
+token was issued; changing the password is what revokes a user's tokens. User
+saves and deletes drop the user's cached tokens in the process that made them
+(authentication/signals.py); other processes notice within USER_CACHE_TTL.
+Tokens issued before these claims existed are checked against the database on
+every request, as they used to be.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .caller import _instance, _values
+from .models import User
+
+TOKEN_DAYS = 30
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 4096
+
+_lock = threading.Lock()
+# (jti, pwv) -> (expires, email, user field values)
+_entries = OrderedDict()
+# Bumped by forget_tokens(), so users loaded before a change are not cached after it
+_generation = 0
+
+
+def password_version(user):
+    """Changes whenever the user's password does"""
+    return user.get_session_auth_hash()[:16]
+
+
+def issue_token(user):
+    now = timezone.now()
+    payload = {
+        'id': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'jti': uuid.uuid4().hex,
+        'pwv': password_version(user),
+        'exp': now + timezone.timedelta(days=TOKEN_DAYS),
+        'iat': now,
+    }
+    return jwt.encode(payload=payload, key=settings.JWT_KEY, algorithm='HS256')
+
+
+def token_user(payload):
+    """The user a verified token was issued to; raises User.DoesNotExist if the token is revoked"""
+    jti, pwv = payload.get('jti'), payload.get('pwv')
+    if not jti or not pwv:
+        return User.objects.get(email=payload['id'])
+
+    key = (jti, pwv)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(key)
+            return _instance(User, entry[2])
+        generation = _generation
+
+    user = User.objects.get(email=payload['id'])
+    if not user.is_active or not constant_time_compare(password_version(user), pwv):
+        raise User.DoesNotExist("The token has been revoked.")
+    with _lock:
+        if generation == _generation:
+            _entries[key] = (now + USER_CACHE_TTL, user.email, _values(user))
+            _entries.move_to_end(key)
+            while len(_entries) > USER_CACHE_SIZE:
+                _entries.popitem(last=False)
+    return user
+
+
+def forget_tokens(emails=None):
+    """Drop the cached users of these emails (all of them if None) in this process"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if emails is None:
+            _entries.clear()
+            return
+        emails = set(emails)
+        for key in [key for key, entry in _entries.items() if entry[1] in emails]:
+            del _entries[key]
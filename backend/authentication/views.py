@@ -1,6 +1,5 @@
 from django.shortcuts import render, get_object_or_404
 from django.conf import settings
-from django.contrib.auth import authenticate
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework.views import APIView
@@ -11,6 +10,9 @@ from rest_framework import serializers
 from .models import *
 from .serializers import *
 from .authentication import IsAuthenticated
+from .blocklist import is_blocked
+from .caller import get_caller
+from .passwords import verify_password
 from student.models import Student
 from teacher.models import Teacher
 from department.models import Department
@@ -80,12 +82,11 @@ class LoginAPIView(generics.CreateAPIView):
                 'code': 'missing_credentials'
             }, status=status.HTTP_400_BAD_REQUEST)
             
-        user = authenticate(request, email=email, password=password)
-
+        account = User.objects.filter(email=email).first()
+        user = account if verify_password(account, password) and account.is_active else None
         
         if user:
-            is_blocked = BlockedStudents.objects.filter(email=email).exists()
-            if is_blocked:
+            if is_blocked(email):
                 return Response({
                     'detail': 'No account found with this email. If you think it\'s a mistake, please contact the admin.',
                     'code': 'user_not_found'
@@ -97,26 +98,15 @@ class LoginAPIView(generics.CreateAPIView):
                 }, status=status.HTTP_401_UNAUTHORIZED)
             return user.generate_login_response()
             
-        else:
-            try:
-                print("Hello Wiore", email)
-                user = User.objects.get(email=email)
-                print("User", user)
-                is_blocked = BlockedStudents.objects.filter(email=email).exists()
-                if is_blocked:
-                    return Response({
-                        'detail': 'No account found with this email. If you think it\'s a mistake, please contact the admin.',
-                        'code': 'user_not_found'
-                    }, status=status.HTTP_401_UNAUTHORIZED)
-                return Response({
-                    'detail': 'Invalid password. Please try again.',
-                    'code': 'invalid_password'
-                }, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({
-                    'detail': 'No account found with this email. If you think it\'s a mistake, please contact the admin.',
-                    'code': 'user_not_found'
-                }, status=status.HTTP_401_UNAUTHORIZED)
+        if account is None or is_blocked(email):
+            return Response({
+                'detail': 'No account found with this email. If you think it\'s a mistake, please contact the admin.',
+                'code': 'user_not_found'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({
+            'detail': 'Invalid password. Please try again.',
+            'code': 'invalid_password'
+        }, status=status.HTTP_401_UNAUTHORIZED)
         
 class ProfileAPIView(generics.CreateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
@@ -145,7 +135,7 @@ class ProfileAPIView(generics.CreateAPIView):
 
         if user.user_type == 'student':
             try:
-                student = Student.objects.get(student_id=user)
+                student = get_caller(request).get_student()
                 student_data = {
                     "id": student.id,
                     "batch": student.batch,
@@ -166,7 +156,7 @@ class ProfileAPIView(generics.CreateAPIView):
         
         elif user.user_type == 'teacher':
             try:
-                teacher = Teacher.objects.get(teacher_id=user)
+                teacher = get_caller(request).get_teacher()
                 teacher_data = {
                     "id": teacher.id,
                     "staff_code": teacher.staff_code,
@@ -225,7 +215,7 @@ class AuthStatusAPIView(APIView):
             # Add student info if applicable
             if request.user.user_type == 'student':
                 try:
-                    student = Student.objects.get(student_id=request.user)
+                    student = get_caller(request).get_student()
                     user_data['student_profile'] = {
                         'id': student.id,
                         'has_department': student.dept_id is not None,
@@ -4,6 +4,7 @@ from department.serializers import DepartmentSerializer
 from courseMaster.serializers import CourseMasterSerializer
 from slot.serializers import SlotSerializer
 from rooms.serializers import RoomSerializer
+from authentication.caller import get_caller
 
 class StudentCourseListSerializer(serializers.ModelSerializer):
     """A simplified serializer for student course selection with just the essential fields"""
@@ -213,8 +214,7 @@ class CourseSerializer(serializers.ModelSerializer):
         # Get user's department (if HOD)
         user_dept = None
         try:
-            from department.models import Department
-            user_dept = Department.objects.filter(hod_id=request.user).first()
+            user_dept = get_caller(request).hod_department
         except:
             pass
             
@@ -5,6 +5,7 @@ from authentication.authentication import IsAuthenticated
 from .models import Course, CourseResourceAllocation, CourseRoomPreference
 from teacherCourse.models import TeacherCourse
 from department.models import Department
+from authentication.caller import get_caller
 from django.db import models
 from rest_framework.views import APIView
 from django.core.exceptions import PermissionDenied
@@ -20,7 +21,7 @@ class AddNewCourse(generics.CreateAPIView):
 
     def post(self, request):
         try:
-            is_hod = Department.objects.filter(hod_id=request.user).exists()
+            is_hod = get_caller(request).is_hod
             
             if not is_hod:
                 return Response(
@@ -68,7 +69,7 @@ class CourseListView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             return Course.objects.filter(teaching_dept_id=hod_dept)
         except Department.DoesNotExist:
             return Course.objects.none()
@@ -82,7 +83,7 @@ class CourseListView(generics.ListCreateAPIView):
 
     def post(self, request, *args, **kwargs):
         try:
-            is_hod = Department.objects.filter(hod_id=request.user).exists()
+            is_hod = get_caller(request).is_hod
             
             if not is_hod:
                 return Response(
@@ -153,7 +154,7 @@ class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             # Get user's department (if HOD)
             user_dept = None
             try:
-                user_dept = Department.objects.get(hod_id=user)
+                user_dept = get_caller(self.request).get_hod_department()
             except Department.DoesNotExist:
                 pass
             
@@ -205,7 +206,7 @@ class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             # Get relationship type for the user's perspective
             user_dept = None
             try:
-                user_dept = Department.objects.get(hod_id=request.user)
+                user_dept = get_caller(request).get_hod_department()
             except Department.DoesNotExist:
                 pass
             
@@ -249,7 +250,7 @@ class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             instance = self.get_object()
             user_dept = None
             try:
-                user_dept = Department.objects.get(hod_id=request.user)
+                user_dept = get_caller(request).get_hod_department()
             except Department.DoesNotExist:
                 pass
             
@@ -329,7 +330,7 @@ class CourseResourceAllocationListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         try:
-            user_dept = Department.objects.get(hod_id=user)
+            user_dept = get_caller(self.request).get_hod_department()
             # Return allocations where the user's department is either the original or the teaching department
             return CourseResourceAllocation.objects.filter(
                 models.Q(original_dept_id=user_dept) | 
@@ -344,7 +345,7 @@ class CourseResourceAllocationListCreateView(generics.ListCreateAPIView):
         # Get the user's department
         user_dept = None
         try:
-            user_dept = Department.objects.get(hod_id=request.user)
+            user_dept = get_caller(request).get_hod_department()
         except Department.DoesNotExist:
             return Response(
                 {
@@ -385,7 +386,7 @@ class CourseResourceAllocationListCreateView(generics.ListCreateAPIView):
             # Check if user is an HOD
             user_dept = None
             try:
-                user_dept = Department.objects.get(hod_id=request.user)
+                user_dept = get_caller(request).get_hod_department()
             except Department.DoesNotExist:
                 return Response(
                     {
@@ -503,7 +504,7 @@ class CourseResourceAllocationDetailView(generics.RetrieveUpdateDestroyAPIView):
             user = self.request.user
             user_dept = None
             try:
-                user_dept = Department.objects.get(hod_id=user)
+                user_dept = get_caller(self.request).get_hod_department()
             except Department.DoesNotExist:
                 self.permission_denied(
                     self.request,
@@ -584,7 +585,7 @@ class CourseResourceAllocationDetailView(generics.RetrieveUpdateDestroyAPIView):
             allocation = self.get_object()
             
             # Get user department
-            user_dept = Department.objects.get(hod_id=request.user)
+            user_dept = get_caller(request).get_hod_department()
             
             # If teaching department is updating status
             if user_dept.id == allocation.teaching_dept_id.id and 'status' in request.data:
@@ -687,7 +688,7 @@ class CourseRoomPreferenceListCreateView(generics.ListCreateAPIView):
             
             # Check if user is HOD of any department
             try:
-                hod_dept = Department.objects.get(hod_id=self.request.user)
+                hod_dept = get_caller(self.request).get_hod_department()
                 user_dept = hod_dept
             except Department.DoesNotExist:
                 # Check if user is a teacher
@@ -814,7 +815,7 @@ class CourseRoomPreferenceDetailView(generics.RetrieveUpdateDestroyAPIView):
             
             # Check if user is HOD of any department
             try:
-                hod_dept = Department.objects.get(hod_id=self.request.user)
+                hod_dept = get_caller(self.request).get_hod_department()
                 user_dept = hod_dept
             except Department.DoesNotExist:
                 # Check if user is a teacher
@@ -1053,7 +1054,7 @@ class CourseNotification(APIView):
 
     def get(self, req):
         try:
-            teacher = Teacher.objects.get(teacher_id=req.user)
+            teacher = get_caller(req).get_teacher()
             teacher_dept = teacher.dept_id
             
             # Get all courses where the department is involved (as owner, teacher, or for_dept)
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from unfold.admin import ModelAdmin
 
-# Register your models here.
+from .models import DashboardSnapshot
+
+
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(ModelAdmin):
+    list_display = ('scope', 'department', 'stale', 'refreshed_at')
+    list_filter = ('stale',)
+    readonly_fields = ('stats', 'refreshed_at')
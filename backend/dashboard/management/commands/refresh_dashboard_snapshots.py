@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.snapshots import refresh_snapshot, refresh_stale_snapshots
+from department.models import Department
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored dashboard statistics of every department and of the whole campus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dept', type=int, action='append', dest='dept_ids',
+                            help='Department id to refresh (repeatable, default all and the campus)')
+        parser.add_argument('--stale', action='store_true', help='Only refresh the snapshots flagged as stale')
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            count = refresh_stale_snapshots()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {count} stale dashboard snapshots'))
+            return
+
+        departments = Department.objects.order_by('id')
+        if options['dept_ids']:
+            departments = departments.filter(id__in=options['dept_ids'])
+        count = 0
+        for department in departments:
+            refresh_snapshot(department)
+            count += 1
+        if not options['dept_ids']:
+            refresh_snapshot()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} dashboard snapshots'))
@@ -1,3 +1,19 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class DashboardSnapshot(models.Model):
+    """Stored dashboard_stats of one department, or of the whole campus (no department)"""
+    scope = models.CharField("Scope", max_length=20, unique=True)
+    department = models.OneToOneField('department.Department', on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='dashboard_snapshot')
+    stats = models.JSONField("Statistics", default=dict, encoder=DjangoJSONEncoder)
+    stale = models.BooleanField("Stale", default=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Dashboard Snapshot"
+        verbose_name_plural = "Dashboard Snapshots"
+    
+    def __str__(self):
+        return f"Dashboard snapshot {self.scope}{' (stale)' if self.stale else ''}"
@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from course.models import Course, CourseRoomPreference
+from courseMaster.models import CourseMaster
+from student.models import Student
+from teacher.models import Teacher
+from teacherCourse.models import TeacherCourse
+from studentCourse.models import StudentCourse
+from slot.models import TeacherSlotAssignment
+from slot.signals import assignments_bulk_changed
+from .snapshots import mark_stale
+
+
+def _course_dept(instance, field):
+    """for_dept id of the instance's course, without a query when the course is loaded"""
+    descriptor = getattr(type(instance), field)
+    course_id = getattr(instance, descriptor.field.attname)
+    if course_id is None:
+        return None
+    if descriptor.is_cached(instance):
+        return getattr(instance, field).for_dept_id_id
+    return Course.objects.filter(id=course_id).values_list('for_dept_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=CourseMaster)
+@receiver(post_delete, sender=CourseMaster)
+def stats_changed_everywhere(sender, instance, raw=False, **kwargs):
+    # The department it left is not known, and deletes cascade to other departments' rows
+    if not raw:
+        mark_stale()
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def campus_stats_changed(sender, instance, raw=False, **kwargs):
+    # Students only count towards the campus statistics
+    if not raw:
+        mark_stale([])
+
+
+@receiver(post_save, sender=TeacherCourse)
+@receiver(post_delete, sender=TeacherCourse)
+@receiver(post_save, sender=StudentCourse)
+@receiver(post_delete, sender=StudentCourse)
+@receiver(post_save, sender=CourseRoomPreference)
+@receiver(post_delete, sender=CourseRoomPreference)
+def course_stats_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_stale([_course_dept(instance, 'course_id')])
+
+
+@receiver(post_save, sender=TeacherSlotAssignment)
+@receiver(post_delete, sender=TeacherSlotAssignment)
+def slot_stats_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if TeacherSlotAssignment.teacher.is_cached(instance):
+        dept_id = instance.teacher.dept_id_id
+    else:
+        dept_id = Teacher.objects.filter(id=instance.teacher_id).values_list('dept_id', flat=True).first()
+    mark_stale([dept_id])
+
+
+@receiver(assignments_bulk_changed)
+def slot_stats_bulk_changed(sender, dept_ids, **kwargs):
+    mark_stale(dept_ids)
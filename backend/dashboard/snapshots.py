@@ -0,0 +1,127 @@
+"""
+Stored dashboard statistics.
+
+A DashboardSnapshot row holds the dashboard_stats response of one department,
+and one more (scope 'campus') the campus-wide response, so the view answers
+with a single indexed read whatever the size of the enrollment and slot
+tables. Signals (dashboard/signals.py) mark the snapshots a change touches as
+stale once its transaction commits; a thread of the web process then
+recomputes the stale ones in the background, the way timetable generation
+jobs are drained. Stale snapshots keep being served until then.
+
+A refresh clears the stale flag before it computes, so a change committed
+while it runs flags the snapshot again rather than being lost. Snapshots are
+created on first use or by the refresh_dashboard_snapshots command.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import DashboardSnapshot
+from .stats import compute_stats
+
+logger = logging.getLogger(__name__)
+
+CAMPUS = 'campus'
+
+_worker_lock = threading.Lock()
+_worker = None
+_wakeup = threading.Event()
+
+
+def snapshot_scope(dept_id):
+    return str(dept_id) if dept_id is not None else CAMPUS
+
+
+def _refresh(snapshot, dept):
+    # The stale flag is already cleared
+    try:
+        stats = compute_stats(dept)
+    except Exception:
+        DashboardSnapshot.objects.filter(id=snapshot.id).update(stale=True)
+        raise
+    DashboardSnapshot.objects.filter(id=snapshot.id).update(stats=stats, refreshed_at=timezone.now())
+    return stats
+
+
+def refresh_snapshot(dept=None):
+    """Recompute and store the statistics of the department (the campus if None); returns them"""
+    snapshot, _ = DashboardSnapshot.objects.get_or_create(
+        scope=snapshot_scope(dept.id if dept else None), defaults={'department': dept}
+    )
+    DashboardSnapshot.objects.filter(id=snapshot.id).update(stale=False)
+    return _refresh(snapshot, dept)
+
+
+def snapshot_stats(dept=None, fresh=False):
+    """The stored statistics of the department (the campus if None), recomputed first if fresh"""
+    if not fresh:
+        snapshot = DashboardSnapshot.objects.filter(
+            scope=snapshot_scope(dept.id if dept else None)
+        ).only('stats', 'stale').first()
+        # Stats are empty until the first refresh of a snapshot finishes
+        if snapshot is not None and snapshot.stats:
+            if snapshot.stale and _in_process():
+                start_worker()
+            return snapshot.stats
+    return refresh_snapshot(dept)
+
+
+def _mark_stale(dept_ids):
+    snapshots = DashboardSnapshot.objects.filter(stale=False)
+    if dept_ids is not None:
+        snapshots = snapshots.filter(scope__in=[CAMPUS] + [snapshot_scope(d) for d in set(dept_ids) if d is not None])
+    if snapshots.update(stale=True) and _in_process():
+        start_worker()
+
+
+def mark_stale(dept_ids=None):
+    """Flag the snapshots of these departments (all of them if None) and of the campus, on commit"""
+    transaction.on_commit(lambda: _mark_stale(dept_ids))
+
+
+def refresh_stale_snapshots():
+    """Recompute every stale snapshot; returns how many were refreshed"""
+    count = 0
+    try:
+        for snapshot in DashboardSnapshot.objects.filter(stale=True).select_related('department').order_by('id'):
+            # Claimed with a conditional UPDATE, so concurrent workers refresh each snapshot once
+            if DashboardSnapshot.objects.filter(id=snapshot.id, stale=True).update(stale=False):
+                _refresh(snapshot, snapshot.department)
+                count += 1
+    finally:
+        close_old_connections()
+    return count
+
+
+def _in_process():
+    return getattr(settings, 'DASHBOARD_REFRESH_IN_PROCESS', True)
+
+
+def _drain():
+    global _worker
+    while True:
+        try:
+            refresh_stale_snapshots()
+        except Exception as e:
+            logger.error(f"Dashboard snapshot refresh failed: {str(e)}", exc_info=True)
+        with _worker_lock:
+            # Snapshots flagged while the last pass was running get refreshed here
+            if not _wakeup.is_set():
+                _worker = None
+                return
+            _wakeup.clear()
+
+
+def start_worker():
+    """Refresh stale snapshots on a background thread of this process, unless one is already doing it"""
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _wakeup.set()
+            return
+        _worker = threading.Thread(target=_drain, name='dashboard-snapshots', daemon=True)
+        _worker.start()
@@ -0,0 +1,157 @@
+"""
+Dashboard statistics with a handful of aggregate queries.
+
+compute_stats() answers what dashboard_stats returns for one department (or
+the whole campus) with conditional aggregation: one query each for courses,
+teachers, enrollments, teacher workload, slot assignments and days per
+teacher, whatever the number of teachers. The view serves the results stored
+in DashboardSnapshot rows (dashboard/snapshots.py) rather than calling it.
+"""
+from collections import Counter
+
+from django.db.models import Avg, Count, Exists, F, OuterRef, Q, Sum
+
+from course.models import Course, CourseRoomPreference
+from teacher.models import Teacher
+from student.models import Student
+from teacherCourse.models import TeacherCourse
+from studentCourse.models import StudentCourse
+from slot.models import Slot, TeacherSlotAssignment
+
+
+def _percentage(part, whole):
+    return round((part / whole) * 100, 1) if whole > 0 else 0
+
+
+def compute_stats(dept=None):
+    """Dashboard statistics of a department, or of the whole campus if dept is None"""
+    if dept:
+        courses = Course.objects.filter(for_dept_id=dept)
+        teachers = Teacher.objects.filter(dept_id=dept)
+        teacher_assignments = TeacherCourse.objects.filter(course_id__for_dept_id=dept)
+        slot_assignments = TeacherSlotAssignment.objects.filter(teacher__dept_id=dept)
+    else:
+        courses = Course.objects.all()
+        teachers = Teacher.objects.all()
+        teacher_assignments = TeacherCourse.objects.all()
+        slot_assignments = TeacherSlotAssignment.objects.all()
+
+    course_stats = courses.annotate(
+        has_teacher=Exists(TeacherCourse.objects.filter(course_id=OuterRef('pk'))),
+        has_room=Exists(CourseRoomPreference.objects.filter(course_id=OuterRef('pk'))),
+    ).aggregate(
+        total=Count('id'),
+        with_teachers=Count('id', filter=Q(has_teacher=True)),
+        with_rooms=Count('id', filter=Q(has_room=True)),
+    )
+    total_courses = course_stats['total']
+    courses_with_teachers = course_stats['with_teachers']
+    courses_with_rooms = course_stats['with_rooms']
+
+    teacher_stats = teachers.aggregate(
+        total=Count('id'),
+        industry=Count('id', filter=Q(is_industry_professional=True) | Q(teacher_role__in=['POP', 'Industry Professional'])),
+        senior=Count('id', filter=Q(teacher_role__in=['HOD', 'Professor'])),
+        resigning=Count('id', filter=Q(resignation_status='resigning')),
+        avg_hours=Avg('teacher_working_hours'),
+    )
+    total_teachers = teacher_stats['total']
+
+    if dept:
+        # Students enrolled in the department's courses
+        enrollment_stats = StudentCourse.objects.filter(course_id__for_dept_id=dept).aggregate(
+            total=Count('id'), students=Count('student_id', distinct=True)
+        )
+        total_students = enrollment_stats['students']
+        total_enrollments = enrollment_stats['total']
+    else:
+        total_students = Student.objects.count()
+        total_enrollments = StudentCourse.objects.count()
+
+    # Credits taught against working hours, per teacher with course assignments
+    workload = list(teacher_assignments.values('teacher_id').annotate(
+        total_hours=Sum('course_id__course_id__credits'),
+        working_hours=F('teacher_id__teacher_working_hours'),
+    ).values_list('total_hours', 'working_hours'))
+    teachers_with_courses = len(workload)
+    fully_loaded_teachers = sum(
+        1 for total_hours, working_hours in workload
+        if total_hours is not None and working_hours is not None and total_hours >= working_hours
+    )
+
+    slot_types = [slot_type for slot_type, _ in Slot.SLOT_TYPES]
+    slot_stats = slot_assignments.aggregate(
+        total=Count('id'),
+        teachers=Count('teacher', distinct=True),
+        **{f'type_{slot_type}': Count('teacher', distinct=True, filter=Q(slot__slot_type=slot_type))
+           for slot_type in slot_types},
+        **{f'day_{day}': Count('teacher', distinct=True, filter=Q(day_of_week=day))
+           for day, _ in TeacherSlotAssignment.DAYS_OF_WEEK},
+    )
+    days_per_teacher = Counter(slot_assignments.values('teacher').annotate(
+        days=Count('day_of_week', distinct=True)
+    ).values_list('days', flat=True))
+
+    teacher_assignment_percentage = _percentage(courses_with_teachers, total_courses)
+    room_assignment_percentage = _percentage(courses_with_rooms, total_courses)
+
+    return {
+        # Basic counts
+        'total_courses': total_courses,
+        'total_teachers': total_teachers,
+        'total_students': total_students,
+        'courses_with_teachers': courses_with_teachers,
+        'courses_with_rooms': courses_with_rooms,
+        'pending_assignments': total_courses - courses_with_teachers,
+
+        # Teacher statistics
+        'industry_professionals': teacher_stats['industry'],
+        'senior_staff': teacher_stats['senior'],
+        'resigning_teachers': teacher_stats['resigning'],
+        'teachers_with_courses': teachers_with_courses,
+        'teacher_utilization': _percentage(teachers_with_courses, total_teachers),
+
+        # Student statistics
+        'total_enrollments': total_enrollments,
+        'avg_students_per_course': round(total_enrollments / total_courses, 1) if total_courses > 0 else 0,
+
+        # Completion percentages
+        'teacher_assignment_percentage': teacher_assignment_percentage,
+        'room_assignment_percentage': room_assignment_percentage,
+        'overall_completion_percentage': round((teacher_assignment_percentage + room_assignment_percentage) / 2, 1),
+
+        # Workload metrics
+        'avg_working_hours': round(teacher_stats['avg_hours'] or 0, 1),
+        'fully_loaded_teachers': fully_loaded_teachers,
+        'underutilized_teachers': total_teachers - fully_loaded_teachers,
+        'workload_balance': _percentage(fully_loaded_teachers, total_teachers),
+
+        # Department info
+        'is_department_filtered': bool(dept),
+        'department_name': dept.dept_name if dept else None,
+
+        # Slot allocation summary
+        'slot_allocation': {
+            'total_slot_assignments': slot_stats['total'],
+            'teachers_with_slots': slot_stats['teachers'],
+            'slot_coverage_percentage': _percentage(slot_stats['teachers'], total_teachers),
+            'slot_type_distribution': {
+                slot_type: {
+                    'name': slot_name,
+                    'teacher_count': slot_stats[f'type_{slot_type}'],
+                    'percentage': _percentage(slot_stats[f'type_{slot_type}'], total_teachers),
+                }
+                for slot_type, slot_name in Slot.SLOT_TYPES
+            },
+            'day_distribution': {
+                day_name: {
+                    'teacher_count': slot_stats[f'day_{day}'],
+                    'percentage': _percentage(slot_stats[f'day_{day}'], total_teachers),
+                }
+                for day, day_name in TeacherSlotAssignment.DAYS_OF_WEEK
+            },
+            'days_assigned_distribution': {
+                f"{i} {'day' if i == 1 else 'days'}": days_per_teacher[i] for i in range(1, 7)
+            },
+        },
+    }
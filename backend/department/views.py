@@ -5,36 +5,16 @@ from rest_framework import status
 from .models import Department
 from .serializers import DepartmentSerializer
 from authentication.authentication import JWTCookieAuthentication
+from authentication.caller import caller_for_user
 from rest_framework.permissions import IsAuthenticated
 from course.models import Course
 from course.serializers import CourseSerializer
 from authentication.models import User
-from teacher.models import Teacher
-from student.models import Student
 
 # Helper function to determine department from user
 def get_user_department(user):
-    department_id = None
-    department = None
-    
-    if user.user_type == 'teacher':
-        try:
-            teacher = Teacher.objects.get(teacher_id=user)
-            if teacher.dept_id:
-                department_id = teacher.dept_id.id
-                department = teacher.dept_id
-        except Teacher.DoesNotExist:
-            pass
-    elif user.user_type == 'student':
-        try:
-            student = Student.objects.get(student_id=user)
-            if student.dept_id:
-                department_id = student.dept_id.id
-                department = student.dept_id
-        except Student.DoesNotExist:
-            pass
-            
-    return department_id, department
+    caller = caller_for_user(user)
+    return caller.department_id, caller.department
 
 class DepartmentListCreateView(ListCreateAPIView):
     """
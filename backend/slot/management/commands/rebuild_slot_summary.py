@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from slot.models import TeacherSlotAssignment
+from slot.summary import rebuild_summary, summary_drift
+
+
+class Command(BaseCommand):
+    help = ('Reconciles the department slot summary (the 33% cap counters) with the teacher slot assignments, '
+            'reporting the cells that drifted and rebuilding them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dept', type=int, action='append', dest='dept_ids',
+                            help='Department id to rebuild (repeatable, default all)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the cells that drifted')
+
+    def handle(self, *args, **options):
+        day_names = dict(TeacherSlotAssignment.DAYS_OF_WEEK)
+        drift = summary_drift(options['dept_ids'])
+        for (dept_id, day, slot_type), (counted, actual) in sorted(drift.items()):
+            self.stdout.write(f'Department {dept_id}, {day_names[day]}, slot {slot_type}: '
+                              f'counted {counted}, actually {actual}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Found {len(drift)} drifted department slot summary cells'))
+            return
+        rows = rebuild_summary(options['dept_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} drifted cells; rebuilt {rows} department slot summary rows'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 05:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_summary(apps, schema_editor):
+    TeacherSlotAssignment = apps.get_model('slot', 'TeacherSlotAssignment')
+    DepartmentSlotSummary = apps.get_model('slot', 'DepartmentSlotSummary')
+    counts = TeacherSlotAssignment.objects.filter(teacher__dept_id__isnull=False).values_list(
+        'teacher__dept_id', 'day_of_week', 'slot__slot_type').annotate(n=models.Count('id'))
+    DepartmentSlotSummary.objects.bulk_create([
+        DepartmentSlotSummary(department_id=dept_id, day_of_week=day, slot_type=slot_type, teacher_count=n)
+        for dept_id, day, slot_type, n in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('department', '0001_initial'),
+        ('slot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentSlotSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_of_week', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], verbose_name='Day of Week')),
+                ('slot_type', models.CharField(choices=[('A', 'Slot A (8AM - 3PM)'), ('B', 'Slot B (10AM - 5PM)'), ('C', 'Slot C (12PM - 7PM)')], max_length=1, verbose_name='Slot Type')),
+                ('teacher_count', models.PositiveIntegerField(default=0, verbose_name='Teacher Count')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_summary', to='department.department')),
+            ],
+            options={
+                'verbose_name': 'Department Slot Summary',
+                'verbose_name_plural': 'Department Slot Summaries',
+                'ordering': ['department', 'day_of_week', 'slot_type'],
+                'constraints': [models.UniqueConstraint(fields=('department', 'day_of_week', 'slot_type'), name='unique_department_slot_summary')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,207 @@
+"""
+Automatic TeacherSlotAssignment planner for a whole department.
+
+Every teacher needs five working days with one slot type each, following the
+rules TeacherSlotAssignment enforces pick by pick:
+    - slot type counts A-2/B-2/C-1, A-1/B-2/C-2 or A-2/B-1/C-2
+    - only one of Monday and Saturday
+    - at most 33% + 1 of the department on the same slot type and day
+
+All rule-compliant weeks (which restricted day, which type on which day) are
+enumerated once as a (plan, day, slot type) tensor. Each teacher keeps the
+plans that agree with their existing picks and their TeacherAvailability; the
+search then picks one plan per teacher so no (day, slot type) cell exceeds the
+department cap: greedy most-constrained-first, then min-conflict repair.
+"""
+import itertools
+import random
+import time
+
+import numpy as np
+
+from .models import Slot, TeacherSlotAssignment
+
+SLOT_TYPES = [slot_type for slot_type, _ in Slot.SLOT_TYPES]
+VALID_DISTRIBUTIONS = [
+    {'A': 2, 'B': 2, 'C': 1},
+    {'A': 1, 'B': 2, 'C': 2},
+    {'A': 2, 'B': 1, 'C': 2},
+]
+WORK_DAYS = [1, 2, 3, 4]          # Tuesday - Friday, plus one restricted day
+PLAN_DAYS = 6                     # Monday - Saturday
+REPAIR_ITERATIONS = 20000
+
+
+def department_cap(total_teachers):
+    """Teachers of one department allowed on the same slot type and day (33% + 1)"""
+    return int((total_teachers * 0.33) + 0.5) + 1
+
+
+def _build_plans():
+    plans = []
+    for restricted in TeacherSlotAssignment.RESTRICTED_DAYS:
+        days = sorted(WORK_DAYS + [restricted])
+        for distribution in VALID_DISTRIBUTIONS:
+            types = [t for t in SLOT_TYPES for _ in range(distribution[t])]
+            for order in sorted(set(itertools.permutations(types))):
+                plan = np.zeros((PLAN_DAYS, len(SLOT_TYPES)), dtype=bool)
+                for day, slot_type in zip(days, order):
+                    plan[day, SLOT_TYPES.index(slot_type)] = True
+                plans.append(plan)
+    return np.array(plans)
+
+
+PLANS = _build_plans()
+
+
+class SlotPlanner:
+    """
+    teachers     -- teacher ids to plan for
+    total        -- department head count used for the 33% cap
+    existing     -- {teacher_id: {day: slot_type}} picks that must be kept, for the whole department
+    availability -- {teacher_id: {day: [slot_type, ...]}} for teachers with limited availability
+    """
+
+    def __init__(self, teachers, total, existing=None, availability=None, seed=0):
+        self.teachers = list(teachers)
+        self.cap = department_cap(total)
+        self.existing = existing or {}
+        self.availability = availability or {}
+        self.rng = random.Random(seed)
+
+    def _allowed_plans(self, teacher_id):
+        allowed = np.ones(len(PLANS), dtype=bool)
+        for day, slot_type in self.existing.get(teacher_id, {}).items():
+            if day >= PLAN_DAYS or slot_type not in SLOT_TYPES:
+                return np.zeros(len(PLANS), dtype=bool)
+            allowed &= PLANS[:, day, SLOT_TYPES.index(slot_type)]
+        windows = self.availability.get(teacher_id)
+        if windows is not None:
+            usable = np.zeros((PLAN_DAYS, len(SLOT_TYPES)), dtype=bool)
+            for day, slot_types in windows.items():
+                for slot_type in slot_types:
+                    if day < PLAN_DAYS and slot_type in SLOT_TYPES:
+                        usable[day, SLOT_TYPES.index(slot_type)] = True
+            # Every working day of the plan must fall inside the teacher's availability
+            allowed &= ~(PLANS & ~usable).any(axis=(1, 2))
+        return allowed
+
+    def _plan_costs(self, load, candidates):
+        """Cap overflow first, then how crowded the chosen cells already are"""
+        after = load[None] + PLANS[candidates]
+        overflow = np.clip(after - self.cap, 0, None).sum(axis=(1, 2))
+        crowding = (PLANS[candidates] * load[None]).sum(axis=(1, 2))
+        return overflow * 1000 + crowding + np.array([self.rng.random() for _ in candidates]) * 0.1
+
+    def solve(self, deadline=None):
+        """
+        Returns (plans, unplanned): plans maps teacher_id to {day: slot_type} (existing picks included),
+        unplanned lists teachers with no rule-compliant week left.
+        """
+        deadline = deadline or time.monotonic() + 10
+        candidates = {t: np.flatnonzero(self._allowed_plans(t)) for t in self.teachers}
+        unplanned = [t for t in self.teachers if not len(candidates[t])]
+        planned = sorted((t for t in self.teachers if len(candidates[t])), key=lambda t: len(candidates[t]))
+
+        load = np.zeros((PLAN_DAYS, len(SLOT_TYPES)), dtype=np.int32)
+        # Teachers we do not plan still occupy the cells of their existing picks
+        for t in set(self.existing) - set(planned):
+            for day, slot_type in self.existing[t].items():
+                if day < PLAN_DAYS and slot_type in SLOT_TYPES:
+                    load[day, SLOT_TYPES.index(slot_type)] += 1
+
+        choice = {}
+        for t in planned:
+            costs = self._plan_costs(load, candidates[t])
+            choice[t] = candidates[t][int(np.argmin(costs))]
+            load += PLANS[choice[t]]
+
+        # Min-conflict repair: re-plan a teacher sitting in an over-cap cell
+        for _ in range(REPAIR_ITERATIONS):
+            over = load > self.cap
+            if not over.any() or time.monotonic() >= deadline:
+                break
+            in_conflict = [t for t in planned if (PLANS[choice[t]] & over).any() and len(candidates[t]) > 1]
+            if not in_conflict:
+                break
+            t = self.rng.choice(in_conflict)
+            load -= PLANS[choice[t]]
+            costs = self._plan_costs(load, candidates[t])
+            choice[t] = candidates[t][int(np.argmin(costs))]
+            load += PLANS[choice[t]]
+
+        self.load = load
+        plans = {}
+        for t in planned:
+            days, types = np.nonzero(PLANS[choice[t]])
+            plans[t] = {int(day): SLOT_TYPES[k] for day, k in zip(days, types)}
+        return plans, unplanned
+
+    def violations(self):
+        """(day, slot_type, count) cells over the department cap after solve()"""
+        return [
+            (int(day), SLOT_TYPES[k], int(self.load[day, k]))
+            for day, k in zip(*np.nonzero(self.load > self.cap))
+        ]
+
+
+def _window_slots():
+    """The slot each type's assignments point at: its longest slot, oldest first"""
+    windows = {}
+    for slot_id, slot_type, start, end in Slot.objects.order_by('id').values_list(
+            'id', 'slot_type', 'slot_start_time', 'slot_end_time'):
+        length = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+        if slot_type not in windows or length > windows[slot_type][1]:
+            windows[slot_type] = (slot_id, length, start, end)
+    return windows
+
+
+def plan_department(dept_id, seed=0):
+    """
+    Load a department and plan it. Returns a dict with the planner, plans, unplanned
+    teachers, the window slot per type and the teachers' existing picks.
+    """
+    from teacher.models import Teacher, TeacherAvailability
+
+    total = Teacher.objects.filter(dept_id=dept_id).count()
+    teachers = dict(Teacher.objects.filter(dept_id=dept_id, is_placeholder=False).exclude(
+        resignation_status='resigned'
+    ).values_list('id', 'availability_type'))
+
+    existing = {}
+    for teacher_id, day, slot_type in TeacherSlotAssignment.objects.filter(
+            teacher__dept_id=dept_id).values_list('teacher_id', 'day_of_week', 'slot__slot_type'):
+        existing.setdefault(teacher_id, {})[day] = slot_type
+
+    windows = _window_slots()
+    limited = [t for t, availability_type in teachers.items() if availability_type == 'limited']
+    availability = {t: {} for t in limited}
+    for teacher_id, day, start, end in TeacherAvailability.objects.filter(
+            teacher_id__in=limited).values_list('teacher_id', 'day_of_week', 'start_time', 'end_time'):
+        for slot_type, (_, _, slot_start, slot_end) in windows.items():
+            if start < slot_end and slot_start < end:
+                availability[teacher_id].setdefault(day, []).append(slot_type)
+
+    planner = SlotPlanner(teachers, total, existing, availability, seed=seed)
+    plans, unplanned = planner.solve()
+    return {
+        'planner': planner,
+        'plans': plans,
+        'unplanned': unplanned,
+        'existing': existing,
+        'window_slots': {slot_type: value[0] for slot_type, value in windows.items()},
+        'total_teachers': total,
+    }
+
+
+def new_assignments(plan):
+    """TeacherSlotAssignment objects for the picks a plan adds on top of the existing ones"""
+    created = []
+    for teacher_id, days in plan['plans'].items():
+        current = plan['existing'].get(teacher_id, {})
+        for day, slot_type in days.items():
+            if day not in current:
+                created.append(TeacherSlotAssignment(
+                    teacher_id=teacher_id, day_of_week=day, slot_id=plan['window_slots'][slot_type]
+                ))
+    return created
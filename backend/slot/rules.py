@@ -0,0 +1,213 @@
+"""
+TeacherSlotAssignment rules, checked in memory.
+
+A DepartmentSlotState holds every pick of one department's teachers, loaded
+with a single query, so a pick can be checked against all the rules without
+touching the database:
+    - at most 5 days per week
+    - only one of Monday and Saturday
+    - slot type counts A-2/B-2/C-1, A-1/B-2/C-2 or A-2/B-1/C-2 once all 5 days are picked
+    - at most 33% + 1 of the department on the same slot type and day
+
+Picks applied to the state are seen by the checks that follow, so a whole
+batch can be validated pick by pick and written afterwards. The model's
+clean(), the preference view and the batch view all check through here; the
+views keep the states of one request in a SlotRuleCache.
+"""
+from collections import Counter
+
+from django.db.models import Q
+
+from teacher.models import Teacher
+
+from .models import Slot, TeacherSlotAssignment
+from .planner import VALID_DISTRIBUTIONS, department_cap
+
+DAY_NAMES = dict(TeacherSlotAssignment.DAYS_OF_WEEK)
+MAX_DAYS = 5
+
+
+class DepartmentSlotState:
+    """
+    dept_id, dept_name -- the department (None for teachers without one, who have no cap)
+    teachers -- ids of the department's teachers; their number is the 33% cap base
+    picks    -- {teacher_id: {day: (assignment_id, slot_id, slot_type)}}
+    """
+
+    def __init__(self, dept_id, dept_name, teachers, picks):
+        self.dept_id = dept_id
+        self.dept_name = dept_name
+        self.teachers = set(teachers)
+        self.picks = {teacher_id: dict(days) for teacher_id, days in picks.items()}
+        self.cells = Counter()
+        for days in self.picks.values():
+            for day, (_, _, slot_type) in days.items():
+                self.cells[(day, slot_type)] += 1
+
+    @classmethod
+    def from_rows(cls, dept_id, rows):
+        """Build from (teacher_id, dept_name, assignment_id, day, slot_id, slot_type) rows"""
+        teachers, picks, dept_name = set(), {}, None
+        for teacher_id, name, assignment_id, day, slot_id, slot_type in rows:
+            teachers.add(teacher_id)
+            dept_name = name
+            if assignment_id is not None:
+                picks.setdefault(teacher_id, {})[day] = (assignment_id, slot_id, slot_type)
+        return cls(dept_id, dept_name, teachers, picks)
+
+    @property
+    def cap(self):
+        return department_cap(len(self.teachers))
+
+    def days(self, teacher_id):
+        return self.picks.get(teacher_id, {})
+
+    def violations(self, teacher_id, day, slot_type, assignment_id=None, check_cap=True):
+        """
+        Messages for every rule broken by giving the teacher this slot type on this day,
+        replacing any pick on that day. A pick being edited (assignment_id) is left out.
+        check_cap=False leaves the department cap to summary.admit().
+        """
+        days = {d: pick for d, pick in self.days(teacher_id).items()
+                if assignment_id is None or pick[0] != assignment_id}
+        errors = []
+
+        if len(days) >= MAX_DAYS and day not in days:
+            errors.append("Teacher already has assignments for 5 days. Maximum is 5 days per week.")
+
+        if day in TeacherSlotAssignment.RESTRICTED_DAYS:
+            other = [d for d in days if d in TeacherSlotAssignment.RESTRICTED_DAYS and d != day]
+            if other:
+                errors.append(
+                    f"Teacher already has a slot assigned for {DAY_NAMES[other[0]]}. "
+                    f"Teachers can only choose one of these days: Monday or Saturday."
+                )
+
+        types = [t for d, (_, _, t) in days.items() if d != day] + [slot_type]
+        error = distribution_error(types)
+        if error:
+            errors.append(error)
+
+        if check_cap and self.dept_id is not None and self.teachers:
+            current = self.days(teacher_id).get(day)
+            others = self.cells[(day, slot_type)] - (1 if current and current[2] == slot_type else 0)
+            if others >= self.cap:
+                errors.append(self.cap_message(day, slot_type))
+        return errors
+
+    def cap_message(self, day, slot_type):
+        return (
+            f"Maximum number of teachers (33% + 1) from department {self.dept_name} "
+            f"already assigned to slot type {slot_type} on {DAY_NAMES[day]}."
+        )
+
+    def teacher_violations(self, teacher_id, name="Teacher"):
+        """Messages for every rule the teacher's current picks break"""
+        days = self.days(teacher_id)
+        errors = []
+        if len(days) > MAX_DAYS:
+            errors.append(f"{name} has assignments for {len(days)} days. Maximum is 5 days per week.")
+        if len([d for d in days if d in TeacherSlotAssignment.RESTRICTED_DAYS]) > 1:
+            errors.append(f"{name} has assignments for multiple restricted days. "
+                          f"Only one of Monday or Saturday is allowed.")
+        error = distribution_error([t for _, _, t in days.values()])
+        if error:
+            errors.append(error)
+        return errors
+
+    def apply(self, teacher_id, day, slot_id, slot_type, assignment_id=None):
+        """Give the teacher this pick, replacing any pick on the same day"""
+        self.remove(teacher_id, day)
+        self.picks.setdefault(teacher_id, {})[day] = (assignment_id, slot_id, slot_type)
+        self.cells[(day, slot_type)] += 1
+
+    def remove(self, teacher_id, day):
+        current = self.picks.get(teacher_id, {}).pop(day, None)
+        if current is not None:
+            self.cells[(day, current[2])] -= 1
+        return current
+
+
+def distribution_error(slot_types):
+    """Message if the slot types of a teacher's picks cannot be (or are not) a valid week"""
+    if len(slot_types) > MAX_DAYS:
+        return "Teacher cannot have more than 5 slot assignments in total."
+    if len(slot_types) == MAX_DAYS:
+        counts = Counter(slot_types)
+        if not any(all(counts.get(t, 0) == n for t, n in combo.items()) for combo in VALID_DISTRIBUTIONS):
+            return (
+                f"Invalid slot distribution. Current distribution is: "
+                f"A: {counts.get('A', 0)}, B: {counts.get('B', 0)}, C: {counts.get('C', 0)}. "
+                f"Valid distributions for 5 days are: A-2/B-2/C-1, A-1/B-2/C-2, or A-2/B-1/C-2."
+            )
+    return None
+
+
+def load_department_states(dept_ids, teacher_ids=()):
+    """
+    {dept_id: DepartmentSlotState} for the departments, in one query. Listed teachers
+    without a department get a cap-free state of their own under (None, teacher_id).
+    """
+    dept_ids = {d for d in dept_ids if d is not None}
+    teacher_ids = set(teacher_ids)
+    if not dept_ids and not teacher_ids:
+        return {}
+
+    rows = {}
+    for dept_id, *row in Teacher.objects.filter(
+            Q(dept_id__in=dept_ids) | Q(id__in=teacher_ids, dept_id__isnull=True)
+    ).values_list(
+        'dept_id', 'id', 'dept_id__dept_name', 'slot_assignments__id', 'slot_assignments__day_of_week',
+        'slot_assignments__slot_id', 'slot_assignments__slot__slot_type',
+    ):
+        key = state_key(dept_id, row[0])
+        rows.setdefault(key, []).append(row)
+    states = {key: DepartmentSlotState.from_rows(key if not isinstance(key, tuple) else None, key_rows)
+              for key, key_rows in rows.items()}
+    for dept_id in dept_ids - set(states):
+        states[dept_id] = DepartmentSlotState(dept_id, None, (), {})
+    return states
+
+
+def state_key(dept_id, teacher_id):
+    """Key of a teacher's state in load_department_states()"""
+    return dept_id if dept_id is not None else (None, teacher_id)
+
+
+def teacher_state(teacher_id, dept_id):
+    """The state of the teacher's department (or of the teacher alone), in one query"""
+    return load_department_states([dept_id], [teacher_id])[state_key(dept_id, teacher_id)]
+
+
+class SlotRuleCache:
+    """Department states and slot types loaded at most once per request"""
+
+    def __init__(self):
+        self.states = {}
+        self._slot_types = None
+
+    @classmethod
+    def for_request(cls, request):
+        cache = getattr(request, '_slot_rule_cache', None)
+        if cache is None:
+            cache = cls()
+            request._slot_rule_cache = cache
+        return cache
+
+    @property
+    def slot_types(self):
+        """{slot_id: slot_type} for every slot"""
+        if self._slot_types is None:
+            self._slot_types = dict(Slot.objects.values_list('id', 'slot_type'))
+        return self._slot_types
+
+    def load(self, teacher_depts):
+        """Load the states of the {teacher_id: dept_id} teachers not loaded yet, in one query"""
+        missing = {teacher_id: dept_id for teacher_id, dept_id in teacher_depts.items()
+                   if state_key(dept_id, teacher_id) not in self.states}
+        if missing:
+            self.states.update(load_department_states(set(missing.values()), missing))
+
+    def state(self, teacher_id, dept_id):
+        self.load({teacher_id: dept_id})
+        return self.states[state_key(dept_id, teacher_id)]
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from teacher.models import Teacher
+from .models import Slot, TeacherSlotAssignment
+from .summary import adjust_summary, rebuild_summary, slot_types
+
+
+# Sent with dept_ids after bulk TeacherSlotAssignment writes, which send no model signals
+assignments_bulk_changed = Signal()
+
+
+def _teacher_dept(instance, teacher_id):
+    """Department id of the assignment's teacher, without a query when the teacher is loaded"""
+    if teacher_id == instance.teacher_id and TeacherSlotAssignment.teacher.is_cached(instance):
+        return instance.teacher.dept_id_id
+    return Teacher.objects.filter(id=teacher_id).values_list('dept_id', flat=True).first()
+
+
+@receiver(post_save, sender=TeacherSlotAssignment)
+def count_saved_assignment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    after = (instance.teacher_id, instance.day_of_week, instance.slot_id)
+    if getattr(instance, '_summary_counted', False):
+        # Already counted when admit() let it in
+        instance._summary_counted = False
+    elif not created and not hasattr(instance, '_summary_cell'):
+        # Updated without being loaded first, so where it was counted is unknown
+        rebuild_summary([_teacher_dept(instance, instance.teacher_id)])
+    else:
+        before = None if created else instance._summary_cell
+        if before == after:
+            return
+        types = slot_types([instance.slot_id] + ([before[2]] if before else []))
+        if before and before[2] not in types:
+            # The slot it was counted under is gone, so recount
+            rebuild_summary([_teacher_dept(instance, before[0]), _teacher_dept(instance, instance.teacher_id)])
+        else:
+            deltas = Counter()
+            if before:
+                teacher_id, day, slot_id = before
+                deltas[(_teacher_dept(instance, teacher_id), day, types[slot_id])] -= 1
+            deltas[(_teacher_dept(instance, instance.teacher_id), instance.day_of_week, types[instance.slot_id])] += 1
+            adjust_summary(deltas)
+    instance._summary_cell = after
+
+
+@receiver(post_delete, sender=TeacherSlotAssignment)
+def count_deleted_assignment(sender, instance, **kwargs):
+    cell = getattr(instance, '_summary_cell', None) or (instance.teacher_id, instance.day_of_week, instance.slot_id)
+    teacher_id, day, slot_id = cell
+    dept_id = _teacher_dept(instance, teacher_id)
+    slot_type = slot_types([slot_id]).get(slot_id)
+    if slot_type is None:
+        # The slot it was counted under is gone, so recount
+        rebuild_summary([dept_id])
+    else:
+        adjust_summary({(dept_id, day, slot_type): -1})
+
+
+@receiver(post_init, sender=Teacher)
+def remember_teacher_dept(sender, instance, **kwargs):
+    instance._summary_dept = instance.dept_id_id if instance.pk else None
+
+
+@receiver(post_save, sender=Teacher)
+def move_teacher_counts(sender, instance, created, raw=False, **kwargs):
+    """A teacher changing department takes their picks along"""
+    before = getattr(instance, '_summary_dept', None)
+    if not created and not raw and before != instance.dept_id_id:
+        rebuild_summary([before, instance.dept_id_id])
+    instance._summary_dept = instance.dept_id_id
+
+
+@receiver(post_save, sender=Slot)
+@receiver(post_delete, sender=Slot)
+def slot_changed(sender, created=False, raw=False, **kwargs):
+    """A slot changing type moves every pick of it to another cell"""
+    if kwargs.get('signal') is post_save and not created and not raw:
+        rebuild_summary()
@@ -0,0 +1,128 @@
+"""
+Materialized (department, day, slot type) teacher counts.
+
+DepartmentSlotSummary holds, for every department, how many of its teachers
+picked each slot type on each day. Since a teacher has at most one slot per
+day, that is the number of TeacherSlotAssignment rows in the cell. Signals
+(slot/signals.py) adjust the counts inside the transaction of every
+assignment save and delete; bulk writes, which send no signals, call
+adjust_summary() themselves. rebuild_summary() recomputes the counts from the
+assignments, for teachers changing department, slot types changing, or after
+writes that bypassed both.
+
+The rows double as the admission counters for the 33% + 1 department cap:
+admit() takes a place in a cell with a single conditional UPDATE, so
+concurrent picks of one department only contend for the row of the cell they
+pick instead of counting teachers under a department-wide lock.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import DepartmentSlotSummary, Slot, TeacherSlotAssignment
+
+
+def slot_types(slot_ids):
+    """
+    {slot_id: slot_type} of these slots, read from the database: a per-process
+    cache would miss slots created or retyped by another process
+    """
+    return dict(Slot.objects.filter(id__in=set(slot_ids)).values_list('id', 'slot_type'))
+
+
+def adjust_summary(deltas):
+    """Apply {(dept_id, day, slot_type): change in teacher count} to the summary"""
+    # Always in the same order, so concurrent writers lock the rows without deadlocking
+    cells = sorted(cell for cell, delta in deltas.items() if delta and cell[0] is not None and cell[2] is not None)
+    with transaction.atomic():
+        for dept_id, day, slot_type in cells:
+            delta = deltas[(dept_id, day, slot_type)]
+            updated = DepartmentSlotSummary.objects.filter(
+                department_id=dept_id, day_of_week=day, slot_type=slot_type
+            ).update(teacher_count=F('teacher_count') + delta)
+            if updated or delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    DepartmentSlotSummary.objects.create(
+                        department_id=dept_id, day_of_week=day, slot_type=slot_type, teacher_count=delta
+                    )
+            except IntegrityError:
+                # Created concurrently
+                DepartmentSlotSummary.objects.filter(
+                    department_id=dept_id, day_of_week=day, slot_type=slot_type
+                ).update(teacher_count=F('teacher_count') + delta)
+
+
+def admit(dept_id, day, slot_type, cap):
+    """Count one more teacher in the cell unless it already holds cap teachers; True if admitted"""
+    if dept_id is None:
+        return True
+    cell = DepartmentSlotSummary.objects.filter(department_id=dept_id, day_of_week=day, slot_type=slot_type)
+    if cell.filter(teacher_count__lt=cap).update(teacher_count=F('teacher_count') + 1):
+        return True
+    if cap < 1 or cell.exists():
+        return False
+    try:
+        with transaction.atomic():
+            DepartmentSlotSummary.objects.create(department_id=dept_id, day_of_week=day, slot_type=slot_type,
+                                                 teacher_count=1)
+        return True
+    except IntegrityError:
+        # Created concurrently
+        return bool(cell.filter(teacher_count__lt=cap).update(teacher_count=F('teacher_count') + 1))
+
+
+def release(dept_id, day, slot_type):
+    """Give back a place taken with admit()"""
+    adjust_summary({(dept_id, day, slot_type): -1})
+
+
+def summary_drift(dept_ids=None):
+    """{(dept_id, day, slot_type): (counted, actual)} for every cell the summary has wrong"""
+    assignments = TeacherSlotAssignment.objects.filter(teacher__dept_id__isnull=False)
+    if dept_ids is not None:
+        assignments = assignments.filter(teacher__dept_id__in=dept_ids)
+    actual = Counter({
+        (dept_id, day, slot_type): n
+        for dept_id, day, slot_type, n in assignments.values_list(
+            'teacher__dept_id', 'day_of_week', 'slot__slot_type').annotate(n=Count('id'))
+    })
+    counted = summary_cells(dept_ids)
+    return {cell: (counted[cell], actual[cell]) for cell in set(counted) | set(actual) if counted[cell] != actual[cell]}
+
+
+def rebuild_summary(dept_ids=None):
+    """Recompute the summary of the departments (all of them if None) from the assignments"""
+    assignments = TeacherSlotAssignment.objects.filter(teacher__dept_id__isnull=False)
+    summaries = DepartmentSlotSummary.objects.all()
+    if dept_ids is not None:
+        dept_ids = [d for d in dept_ids if d is not None]
+        assignments = assignments.filter(teacher__dept_id__in=dept_ids)
+        summaries = summaries.filter(department_id__in=dept_ids)
+
+    counts = assignments.values_list('teacher__dept_id', 'day_of_week', 'slot__slot_type').annotate(n=Count('id'))
+    rows = [
+        DepartmentSlotSummary(department_id=dept_id, day_of_week=day, slot_type=slot_type, teacher_count=n)
+        for dept_id, day, slot_type, n in counts
+    ]
+    with transaction.atomic():
+        summaries.delete()
+        DepartmentSlotSummary.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def summary_cells(dept_ids=None, day=None, slot_type=None):
+    """Counter of {(dept_id, day, slot_type): teacher_count}, optionally filtered"""
+    rows = DepartmentSlotSummary.objects.filter(teacher_count__gt=0)
+    if dept_ids is not None:
+        rows = rows.filter(department_id__in=dept_ids)
+    if day is not None:
+        rows = rows.filter(day_of_week=day)
+    if slot_type is not None:
+        rows = rows.filter(slot_type=slot_type)
+    return Counter({
+        (dept_id, day, slot_type): n
+        for dept_id, day, slot_type, n in rows.values_list('department_id', 'day_of_week', 'slot_type', 'teacher_count')
+    })
@@ -1,3 +1,81 @@
+from datetime import time
+
 from django.test import TestCase
 
-# Create your tests here.
+from authentication.models import User
+from department.models import Department
+from teacher.models import Teacher
+
+from .models import Slot, TeacherSlotAssignment
+from .planner import department_cap
+from .summary import admit, rebuild_summary, release, summary_cells, summary_drift
+
+
+class DepartmentFixture:
+    """A department with teachers and a period slot of each type"""
+
+    teachers_count = 2
+
+    def setUp(self):
+        self.dept = Department.objects.create(dept_name='CSE')
+        self.teachers = []
+        for i in range(self.teachers_count):
+            user = User.objects.create(email=f't{i}@example.com', first_name='T', last_name=str(i),
+                                       user_type='teacher', password='x')
+            self.teachers.append(Teacher.objects.create(teacher_id=user, dept_id=self.dept, teacher_working_hours=30))
+        self.slots = {slot_type: Slot.objects.create(slot_name=f'{slot_type}1', slot_type=slot_type,
+                                                     slot_start_time=time(start), slot_end_time=time(start, 50))
+                      for slot_type, start in [('A', 8), ('B', 10), ('C', 12)]}
+
+
+class SlotSummaryTests(DepartmentFixture, TestCase):
+    def test_pick_of_a_slot_created_by_another_process_is_counted(self):
+        TeacherSlotAssignment.objects.create(teacher=self.teachers[1], slot=self.slots['A'], day_of_week=1)
+        # bulk_create sends no signals, like a slot created in another worker
+        slot = Slot.objects.bulk_create([Slot(slot_name='B2', slot_type='B', slot_start_time=time(11),
+                                              slot_end_time=time(11, 50))])[0]
+
+        TeacherSlotAssignment.objects.create(teacher=self.teachers[0], slot=slot, day_of_week=1)
+
+        self.assertEqual(summary_cells(), {(self.dept.id, 1, 'A'): 1, (self.dept.id, 1, 'B'): 1})
+        self.assertEqual(summary_drift(), {})
+
+    def test_slot_retyped_by_another_process(self):
+        assignment = TeacherSlotAssignment.objects.create(teacher=self.teachers[0], slot=self.slots['A'],
+                                                          day_of_week=1)
+        # Another worker retypes the slot; its signal rebuilds the counts
+        Slot.objects.filter(id=self.slots['A'].id).update(slot_type='B')
+        rebuild_summary()
+
+        assignment = TeacherSlotAssignment.objects.get(id=assignment.id)
+        assignment.day_of_week = 2
+        assignment.save()
+        self.assertEqual(summary_cells(), {(self.dept.id, 2, 'B'): 1})
+        self.assertEqual(summary_drift(), {})
+
+        assignment.delete()
+        self.assertEqual(summary_cells(), {})
+        self.assertEqual(summary_drift(), {})
+
+
+class DepartmentCapAdmissionTests(DepartmentFixture, TestCase):
+    teachers_count = 6
+
+    def test_admit_refuses_the_cell_past_the_cap_and_release_frees_a_place(self):
+        cap = department_cap(len(self.teachers))
+        cell = (self.dept.id, 1, 'A')
+
+        self.assertEqual([admit(*cell, cap) for _ in range(cap)], [True] * cap)
+        self.assertFalse(admit(*cell, cap))
+        self.assertEqual(summary_cells()[cell], cap)
+        # Other cells of the department are not affected
+        self.assertTrue(admit(self.dept.id, 1, 'B', cap))
+
+        release(*cell)
+        self.assertEqual(summary_cells()[cell], cap - 1)
+        self.assertTrue(admit(*cell, cap))
+        self.assertFalse(admit(*cell, cap))
+
+    def test_zero_cap_admits_nobody(self):
+        self.assertFalse(admit(self.dept.id, 1, 'A', 0))
+        self.assertEqual(summary_cells(), {})
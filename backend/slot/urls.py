@@ -7,5 +7,6 @@ urlpatterns = [
     path('teacher-slots/', views.TeacherSlotListView.as_view(), name="teacher-slots-list"),
     path('department-summary/', views.DepartmentSlotSummaryView.as_view(), name="department-slot-summary"),
     path('initialize-default-slots/', views.InitializeDefaultSlotsView.as_view(), name="initialize-default-slots"),
+    path('department-plan/', views.DepartmentSlotPlanView.as_view(), name="department-slot-plan"),
     path('batch-assignments/', views.BatchTeacherSlotAssignmentView.as_view(), name="batch-teacher-slot-assignments"),
 ]
@@ -4,7 +4,12 @@ from rest_framework.views import APIView
 from authentication.authentication import JWTCookieAuthentication
 from rest_framework.permissions import IsAuthenticated
 from .serializers import SlotSerializer, TeacherSlotAssignmentSerializer
-from .models import Slot, TeacherSlotAssignment
+from .models import DepartmentSlotSummary, Slot, TeacherSlotAssignment
+from .planner import SLOT_TYPES, department_cap, plan_department, new_assignments
+from .rules import DAY_NAMES, SlotRuleCache, state_key
+from .signals import assignments_bulk_changed
+from .summary import adjust_summary, admit, release, slot_types, summary_cells
+from admission.tickets import enqueue_response, rush_mode
 from teacher.models import Teacher
 from department.models import Department
 from rest_framework.exceptions import ValidationError as DRFValidationError
@@ -31,20 +36,30 @@ class TeacherSlotPreferenceView(CreateAPIView):
     serializer_class = SlotSerializer
 
     def post(self, request, *args, **kwargs):
+        if rush_mode('slot_preference'):
+            return enqueue_response(request, 'slot_preference')
+        data, status_code = self.submit(request.data, SlotRuleCache.for_request(request))
+        return Response(data, status=status_code)
+
+    def submit(self, data, rules):
+        """Run the operations of one teacher; returns (response data, HTTP status)"""
         try:
-            teacher = Teacher.objects.get(id=request.data.get('teacher_id'))
-        except Teacher.DoesNotExist:
-            return Response({"error": "Teacher not found."}, status=status.HTTP_404_NOT_FOUND)
+            teacher = Teacher.objects.get(id=data.get('teacher_id'))
+        except (Teacher.DoesNotExist, ValueError, TypeError):
+            return {"error": "Teacher not found."}, status.HTTP_404_NOT_FOUND
         
-        operations = request.data.get('operations', [])
+        operations = data.get('operations', [])
         
         if not operations:
-            return Response({"error": "No operations provided."}, status=status.HTTP_400_BAD_REQUEST)
+            return {"error": "No operations provided."}, status.HTTP_400_BAD_REQUEST
 
         results = []
         success_count = 0
         
         with transaction.atomic():
+            # Only the teacher is locked; the 33% cap is taken per cell by admit()
+            list(Teacher.objects.select_for_update().filter(id=teacher.id).values_list('id', flat=True))
+            
             for operation in operations:
                 action = operation.get('action', 'create').lower()
                 result = {
@@ -56,9 +71,9 @@ class TeacherSlotPreferenceView(CreateAPIView):
                 
                 try:
                     if action in ['create', 'update']:
-                        response = self._handle_create_update(teacher, operation)
+                        response = self._handle_create_update(rules, teacher, operation)
                     elif action == 'delete':
-                        response = self._handle_delete(teacher, operation)
+                        response = self._handle_delete(rules, teacher, operation)
                     else:
                         raise DRFValidationError(f"Invalid action: {action}")
                     
@@ -79,159 +94,76 @@ class TeacherSlotPreferenceView(CreateAPIView):
         else:
             status_code = status.HTTP_207_MULTI_STATUS
         
-        return Response(
-            {
-                "results": results,
-                "success_count": success_count,
-                "total_operations": len(operations)
-            },
-            status=status_code
-        )
+        return {
+            "results": results,
+            "success_count": success_count,
+            "total_operations": len(operations)
+        }, status_code
 
-    def _handle_create_update(self, teacher, data):
+    def _handle_create_update(self, rules, teacher, data):
         if 'slot_id' not in data or 'day_of_week' not in data:
             raise DRFValidationError("Both 'slot_id' and 'day_of_week' are required.")
         
-        slot_id = data['slot_id']
-        day_of_week = data['day_of_week']
-        
-        try:
-            slot = Slot.objects.get(pk=slot_id)
-        except Slot.DoesNotExist:
+        slot_id, day_of_week = self._parse_pick(data)
+        slot_type = rules.slot_types.get(slot_id)
+        if slot_type is None:
             raise DRFValidationError(f"Slot with id {slot_id} does not exist.")
         
-        # Check 5-day week constraint
-        current_days = TeacherSlotAssignment.objects.filter(
-            teacher=teacher
-        ).values_list('day_of_week', flat=True).distinct()
+        state = rules.state(teacher.id, teacher.dept_id_id)
+        errors = state.violations(teacher.id, day_of_week, slot_type, check_cap=False)
+        if errors:
+            raise DRFValidationError(errors[0])
         
-        if len(current_days) >= 5 and day_of_week not in current_days:
-            raise DRFValidationError("Teacher already has assignments for 5 days. Maximum is 5 days per week.")
-        
-        # Check Monday/Saturday constraint - only one of these days allowed
-        if day_of_week in TeacherSlotAssignment.RESTRICTED_DAYS:
-            restricted_day_assignments = TeacherSlotAssignment.objects.filter(
-                teacher=teacher,
-                day_of_week__in=TeacherSlotAssignment.RESTRICTED_DAYS
-            ).exclude(day_of_week=day_of_week)
+        current = state.days(teacher.id).get(day_of_week)
+        with transaction.atomic():
+            # Take a place in the (day, slot type) cell, giving back the one of the pick replaced
+            if not current or current[2] != slot_type:
+                if not admit(state.dept_id, day_of_week, slot_type, state.cap):
+                    raise DRFValidationError(state.cap_message(day_of_week, slot_type))
+                if current:
+                    release(state.dept_id, day_of_week, current[2])
             
-            if restricted_day_assignments.exists():
-                restricted_day = dict(TeacherSlotAssignment.DAYS_OF_WEEK)[restricted_day_assignments.first().day_of_week]
-                raise DRFValidationError(
-                    f"Teacher already has a slot assigned for {restricted_day}. "
-                    f"Teachers can only choose one of these days: Monday or Saturday."
-                )
-        
-        # Check slot type distribution constraint
-        self._validate_slot_type_distribution(teacher, slot, day_of_week)
-        
-        # Check department distribution constraint (33% per slot type)
-        if teacher.dept_id:
-            dept_id = teacher.dept_id.id
-            total_dept_teachers = Teacher.objects.filter(dept_id=dept_id).count()
-            
-            if total_dept_teachers > 0:
-                # Get count of teachers in this department assigned to this slot type on this day
-                teachers_in_slot = TeacherSlotAssignment.objects.filter(
-                    teacher__dept_id=dept_id,
-                    day_of_week=day_of_week,
-                    slot__slot_type=slot.slot_type
-                ).values('teacher').distinct().count()
-                
-                # Calculate max teachers allowed (33% of department + 1 extra teacher)
-                max_teachers_per_slot = int((total_dept_teachers * 0.33) + 0.5) + 1  # Adding 1 to allow one extra teacher
-                
-                if teachers_in_slot >= max_teachers_per_slot:
-                    raise DRFValidationError(
-                        f"Maximum number of teachers (33% + 1) from department {teacher.dept_id.dept_name} "
-                        f"already assigned to slot type {slot.slot_type} on {dict(TeacherSlotAssignment.DAYS_OF_WEEK)[day_of_week]}."
-                    )
-        
-        assignment, created = TeacherSlotAssignment.objects.get_or_create(
-            teacher=teacher,
-            day_of_week=day_of_week,
-            defaults={'slot': slot}
-        )
-        
-        if not created:
-            assignment.slot = slot
-            assignment.full_clean()
-            assignment.save()
-            action = "updated"
-        else:
-            action = "created"
+            assignment = TeacherSlotAssignment(id=current[0] if current else None, teacher=teacher,
+                                               day_of_week=day_of_week, slot_id=slot_id)
+            assignment._summary_counted = True
+            assignment.save(force_update=bool(current))
+        state.apply(teacher.id, day_of_week, slot_id, slot_type, assignment.id)
         
+        created = current is None
         return {
-            "message": f"Slot assignment {action} successfully.",
+            "message": f"Slot assignment {'created' if created else 'updated'} successfully.",
             "created": created
         }
 
-    def _validate_slot_type_distribution(self, teacher, new_slot, new_day_of_week):
-        """
-        Validate that the teacher's slot choices follow the required distribution format:
-        Valid combinations: A-2/B-2/C-1, A-1/B-2/C-2, or A-2/B-1/C-2
-        """
-        # Get all current assignments for this teacher
-        current_assignments = list(TeacherSlotAssignment.objects.filter(
-            teacher=teacher
-        ).exclude(day_of_week=new_day_of_week).values_list('slot__slot_type', flat=True))
-        
-        # Add the new slot type to the distribution
-        current_assignments.append(new_slot.slot_type)
-        
-        # Count occurrences of each slot type
-        slot_type_counts = Counter(current_assignments)
-        total_assignments = len(current_assignments)
-        
-        # Don't need to check if less than 5 assignments
-        if total_assignments > 5:
-            raise DRFValidationError("Teacher cannot have more than 5 slot assignments in total.")
-        
-        # When we reach 5 assignments, ensure we have a valid combination
-        if total_assignments == 5:
-            # Valid combinations
-            valid_combinations = [
-                # Format: {A: count, B: count, C: count}
-                {'A': 2, 'B': 2, 'C': 1},
-                {'A': 1, 'B': 2, 'C': 2},
-                {'A': 2, 'B': 1, 'C': 2}
-            ]
-            
-            is_valid = False
-            for combo in valid_combinations:
-                if all(slot_type_counts.get(slot_type, 0) == count for slot_type, count in combo.items()):
-                    is_valid = True
-                    break
-            
-            if not is_valid:
-                slot_a_count = slot_type_counts.get('A', 0)
-                slot_b_count = slot_type_counts.get('B', 0)
-                slot_c_count = slot_type_counts.get('C', 0)
-                
-                raise DRFValidationError(
-                    f"Invalid slot distribution. Current distribution is: "
-                    f"A: {slot_a_count}, B: {slot_b_count}, C: {slot_c_count}. "
-                    f"Valid distributions for 5 days are: A-2/B-2/C-1, A-1/B-2/C-2, or A-2/B-1/C-2."
-                )
-
-    def _handle_delete(self, teacher, data):
+    def _handle_delete(self, rules, teacher, data):
         if 'slot_id' not in data or 'day_of_week' not in data:
             raise DRFValidationError("Both 'slot_id' and 'day_of_week' are required.")
         
-        slot_id = data['slot_id']
-        day_of_week = data['day_of_week']
+        slot_id, day_of_week = self._parse_pick(data)
+        state = rules.state(teacher.id, teacher.dept_id_id)
+        current = state.days(teacher.id).get(day_of_week)
+        if not current or current[1] != slot_id:
+            raise DRFValidationError("Slot assignment not found.")
         
+        TeacherSlotAssignment(id=current[0], teacher=teacher, day_of_week=day_of_week, slot_id=slot_id).delete()
+        state.remove(teacher.id, day_of_week)
+        return {"message": "Slot assignment deleted successfully."}
+
+    def _parse_pick(self, data):
         try:
-            assignment = TeacherSlotAssignment.objects.get(
-                teacher=teacher,
-                slot_id=slot_id,
-                day_of_week=day_of_week
-            )
-            assignment.delete()
-            return {"message": "Slot assignment deleted successfully."}
-        except TeacherSlotAssignment.DoesNotExist:
-            raise DRFValidationError("Slot assignment not found.")
-    
+            slot_id, day_of_week = int(data['slot_id']), int(data['day_of_week'])
+        except (TypeError, ValueError):
+            raise DRFValidationError("slot_id and day_of_week must be integers.")
+        if day_of_week not in DAY_NAMES:
+            raise DRFValidationError(f"Invalid day_of_week: {day_of_week}")
+        return slot_id, day_of_week
+
+
+def process_slot_preference_ticket(user, data):
+    """Run a TeacherSlotPreferenceView request queued in rush mode"""
+    return TeacherSlotPreferenceView().submit(data, SlotRuleCache())
+
+
 class TeacherSlotListView(ListAPIView):
     authentication_classes = [JWTCookieAuthentication]
     permission_classes = [IsAuthenticated]
@@ -280,65 +212,85 @@ class TeacherSlotListView(ListAPIView):
         return Response(serializer.data)
     
     def _calculate_stats(self, queryset):
-        # Get unique teachers and departments in the queryset
-        teacher_ids = queryset.values_list('teacher', flat=True).distinct()
-        dept_ids = Teacher.objects.filter(id__in=teacher_ids).values_list('dept_id', flat=True).distinct()
+        """
+        Statistics of the listed assignments. Per-cell counts come from DepartmentSlotSummary
+        unless the list is narrowed to one teacher; unique teacher counts from two grouped queries.
+        """
+        params = self.request.query_params
+        if params.get('teacher_id'):
+            cells = Counter({
+                (dept_id, day, slot_type): n
+                for dept_id, day, slot_type, n in queryset.values_list(
+                    'teacher__dept_id', 'day_of_week', 'slot__slot_type'
+                ).annotate(n=Count('id'))
+            })
+        else:
+            cells = summary_cells(
+                dept_ids=[params['dept_id']] if params.get('dept_id') else None,
+                day=params.get('day_of_week') or None,
+                slot_type=params.get('slot_type') or None
+            )
+            # Teachers without a department are not in the summary
+            for day, slot_type, n in queryset.filter(teacher__dept_id__isnull=True).values_list(
+                    'day_of_week', 'slot__slot_type').annotate(n=Count('id')):
+                cells[(None, day, slot_type)] += n
+        
+        assigned = dict(queryset.values_list('teacher__dept_id').annotate(n=Count('teacher', distinct=True)))
+        per_slot_type = {
+            (dept_id, slot_type): n
+            for dept_id, slot_type, n in queryset.values_list(
+                'teacher__dept_id', 'slot__slot_type'
+            ).annotate(n=Count('teacher', distinct=True))
+        }
+        departments = {
+            dept_id: (dept_name, n)
+            for dept_id, dept_name, n in Department.objects.filter(
+                id__in=[d for d in assigned if d is not None]
+            ).values_list('id', 'dept_name').annotate(n=Count('department_teachers'))
+        }
         
         stats = {
-            'total_assignments': queryset.count(),
-            'teacher_count': len(teacher_ids),
+            'total_assignments': sum(cells.values()),
+            'teacher_count': sum(assigned.values()),
             'department_distribution': [],
             'slot_type_distribution': {},
             'day_distribution': {}
         }
         
         # Department distribution
-        for dept_id in dept_ids:
-            if dept_id:
-                dept = Department.objects.get(id=dept_id)
-                dept_teachers = Teacher.objects.filter(dept_id=dept_id)
-                dept_teacher_count = dept_teachers.count()
-                
-                dept_stats = {
-                    'department': dept.dept_name,
-                    'total_teachers': dept_teacher_count,
-                    'assigned_teachers': Teacher.objects.filter(
-                        id__in=teacher_ids, 
-                        dept_id=dept_id
-                    ).count(),
-                    'slot_distribution': {}
+        for dept_id, (dept_name, dept_teacher_count) in departments.items():
+            dept_stats = {
+                'department': dept_name,
+                'total_teachers': dept_teacher_count,
+                'assigned_teachers': assigned[dept_id],
+                'slot_distribution': {}
+            }
+            
+            # Slot type distribution per department
+            for slot_type, _ in Slot.SLOT_TYPES:
+                slot_teachers = per_slot_type.get((dept_id, slot_type), 0)
+                dept_stats['slot_distribution'][slot_type] = {
+                    'teacher_count': slot_teachers,
+                    'percentage': round(slot_teachers / dept_teacher_count * 100, 1) if dept_teacher_count > 0 else 0
                 }
-                
-                # Slot type distribution per department
-                for slot_type, _ in Slot.SLOT_TYPES:
-                    slot_teachers = queryset.filter(
-                        teacher__dept_id=dept_id, 
-                        slot__slot_type=slot_type
-                    ).values('teacher').distinct().count()
-                    
-                    dept_stats['slot_distribution'][slot_type] = {
-                        'teacher_count': slot_teachers,
-                        'percentage': round(slot_teachers / dept_teacher_count * 100, 1) if dept_teacher_count > 0 else 0
-                    }
-                
-                stats['department_distribution'].append(dept_stats)
+            
+            stats['department_distribution'].append(dept_stats)
         
         # Overall slot type distribution
         for slot_type, _ in Slot.SLOT_TYPES:
-            stats['slot_type_distribution'][slot_type] = queryset.filter(
-                slot__slot_type=slot_type
-            ).count()
+            stats['slot_type_distribution'][slot_type] = sum(n for (_, _, t), n in cells.items() if t == slot_type)
         
         # Day distribution
         for day_value, day_name in TeacherSlotAssignment.DAYS_OF_WEEK:
-            stats['day_distribution'][day_name] = queryset.filter(
-                day_of_week=day_value
-            ).count()
+            stats['day_distribution'][day_name] = sum(n for (_, d, _), n in cells.items() if d == day_value)
         
         return stats
 
 class DepartmentSlotSummaryView(APIView):
-    """View to provide summary information about department slot allocations"""
+    """
+    View to provide summary information about department slot allocations.
+    Counts come from DepartmentSlotSummary; one more query lists the teachers.
+    """
     authentication_classes = [JWTCookieAuthentication]
     permission_classes = [IsAuthenticated]
     
@@ -353,9 +305,7 @@ class DepartmentSlotSummaryView(APIView):
         except Department.DoesNotExist:
             return Response({"error": "Department not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get all teachers in this department
-        teachers = Teacher.objects.filter(dept_id=dept_id)
-        total_teachers = teachers.count()
+        total_teachers = Teacher.objects.filter(dept_id=department.id).count()
         
         if total_teachers == 0:
             return Response({
@@ -364,106 +314,62 @@ class DepartmentSlotSummaryView(APIView):
                 "message": "No teachers in this department"
             })
         
-        # Get all assignments for teachers in this department
-        assignments = TeacherSlotAssignment.objects.filter(teacher__dept_id=dept_id)
+        cells = summary_cells(dept_ids=[department.id])
+        
+        # Teachers behind the counts, in one query
+        teachers_per_cell = {}
+        teacher_days = {}               # Days each teacher is assigned
+        teachers_per_slot_type = {slot_type: set() for slot_type, _ in Slot.SLOT_TYPES}
+        for teacher_id, day_value, slot_type, first_name, last_name in TeacherSlotAssignment.objects.filter(
+                teacher__dept_id=department.id
+        ).order_by('teacher_id', 'day_of_week').values_list(
+            'teacher_id', 'day_of_week', 'slot__slot_type', 'teacher__teacher_id__first_name',
+            'teacher__teacher_id__last_name'
+        ):
+            name = f"{first_name} {last_name}".strip() if first_name is not None else "Unknown"
+            teachers_per_cell.setdefault((day_value, slot_type), []).append({
+                "id": teacher_id,
+                "name": f"{name} - {department.dept_name}"
+            })
+            teacher_days.setdefault(teacher_id, set()).add(day_value)
+            teachers_per_slot_type.setdefault(slot_type, set()).add(teacher_id)
         
-        # Count teachers with assignments
-        teachers_with_assignments = assignments.values('teacher').distinct().count()
+        def share(count):
+            return round(count / total_teachers * 100, 1)
         
-        # Prepare data structures for proper counting of unique teachers
         slot_distribution = {}
         day_distribution = {}
-        teacher_assignment_count = {}  # Count of days each teacher is assigned
-        teachers_per_slot_type = {}    # Unique teachers per slot type
-        teachers_per_day = {}          # Unique teachers per day
-        
-        # Initialize data structures
-        for slot_type, slot_name in Slot.SLOT_TYPES:
-            slot_distribution[slot_type] = {
-                "name": slot_name,
-                "days": {}
-            }
-            teachers_per_slot_type[slot_type] = set()
-            
-            for day_value, day_name in TeacherSlotAssignment.DAYS_OF_WEEK:
-                slot_distribution[slot_type]["days"][day_name] = {
-                    "teacher_count": 0,
-                    "percentage": 0,
-                    "teachers": []
-                }
-        
         for day_value, day_name in TeacherSlotAssignment.DAYS_OF_WEEK:
             day_distribution[day_name] = {
                 "slot_distribution": {},
-                "total_teachers": 0
+                "total_teachers": sum(cells[(department.id, day_value, slot_type)] for slot_type, _ in Slot.SLOT_TYPES)
             }
-            teachers_per_day[day_name] = set()
-            
-            for slot_type, slot_name in Slot.SLOT_TYPES:
+        for slot_type, slot_name in Slot.SLOT_TYPES:
+            slot_distribution[slot_type] = {"name": slot_name, "days": {}}
+            for day_value, day_name in TeacherSlotAssignment.DAYS_OF_WEEK:
+                count = cells[(department.id, day_value, slot_type)]
+                slot_distribution[slot_type]["days"][day_name] = {
+                    "teacher_count": count,
+                    "percentage": share(count),
+                    "teachers": teachers_per_cell.get((day_value, slot_type), [])
+                }
                 day_distribution[day_name]["slot_distribution"][slot_type] = {
-                    "teacher_count": 0,
-                    "percentage": 0
+                    "teacher_count": count,
+                    "percentage": share(count)
                 }
         
-        # Process all assignments
-        for assignment in assignments:
-            teacher = assignment.teacher
-            teacher_id = teacher.id
-            slot_type = assignment.slot.slot_type
-            day_value = assignment.day_of_week
-            day_name = dict(TeacherSlotAssignment.DAYS_OF_WEEK)[day_value]
-            
-            # Add teacher to slot distribution for this day
-            slot_distribution[slot_type]["days"][day_name]["teacher_count"] += 1
-            slot_distribution[slot_type]["days"][day_name]["teachers"].append({
-                "id": teacher_id,
-                "name": str(teacher)
-            })
-            
-            # Track unique teachers per slot type and day
-            teachers_per_slot_type[slot_type].add(teacher_id)
-            teachers_per_day[day_name].add(teacher_id)
-            
-            # Update teacher assignment count (days per teacher)
-            if teacher_id not in teacher_assignment_count:
-                teacher_assignment_count[teacher_id] = {day_name}
-            else:
-                teacher_assignment_count[teacher_id].add(day_name)
-        
-        # Calculate percentages for slot distribution
-        for slot_type in slot_distribution:
-            for day_name in slot_distribution[slot_type]["days"]:
-                count = slot_distribution[slot_type]["days"][day_name]["teacher_count"]
-                slot_distribution[slot_type]["days"][day_name]["percentage"] = round(count / total_teachers * 100, 1)
-        
-        # Fill in day distribution with unique teacher counts
-        for day_name, teacher_ids in teachers_per_day.items():
-            unique_teachers_count = len(teacher_ids)
-            day_distribution[day_name]["total_teachers"] = unique_teachers_count
-            
-            # Count teachers per slot type on this day
-            for slot_type in slot_distribution:
-                teachers_in_slot_on_day = set()
-                for teacher_data in slot_distribution[slot_type]["days"][day_name]["teachers"]:
-                    teachers_in_slot_on_day.add(teacher_data["id"])
-                
-                slot_teacher_count = len(teachers_in_slot_on_day)
-                day_distribution[day_name]["slot_distribution"][slot_type]["teacher_count"] = slot_teacher_count
-                day_distribution[day_name]["slot_distribution"][slot_type]["percentage"] = round(slot_teacher_count / total_teachers * 100, 1) if total_teachers > 0 else 0
-        
-        # Count teachers by number of assigned days (based on unique days)
+        # Count teachers by number of assigned days
         days_assigned_distribution = {
             "1 day": 0, "2 days": 0, "3 days": 0, "4 days": 0, "5 days": 0
         }
-        
-        for teacher_id, days in teacher_assignment_count.items():
+        for days in teacher_days.values():
             day_count = len(days)
             if 1 <= day_count <= 5:
                 days_assigned_distribution[f"{day_count} day{'s' if day_count > 1 else ''}"] += 1
         
         # Check compliance with 33% per slot rule
         compliance_status = {"status": "Compliant", "issues": []}
-        threshold = int(total_teachers * 0.33 + 0.5) + 1  # Round up and add 1 extra teacher
+        threshold = department_cap(total_teachers)
         
         for slot_type, slot_data in slot_distribution.items():
             for day_name, day_data in slot_data["days"].items():
@@ -474,19 +380,17 @@ class DepartmentSlotSummaryView(APIView):
                         f"({day_data['percentage']}%), exceeding the 33% + 1 threshold of {threshold} teachers."
                     )
         
-        # Calculate slot type summary (unique teachers assigned to each slot type)
-        slot_type_summary = {}
-        for slot_type, teacher_ids in teachers_per_slot_type.items():
-            slot_type_summary[slot_type] = {
-                "teacher_count": len(teacher_ids),
-                "percentage": round(len(teacher_ids) / total_teachers * 100, 1) if total_teachers > 0 else 0
-            }
+        # Unique teachers assigned to each slot type
+        slot_type_summary = {
+            slot_type: {"teacher_count": len(teacher_ids), "percentage": share(len(teacher_ids))}
+            for slot_type, teacher_ids in teachers_per_slot_type.items()
+        }
         
         result = {
             "department": department.dept_name,
             "total_teachers": total_teachers,
-            "teachers_with_assignments": teachers_with_assignments,
-            "unassigned_teachers": total_teachers - teachers_with_assignments,
+            "teachers_with_assignments": len(teacher_days),
+            "unassigned_teachers": total_teachers - len(teacher_days),
             "slot_distribution": slot_distribution,
             "day_distribution": day_distribution,
             "days_assigned_distribution": days_assigned_distribution,
@@ -567,6 +471,90 @@ class InitializeDefaultSlotsView(APIView):
             'message': f"Created {len(created_slots)} new slots. {len(existing_slots)} slots already existed."
         })
 
+class DepartmentSlotPlanView(APIView):
+    """
+    Propose (or commit with "commit": true) a complete, rule-compliant slot assignment
+    for every teacher of a department, keeping existing picks and availability
+    """
+    authentication_classes = [JWTCookieAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        dept_id = request.data.get('dept_id')
+        commit = str(request.data.get('commit', '')).lower() in ('1', 'true')
+        
+        if not dept_id:
+            return Response({"error": "Department ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            department = Department.objects.get(id=dept_id)
+        except Department.DoesNotExist:
+            return Response({"error": "Department not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        with transaction.atomic():
+            if commit:
+                # Serialize concurrent commits and picks for the same department
+                list(Teacher.objects.select_for_update().filter(dept_id=dept_id).values_list('id', flat=True))
+                list(DepartmentSlotSummary.objects.select_for_update().filter(
+                    department_id=dept_id).values_list('id', flat=True))
+            
+            plan = plan_department(department.id)
+            missing_types = set(SLOT_TYPES) - set(plan['window_slots'])
+            if missing_types:
+                return Response(
+                    {"error": f"No slot defined for slot type(s) {', '.join(sorted(missing_types))}. "
+                              f"Initialize the default slots first."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            violations = plan['planner'].violations()
+            created = new_assignments(plan)
+            if commit and not violations:
+                TeacherSlotAssignment.objects.bulk_create(created)
+                types = slot_types(assignment.slot_id for assignment in created)
+                adjust_summary(Counter(
+                    (department.id, assignment.day_of_week, types[assignment.slot_id]) for assignment in created
+                ))
+                assignments_bulk_changed.send(sender=TeacherSlotAssignment, dept_ids=[department.id])
+        
+        day_names = dict(TeacherSlotAssignment.DAYS_OF_WEEK)
+        teachers = {t.id: str(t) for t in Teacher.objects.filter(id__in=list(plan['plans']) + plan['unplanned'])}
+        proposals = []
+        for teacher_id, days in plan['plans'].items():
+            current = plan['existing'].get(teacher_id, {})
+            proposals.append({
+                "teacher_id": teacher_id,
+                "teacher_name": teachers.get(teacher_id),
+                "assignments": [
+                    {
+                        "day_of_week": day,
+                        "day_name": day_names[day],
+                        "slot_type": slot_type,
+                        "slot_id": plan['window_slots'][slot_type],
+                        "existing": day in current,
+                    }
+                    for day, slot_type in sorted(days.items())
+                ],
+            })
+        
+        return Response({
+            "department": department.dept_name,
+            "total_teachers": plan['total_teachers'],
+            "max_teachers_per_slot": plan['planner'].cap,
+            "committed": commit and not violations,
+            "new_assignments": len(created),
+            "proposals": proposals,
+            "unplanned_teachers": [
+                {"teacher_id": teacher_id, "teacher_name": teachers.get(teacher_id),
+                 "reason": "Existing picks or availability leave no rule-compliant week"}
+                for teacher_id in plan['unplanned']
+            ],
+            "cap_violations": [
+                {"day_of_week": day, "day_name": day_names[day], "slot_type": slot_type, "teacher_count": count}
+                for day, slot_type, count in violations
+            ],
+        }, status=status.HTTP_201_CREATED if commit and not violations else status.HTTP_200_OK)
+
 class BatchTeacherSlotAssignmentView(APIView):
     """
     View to handle batch assignment operations for multiple teachers and slots
@@ -580,22 +568,13 @@ class BatchTeacherSlotAssignmentView(APIView):
         
         if not assignments:
             return Response({"error": "No assignments provided."}, status=status.HTTP_400_BAD_REQUEST)
-
-        results = []
-        success_count = 0
         
         # Close existing connections to prevent database locks
         from django.db import connections
         for conn in connections.all():
             conn.close_if_unusable_or_obsolete()
         
-        # Process in smaller batches to reduce lock contention
-        batch_size = 10
-        for i in range(0, len(assignments), batch_size):
-            batch = assignments[i:i+batch_size]
-            batch_results, batch_success_count = self._process_batch(batch)
-            results.extend(batch_results)
-            success_count += batch_success_count
+        results, success_count = self._process_batch(SlotRuleCache.for_request(request), assignments)
         
         if success_count == 0:
             status_code = status.HTTP_400_BAD_REQUEST
@@ -613,15 +592,18 @@ class BatchTeacherSlotAssignmentView(APIView):
             status=status_code
         )
     
-    def _process_batch(self, batch):
+    def _process_batch(self, rules, batch):
+        """
+        Validate the whole batch in memory, pick by pick, against the departments' current
+        picks (later picks see the earlier ones), then write the net changes in one transaction
+        """
         results = []
-        success_count = 0
-        
+        items = []
         for assignment in batch:
             teacher_id = assignment.get('teacher_id')
             slot_id = assignment.get('slot_id')
             day_of_week = assignment.get('day_of_week')
-            action = assignment.get('action', 'create').lower()
+            action = str(assignment.get('action', 'create')).lower()
             
             result = {
                 "action": action,
@@ -630,171 +612,94 @@ class BatchTeacherSlotAssignmentView(APIView):
                 "day_of_week": day_of_week,
                 "success": False
             }
+            results.append(result)
             
             # Skip if missing required fields
             if not all([teacher_id, slot_id, day_of_week is not None]):
                 result["error"] = "Missing required fields: teacher_id, slot_id, or day_of_week"
-                results.append(result)
                 continue
-            
             try:
-                # Use a separate transaction for each assignment to prevent lock issues
-                with transaction.atomic():
-                    # Fetch teacher and slot
-                    try:
-                        teacher = Teacher.objects.get(id=teacher_id)
-                    except Teacher.DoesNotExist:
-                        raise DRFValidationError(f"Teacher with id {teacher_id} does not exist.")
-                    
-                    try:
-                        slot = Slot.objects.get(pk=slot_id)
-                    except Slot.DoesNotExist:
-                        raise DRFValidationError(f"Slot with id {slot_id} does not exist.")
-                    
-                    if action in ['create', 'update']:
-                        # Check 5-day week constraint
-                        current_days = TeacherSlotAssignment.objects.filter(
-                            teacher=teacher
-                        ).values_list('day_of_week', flat=True).distinct()
-                        
-                        if len(current_days) >= 5 and day_of_week not in current_days:
-                            raise DRFValidationError("Teacher already has assignments for 5 days. Maximum is 5 days per week.")
-                        
-                        # Check Monday/Saturday constraint - only one of these days allowed
-                        if day_of_week in TeacherSlotAssignment.RESTRICTED_DAYS:
-                            restricted_day_assignments = TeacherSlotAssignment.objects.filter(
-                                teacher=teacher,
-                                day_of_week__in=TeacherSlotAssignment.RESTRICTED_DAYS
-                            ).exclude(day_of_week=day_of_week)
-                            
-                            if restricted_day_assignments.exists():
-                                restricted_day = dict(TeacherSlotAssignment.DAYS_OF_WEEK)[restricted_day_assignments.first().day_of_week]
-                                raise DRFValidationError(
-                                    f"Teacher already has a slot assigned for {restricted_day}. "
-                                    f"Teachers can only choose one of these days: Monday or Saturday."
-                                )
-                        
-                        # Check slot type distribution constraint
-                        # Get all current assignments for this teacher
-                        current_assignments = list(TeacherSlotAssignment.objects.filter(
-                            teacher=teacher
-                        ).exclude(day_of_week=day_of_week).values_list('slot__slot_type', flat=True))
-                        
-                        # Add the new slot type to the distribution
-                        current_assignments.append(slot.slot_type)
-                        
-                        # Count occurrences of each slot type
-                        slot_type_counts = Counter(current_assignments)
-                        total_assignments = len(current_assignments)
-                        
-                        # Don't need to check if less than 5 assignments
-                        if total_assignments > 5:
-                            raise DRFValidationError("Teacher cannot have more than 5 slot assignments in total.")
-                        
-                        # When we reach 5 assignments, ensure we have a valid combination
-                        if total_assignments == 5:
-                            # Valid combinations
-                            valid_combinations = [
-                                # Format: {A: count, B: count, C: count}
-                                {'A': 2, 'B': 2, 'C': 1},
-                                {'A': 1, 'B': 2, 'C': 2},
-                                {'A': 2, 'B': 1, 'C': 2}
-                            ]
-                            
-                            is_valid = False
-                            for combo in valid_combinations:
-                                if all(slot_type_counts.get(slot_type, 0) == count for slot_type, count in combo.items()):
-                                    is_valid = True
-                                    break
-                            
-                            if not is_valid:
-                                slot_a_count = slot_type_counts.get('A', 0)
-                                slot_b_count = slot_type_counts.get('B', 0)
-                                slot_c_count = slot_type_counts.get('C', 0)
-                                
-                                raise DRFValidationError(
-                                    f"Invalid slot distribution. Current distribution is: "
-                                    f"A: {slot_a_count}, B: {slot_b_count}, C: {slot_c_count}. "
-                                    f"Valid distributions for 5 days are: A-2/B-2/C-1, A-1/B-2/C-2, or A-2/B-1/C-2."
-                                )
-                        
-                        # Check department distribution constraint (33% per slot type)
-                        if teacher.dept_id:
-                            dept_id = teacher.dept_id.id
-                            total_dept_teachers = Teacher.objects.filter(dept_id=dept_id).count()
-                            
-                            if total_dept_teachers > 0:
-                                # Get count of teachers in this department assigned to this slot type on this day
-                                teachers_in_slot = TeacherSlotAssignment.objects.filter(
-                                    teacher__dept_id=dept_id,
-                                    day_of_week=day_of_week,
-                                    slot__slot_type=slot.slot_type
-                                ).values('teacher').distinct().count()
-                                
-                                # Calculate max teachers allowed (33% of department + 1 extra teacher)
-                                max_teachers_per_slot = int((total_dept_teachers * 0.33) + 0.5) + 1  # Adding 1 to allow one extra teacher
-                                
-                                if teachers_in_slot >= max_teachers_per_slot:
-                                    raise DRFValidationError(
-                                        f"Maximum number of teachers (33% + 1) from department {teacher.dept_id.dept_name} "
-                                        f"already assigned to slot type {slot.slot_type} on {dict(TeacherSlotAssignment.DAYS_OF_WEEK)[day_of_week]}."
-                                    )
-                        
-                        # Create or update assignment
-                        assignment_obj, created = TeacherSlotAssignment.objects.get_or_create(
-                            teacher=teacher,
-                            day_of_week=day_of_week,
-                            defaults={'slot': slot}
-                        )
-                        
-                        if not created:
-                            assignment_obj.slot = slot
-                            assignment_obj.full_clean()
-                            assignment_obj.save()
-                            result["message"] = "Slot assignment updated successfully."
-                        else:
-                            result["message"] = "Slot assignment created successfully."
-                        
-                        result["success"] = True
-                        success_count += 1
-                    elif action == 'delete':
-                        try:
-                            assignment_obj = TeacherSlotAssignment.objects.get(
-                                teacher=teacher,
-                                day_of_week=day_of_week
-                            )
-                            assignment_obj.delete()
-                            result["message"] = "Slot assignment deleted successfully."
-                            result["success"] = True
-                            success_count += 1
-                        except TeacherSlotAssignment.DoesNotExist:
-                            raise DRFValidationError("Slot assignment not found.")
-                    else:
-                        raise DRFValidationError(f"Invalid action: {action}")
+                items.append((result, int(teacher_id), int(slot_id), int(day_of_week), action))
+            except (TypeError, ValueError):
+                result["error"] = "teacher_id, slot_id and day_of_week must be integers"
+        
+        if not items:
+            return results, 0
+        
+        success_count = 0
+        with transaction.atomic():
+            teacher_depts = dict(Teacher.objects.filter(
+                id__in={item[1] for item in items}
+            ).values_list('id', 'dept_id'))
+            slot_types = rules.slot_types
             
-            except (ValidationError, DRFValidationError) as e:
-                if hasattr(e, 'message_dict'):
-                    result["error"] = e.message_dict
-                elif hasattr(e, 'detail'):
-                    # Handle DRF validation errors which have a detail attribute
-                    if isinstance(e.detail, list) and len(e.detail) > 0:
-                        # If it's a list of error details, get the first one
-                        error_detail = e.detail[0]
-                        if hasattr(error_detail, 'string'):
-                            # Direct access to the string representation
-                            result["error"] = error_detail.string
-                        else:
-                            # Fallback to str representation
-                            result["error"] = str(error_detail)
-                    else:
-                        # Otherwise, convert the detail to string
-                        result["error"] = str(e.detail)
+            # Lock the departments' teachers and cap counters so concurrent picks cannot slip past the 33% cap
+            dept_ids = set(teacher_depts.values()) - {None}
+            list(Teacher.objects.select_for_update().filter(dept_id__in=dept_ids).values_list('id', flat=True))
+            list(DepartmentSlotSummary.objects.select_for_update().filter(
+                department_id__in=dept_ids).values_list('id', flat=True))
+            rules.load(teacher_depts)
+            states = rules.states
+            original = {
+                teacher_id: dict(states[state_key(dept_id, teacher_id)].days(teacher_id))
+                for teacher_id, dept_id in teacher_depts.items()
+            }
+            
+            for result, teacher_id, slot_id, day_of_week, action in items:
+                if teacher_id not in teacher_depts:
+                    result["error"] = f"Teacher with id {teacher_id} does not exist."
+                    continue
+                if slot_id not in slot_types:
+                    result["error"] = f"Slot with id {slot_id} does not exist."
+                    continue
+                if day_of_week not in DAY_NAMES:
+                    result["error"] = f"Invalid day_of_week: {day_of_week}"
+                    continue
+                state = states[state_key(teacher_depts[teacher_id], teacher_id)]
+                
+                if action in ['create', 'update']:
+                    errors = state.violations(teacher_id, day_of_week, slot_types[slot_id])
+                    if errors:
+                        result["error"] = errors[0]
+                        continue
+                    verb = "updated" if day_of_week in state.days(teacher_id) else "created"
+                    state.apply(teacher_id, day_of_week, slot_id, slot_types[slot_id])
+                    result["message"] = f"Slot assignment {verb} successfully."
+                elif action == 'delete':
+                    if state.remove(teacher_id, day_of_week) is None:
+                        result["error"] = "Slot assignment not found."
+                        continue
+                    result["message"] = "Slot assignment deleted successfully."
                 else:
-                    # Regular string errors
-                    result["error"] = str(e)
-            except Exception as e:
-                result["error"] = str(e)
+                    result["error"] = f"Invalid action: {action}"
+                    continue
+                result["success"] = True
+                success_count += 1
             
-            results.append(result)
-        
-        return results, success_count
\ No newline at end of file
+            # Net changes per teacher and day
+            created, updated, deleted = [], [], []
+            summary = Counter()
+            for teacher_id, before in original.items():
+                dept_id = teacher_depts[teacher_id]
+                after = states[state_key(dept_id, teacher_id)].days(teacher_id)
+                for day, (assignment_id, slot_id, slot_type) in before.items():
+                    if day not in after:
+                        deleted.append(assignment_id)
+                        continue
+                    if after[day][1] != slot_id:
+                        updated.append(TeacherSlotAssignment(id=assignment_id, slot_id=after[day][1]))
+                    summary[(dept_id, day, slot_type)] -= 1
+                for day, (_, slot_id, slot_type) in after.items():
+                    if day not in before:
+                        created.append(TeacherSlotAssignment(teacher_id=teacher_id, day_of_week=day, slot_id=slot_id))
+                    summary[(dept_id, day, slot_type)] += 1
+            
+            # Deletes update the summary through signals; bulk writes send none, so they do it here
+            TeacherSlotAssignment.objects.filter(id__in=deleted).delete()
+            TeacherSlotAssignment.objects.bulk_update(updated, ['slot'], batch_size=1000)
+            TeacherSlotAssignment.objects.bulk_create(created, batch_size=1000)
+            adjust_summary(summary)
+            if updated or created:
+                assignments_bulk_changed.send(sender=TeacherSlotAssignment, dept_ids=dept_ids)
+        
+        return results, success_count
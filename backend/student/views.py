@@ -8,6 +8,7 @@ from authentication.authentication import IsAuthenticated
 from .models import Student
 from .serializers import StudentSerializer
 from department.models import Department
+from authentication.caller import get_caller
 from django.db.models import Q
 from studentCourse.models import StudentCourse
 
@@ -27,7 +28,7 @@ class StudentListCreateView(generics.ListCreateAPIView):
         user = self.request.user
         
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             queryset = Student.objects.filter(dept_id=hod_dept)
             
             # Handle search
@@ -62,7 +63,7 @@ class StudentListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         user = self.request.user
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             
             if serializer.validated_data.get('dept_id') != hod_dept:
                 raise serializers.ValidationError(
@@ -85,7 +86,7 @@ class StudentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
         
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             return Student.objects.filter(dept_id=hod_dept)
         except Department.DoesNotExist:
             return Student.objects.none()
@@ -93,7 +94,7 @@ class StudentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         user = self.request.user
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             instance = self.get_object()
             
             if 'dept_id' in serializer.validated_data:
@@ -116,7 +117,7 @@ class StudentStatsView(APIView):
         user = self.request.user
         
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             students = Student.objects.filter(dept_id=hod_dept)
             
             # Get counts by year
@@ -211,7 +212,7 @@ class StudentProfileView(APIView):
             
         try:
             # Get the student profile for the current user
-            student = Student.objects.filter(student_id=request.user).select_related('dept_id').first()
+            student = get_caller(request).student
             
             if not student:
                 return Response(
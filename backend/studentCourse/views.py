@@ -6,13 +6,16 @@ from authentication.authentication import IsAuthenticated, CustomIsAuthenticated
 from .models import StudentCourse, StudentCoursePreference
 from .serializers import StudentCourseSerializer, StudentCoursePreferenceSerializer
 from department.models import Department
+from authentication.caller import caller_for_user, get_caller
 from utlis.pagination import PagePagination
 from django.db.models import Q, Sum
 from course.models import Course
 from teacher.models import Teacher
 from teacherCourse.models import TeacherCourse
 from slot.models import Slot
-from timetable.models import Timetable, TimetableChange
+from timetable.occupancy import get_occupancy_index
+from admission.tickets import enqueue_response, rush_mode, ticket_request
+from django.db import transaction
 from django.utils import timezone
 from datetime import datetime
 import logging
@@ -28,7 +31,7 @@ class StudentCourseListCreateView(generics.ListCreateAPIView):
         user = self.request.user
         
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             return StudentCourse.objects.filter(
                 student_id__dept_id=hod_dept,
                 course_id__for_dept_id=hod_dept
@@ -39,7 +42,7 @@ class StudentCourseListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         user = self.request.user
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             student = serializer.validated_data['student_id']
             course = serializer.validated_data['course_id']
             
@@ -64,7 +67,7 @@ class StudentCourseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVi
         user = self.request.user
         
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             return StudentCourse.objects.filter(
                 student_id__dept_id=hod_dept,
                 course_id__for_dept_id=hod_dept
@@ -75,7 +78,7 @@ class StudentCourseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVi
     def perform_update(self, serializer):
         user = self.request.user
         try:
-            hod_dept = Department.objects.get(hod_id=user)
+            hod_dept = get_caller(self.request).get_hod_department()
             instance = self.get_object()
             
             serializer.save()
@@ -84,6 +87,31 @@ class StudentCourseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVi
                 {"detail": "Only HOD can update student course enrollments."}
             )
 
+def save_enrollment(serializer, user):
+    # Automatically set student if request is from student
+    if user.user_type == 'student':
+        student = caller_for_user(user).student
+        if student:
+            serializer.save(student_id=student)
+        else:
+            raise serializers.ValidationError("Student profile not found")
+    else:
+        serializer.save()
+
+
+def process_enrollment_ticket(user, data):
+    """Run a StudentCourseViewSet create request queued in rush mode"""
+    serializer = StudentCourseSerializer(data=data, context={'request': ticket_request(user)})
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    try:
+        with transaction.atomic():
+            save_enrollment(serializer, user)
+    except serializers.ValidationError as e:
+        return e.detail, status.HTTP_400_BAD_REQUEST
+    return serializer.data, status.HTTP_201_CREATED
+
+
 class StudentCourseViewSet(viewsets.ModelViewSet):
     serializer_class = StudentCourseSerializer
     authentication_classes = [IsAuthenticated]
@@ -118,7 +146,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
             # Get student profile
             student = None
             if hasattr(request.user, 'student_profile'):
-                student = request.user.student_profile.first()
+                student = get_caller(request).student
                 
             if not student:
                 logger.warning(f"No student profile found for user {request.user.pk}")
@@ -288,7 +316,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        student = request.user.student_profile.first()
+        student = get_caller(request).student
         if not student:
             return Response(
                 {"detail": "Student profile not found"},
@@ -376,7 +404,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
             
             # If user is a student, verify they should have access to this course
             if request.user.user_type == 'student':
-                student = request.user.student_profile.first()
+                student = get_caller(request).student
                 if student and student.dept_id and course.for_dept_id:
                     # Check if course is for student's department and semester
                     if student.dept_id.id != course.for_dept_id.id:
@@ -446,7 +474,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
                 
             # If user is a student, verify they should have access to this course
             if request.user.user_type == 'student':
-                student = request.user.student_profile.first()
+                student = get_caller(request).student
                 if student and student.dept_id and course.for_dept_id:
                     # Check if course is for student's department and semester
                     if student.dept_id.id != course.for_dept_id.id:
@@ -470,42 +498,22 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
 
             # First check if there's an OR-Tools-generated timetable for this teacher-course
             # Get slots from the timetable where this teacher-course is assigned
-            timetable_entries = Timetable.objects.filter(
-                course_assignment=teacher_course
-            ).select_related('slot', 'room')
+            timetable_data = get_occupancy_index().section_schedule(teacher_course.id)
             
-            if timetable_entries.exists():
+            if timetable_data:
                 logger.info(f"Found OR-Tools-generated timetable entries for teacher {teacher_id_int} and course {course_id_int}")
                 
-                # Format the response with timetable entries
-                timetable_data = []
-                for entry in timetable_entries:
-                    timetable_data.append({
-                        "id": entry.slot.id,
-                        "slot_name": entry.slot.slot_name,
-                        "day_of_week": entry.get_day_of_week_display(),
-                        "start_time": entry.slot.start_time.strftime('%H:%M') if entry.slot.start_time else None,
-                        "end_time": entry.slot.end_time.strftime('%H:%M') if entry.slot.end_time else None,
-                        "room": {
-                            "id": entry.room.id,
-                            "room_number": entry.room.room_number,
-                            "room_name": entry.room.room_name
-                        },
-                        "is_from_timetable": True,
-                        "course_assignment": entry.course_assignment.id
-                    })
-                
                 # Check if slots are already assigned to this student for other courses
                 if request.user.user_type == 'student':
-                    student = request.user.student_profile.first()
+                    student = get_caller(request).student
                     if student:
                         # Get slots already assigned to this student
-                        occupied_slot_ids = StudentCourse.objects.filter(
+                        occupied_slot_ids = set(StudentCourse.objects.filter(
                             student_id=student,
                             status='approved'
                         ).exclude(
                             course_id=course_id_int  # Exclude current course
-                        ).values_list('slot_id', flat=True)
+                        ).values_list('slot_id', flat=True))
                         
                         # Filter out any timetable entries with conflicting slots
                         timetable_data = [entry for entry in timetable_data 
@@ -531,7 +539,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
                 
                 # Check if slots are already assigned to this student for other courses
                 if request.user.user_type == 'student':
-                    student = request.user.student_profile.first()
+                    student = get_caller(request).student
                     if student:
                         # Get slots already assigned to this student
                         student_occupied_slots = StudentCourse.objects.filter(
@@ -591,16 +599,13 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
         )
 
+    def create(self, request, *args, **kwargs):
+        if rush_mode('student_course'):
+            return enqueue_response(request, 'student_course')
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        # Automatically set student if request is from student
-        if self.request.user.user_type == 'student':
-            student = self.request.user.student_profile.first()
-            if student:
-                serializer.save(student_id=student)
-            else:
-                raise ValidationError("Student profile not found")
-        else:
-            serializer.save()
+        save_enrollment(serializer, self.request.user)
 
     @action(detail=False, methods=['GET'])
     def debug_info(self, request):
@@ -617,7 +622,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
             # Try to get student profile
             student = None
             if hasattr(request.user, 'student_profile'):
-                student = request.user.student_profile.first()
+                student = get_caller(request).student
             
             if student:
                 student_info = {
@@ -697,42 +702,22 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
             
             # First check if there's an OR-Tools-generated timetable for this teacher-course
             # Get slots from the timetable where this teacher-course is assigned
-            timetable_entries = Timetable.objects.filter(
-                course_assignment=teacher_course
-            ).select_related('slot', 'room')
+            timetable_data = get_occupancy_index().section_schedule(teacher_course.id)
             
-            if timetable_entries.exists():
+            if timetable_data:
                 logger.info(f"Found OR-Tools-generated timetable entries for teacher {teacher_id_int} and course {course_id_int}")
                 
-                # Format the response with timetable entries
-                timetable_data = []
-                for entry in timetable_entries:
-                    timetable_data.append({
-                        "id": entry.slot.id,
-                        "slot_name": entry.slot.slot_name,
-                        "day_of_week": entry.get_day_of_week_display(),
-                        "start_time": entry.slot.start_time.strftime('%H:%M') if entry.slot.start_time else None,
-                        "end_time": entry.slot.end_time.strftime('%H:%M') if entry.slot.end_time else None,
-                        "room": {
-                            "id": entry.room.id,
-                            "room_number": entry.room.room_number,
-                            "room_name": entry.room.room_name
-                        },
-                        "is_from_timetable": True,
-                        "course_assignment": entry.course_assignment.id
-                    })
-                
                 # Check if slots are already assigned to this student for other courses
                 if hasattr(request, 'user') and request.user.is_authenticated and request.user.user_type == 'student':
-                    student = request.user.student_profile.first()
+                    student = get_caller(request).student
                     if student:
                         # Get slots already assigned to this student
-                        occupied_slot_ids = StudentCourse.objects.filter(
+                        occupied_slot_ids = set(StudentCourse.objects.filter(
                             student_id=student,
                             status='approved'
                         ).exclude(
                             course_id=course_id_int  # Exclude current course
-                        ).values_list('slot_id', flat=True)
+                        ).values_list('slot_id', flat=True))
                         
                         # Filter out any timetable entries with conflicting slots
                         timetable_data = [entry for entry in timetable_data 
@@ -758,7 +743,7 @@ class StudentCourseViewSet(viewsets.ModelViewSet):
                 
                 # Check if slots are already assigned to this student for other courses
                 if hasattr(request, 'user') and request.user.is_authenticated and request.user.user_type == 'student':
-                    student = request.user.student_profile.first()
+                    student = get_caller(request).student
                     if student:
                         # Get slots already assigned to this student
                         student_occupied_slots = StudentCourse.objects.filter(
@@ -3,6 +3,7 @@ from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from authentication.authentication import IsAuthenticated
+from authentication.caller import get_caller
 from .models import Teacher, TeacherAvailability
 from .serializers import (
     TeacherSerializer, CreateTeacherSerializer, UpdateTeacherSerializer,
@@ -121,14 +122,10 @@ class TeacherListView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         
-        try:
-            hod_dept = Teacher.objects.get(
-                teacher_id=user,
-                teacher_role='HOD'
-            ).dept_id
-            return Teacher.objects.filter(dept_id=hod_dept)
-        except Teacher.DoesNotExist:
-            return Teacher.objects.filter(teacher_id=user)
+        teacher = get_caller(self.request).teacher
+        if teacher and teacher.teacher_role == 'HOD':
+            return Teacher.objects.filter(dept_id=teacher.dept_id)
+        return Teacher.objects.filter(teacher_id=user)
             
     def get(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -174,11 +171,12 @@ class TeacherDetailView(generics.RetrieveUpdateAPIView):
         teacher = get_object_or_404(Teacher, id=teacher_id)
         
         user = self.request.user
-        is_hod = Teacher.objects.filter(
-            teacher_id=user,
-            teacher_role='HOD',
-            dept_id=teacher.dept_id
-        ).exists()
+        caller_teacher = get_caller(self.request).teacher
+        is_hod = bool(
+            caller_teacher and
+            caller_teacher.teacher_role == 'HOD' and
+            caller_teacher.dept_id_id == teacher.dept_id_id
+        )
         
         if not is_hod and teacher.teacher_id != user:
             self.permission_denied(
@@ -232,26 +230,22 @@ class TeacherAvailabilityViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Only return availability slots for teachers the user has permission to view"""
-        user = self.request.user
+        teacher = get_caller(self.request).teacher
+        if teacher is None:
+            return TeacherAvailability.objects.none()
         
         # Check if user is an HOD
-        try:
-            hod_teacher = Teacher.objects.get(teacher_id=user, teacher_role='HOD')
+        if teacher.teacher_role == 'HOD':
             # HODs can see all availability slots for teachers in their department
-            return TeacherAvailability.objects.filter(teacher__dept_id=hod_teacher.dept_id)
-        except Teacher.DoesNotExist:
-            # Regular teachers can only see their own availability slots
-            try:
-                teacher = Teacher.objects.get(teacher_id=user)
-                return TeacherAvailability.objects.filter(teacher=teacher)
-            except Teacher.DoesNotExist:
-                return TeacherAvailability.objects.none()
+            return TeacherAvailability.objects.filter(teacher__dept_id=teacher.dept_id)
+        # Regular teachers can only see their own availability slots
+        return TeacherAvailability.objects.filter(teacher=teacher)
     
     @action(detail=False, methods=['get'])
     def my_availability(self, request):
         """Get the current teacher's availability slots"""
         try:
-            teacher = Teacher.objects.get(teacher_id=request.user)
+            teacher = get_caller(request).get_teacher()
             availability = TeacherAvailability.objects.filter(teacher=teacher)
             serializer = self.get_serializer(availability, many=True)
             return Response(serializer.data)
@@ -3,6 +3,7 @@ from rest_framework import generics, permissions, status, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from authentication.authentication import IsAuthenticated
+from authentication.caller import get_caller
 from .models import TeacherCourse
 from .serializers import TeacherCourseSerializer
 from department.models import Department
@@ -23,7 +24,7 @@ class TeacherCourseListView(generics.ListCreateAPIView):
             return TeacherCourse.objects.all()
             
         try:
-            teacher = Teacher.objects.get(teacher_id=user)
+            teacher = get_caller(self.request).get_teacher()
             
             # If user is HOD, return all department assignments
             if teacher.teacher_role == 'HOD' and teacher.dept_id:
@@ -57,7 +58,7 @@ class TeacherCourseListView(generics.ListCreateAPIView):
             except ValidationError as e:
                 raise serializers.ValidationError(e.message_dict if hasattr(e, 'message_dict') else str(e))
         try:
-            teacher = Teacher.objects.get(teacher_id=user)
+            teacher = get_caller(self.request).get_teacher()
             teacher_to_assign = serializer.validated_data['teacher_id']
             course = serializer.validated_data['course_id']
             if teacher_to_assign.resignation_status == 'resigned':
@@ -105,7 +106,7 @@ class TeacherCourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             return TeacherCourse.objects.all()
         
         try:
-            teacher = Teacher.objects.get(teacher_id=user)
+            teacher = get_caller(self.request).get_teacher()
             
             # If user is HOD, return all department assignments
             if teacher.teacher_role == 'HOD' and teacher.dept_id:
@@ -136,7 +137,7 @@ class TeacherCourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             return
             
         try:
-            teacher = Teacher.objects.get(teacher_id=user)
+            teacher = get_caller(self.request).get_teacher()
             
             # Only HOD can update assignments
             if teacher.teacher_role != 'HOD':
@@ -181,7 +182,7 @@ class TeacherCourseDetailView(generics.RetrieveUpdateDestroyAPIView):
             return
             
         try:
-            teacher = Teacher.objects.get(teacher_id=user)
+            teacher = get_caller(self.request).get_teacher()
             
             # Only HOD can delete assignments
             if teacher.teacher_role != 'HOD':
@@ -211,7 +212,7 @@ class TeacherAssignmentsByTeacherView(APIView):
             if not (user.is_superuser or user.is_staff):
                 try:
                     # Check if the user is requesting their own data or is an HOD
-                    user_teacher = Teacher.objects.get(teacher_id=user)
+                    user_teacher = get_caller(request).get_teacher()
                     
                     # If user is not HOD and not requesting their own data, deny
                     if user_teacher.teacher_role != 'HOD' and user_teacher.id != teacher_id:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Timetable, TimetableChange
+from .models import Timetable, TimetableChange, TimetableVersion
 from unfold.admin import ModelAdmin
 from django import forms
 
@@ -75,5 +75,19 @@ class TimetableChangeAdmin(ModelAdmin):
         }),
     )
 
+class TimetableVersionAdmin(ModelAdmin):
+    list_display = ('name', 'source', 'config', 'entry_count', 'created_by', 'created_at')
+    list_filter = ('source', 'created_at')
+    search_fields = ('name', 'note')
+    exclude = ('data',)
+    readonly_fields = ('name', 'config', 'created_by', 'created_at', 'source', 'note', 'entry_count', 'checksum')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Timetable, TimetableAdmin)
 admin.site.register(TimetableChange, TimetableChangeAdmin)
+admin.site.register(TimetableVersion, TimetableVersionAdmin)
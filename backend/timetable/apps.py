@@ -5,3 +5,6 @@ class TimetableConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'timetable'
     verbose_name = 'Timetable Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
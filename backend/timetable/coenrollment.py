@@ -0,0 +1,225 @@
+"""
+Student co-enrollment conflict graph.
+
+Two courses conflict when at least one student is enrolled in both, so their
+sessions must never overlap. The group rule in the solver already keeps the
+regular (NE) courses of one department/year/semester apart, but it lets all
+PE (or all OE) courses of a group share a period on the assumption that a
+student picks one of each. StudentCourse tells us when that assumption is
+wrong, and which courses of *other* groups a student also attends.
+
+CoEnrollmentMatrix builds a sparse, symmetric course x course matrix of shared
+student counts from StudentCourse in one query, with NumPy only: enrollments
+are sorted by student, every student's courses are paired up, and identical
+(course, course) pairs are counted with np.unique. Only the upper triangle is
+kept, as sorted (row, col) keys, so lookups are a binary search.
+"""
+import numpy as np
+
+# Enrollments that count towards a conflict; rejected requests never attend
+COUNTED_STATUSES = ('approved', 'pending')
+
+# Courses sharing fewer students than this are not treated as conflicting
+MIN_SHARED_STUDENTS = 1
+
+
+def _pair_counts(student_pos, course_pos, n_courses):
+    """(rows, cols, counts) of every course pair two or more enrollments of one student form"""
+    order = np.lexsort((course_pos, student_pos))
+    students, courses = student_pos[order], course_pos[order]
+    if not len(students):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # A student enrolled twice in the same course is counted once
+    keep = np.ones(len(students), dtype=bool)
+    keep[1:] = (students[1:] != students[:-1]) | (courses[1:] != courses[:-1])
+    students, courses = students[keep], courses[keep]
+
+    # Pair every enrollment with the later enrollments of the same student
+    n = len(students)
+    starts = np.flatnonzero(np.r_[True, students[1:] != students[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    ends = np.repeat(starts + lengths, lengths)
+    later = ends - np.arange(n) - 1
+    first = np.repeat(np.arange(n), later)
+    second = first + 1 + np.arange(later.sum()) - np.repeat(np.cumsum(later) - later, later)
+
+    keys, counts = np.unique(courses[first].astype(np.int64) * n_courses + courses[second], return_counts=True)
+    return keys // n_courses, keys % n_courses, counts
+
+
+class CoEnrollmentMatrix:
+    """
+    course_ids -- sorted course ids; rows, cols and enrolled are positions in it
+    rows, cols -- upper-triangle (row < col) pairs, sorted by row then col
+    counts     -- students shared by each pair
+    enrolled   -- students enrolled in each course
+    course_groups    -- {course_id: (dept_id, year, semester)}, optional
+    course_electives -- {course_id: elective_type}, optional
+    """
+
+    def __init__(self, course_ids, rows, cols, counts, enrolled, course_groups=None, course_electives=None):
+        self.course_ids = np.asarray(course_ids, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.enrolled = np.asarray(enrolled, dtype=np.int64)
+        self.keys = self.rows * len(self.course_ids) + self.cols
+        self.course_groups = course_groups or {}
+        self.course_electives = course_electives or {}
+
+    @classmethod
+    def from_enrollments(cls, student_ids, course_ids, **kwargs):
+        """Build from parallel arrays of raw student and course ids, one element per enrollment"""
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        course_ids = np.asarray(course_ids, dtype=np.int64)
+        unique_courses, course_pos = np.unique(course_ids, return_inverse=True)
+        _, student_pos = np.unique(student_ids, return_inverse=True)
+        n_courses = max(len(unique_courses), 1)
+        rows, cols, counts = _pair_counts(student_pos, course_pos, n_courses)
+        distinct = np.unique(student_pos.astype(np.int64) * n_courses + course_pos)
+        enrolled = np.bincount(distinct % n_courses, minlength=len(unique_courses))
+        return cls(unique_courses, rows, cols, counts, enrolled, **kwargs)
+
+    @classmethod
+    def from_db(cls, course_ids=None, statuses=COUNTED_STATUSES):
+        """Co-enrollment over StudentCourse, optionally limited to the given courses"""
+        from course.models import Course
+        from studentCourse.models import StudentCourse
+
+        enrollments = StudentCourse.objects.filter(
+            student_id__isnull=False, course_id__isnull=False, status__in=statuses
+        )
+        courses = Course.objects.all()
+        if course_ids is not None:
+            course_ids = [int(c) for c in course_ids]
+            enrollments = enrollments.filter(course_id__in=course_ids)
+            courses = courses.filter(id__in=course_ids)
+        rows = list(enrollments.values_list('student_id', 'course_id'))
+
+        course_groups, course_electives = {}, {}
+        for course_id, dept_id, year, semester, elective_type in courses.values_list(
+                'id', 'for_dept_id', 'course_year', 'course_semester', 'elective_type'):
+            course_groups[course_id] = (dept_id, year, semester)
+            course_electives[course_id] = elective_type or 'NE'
+
+        return cls.from_enrollments(
+            [row[0] for row in rows], [row[1] for row in rows],
+            course_groups=course_groups, course_electives=course_electives,
+        )
+
+    def _position(self, course_id):
+        i = int(np.searchsorted(self.course_ids, course_id))
+        if i < len(self.course_ids) and self.course_ids[i] == course_id:
+            return i
+        return None
+
+    def shared(self, course_a, course_b):
+        """Number of students enrolled in both courses"""
+        a, b = self._position(course_a), self._position(course_b)
+        if a is None or b is None or a == b:
+            return 0
+        key = min(a, b) * len(self.course_ids) + max(a, b)
+        i = int(np.searchsorted(self.keys, key))
+        return int(self.counts[i]) if i < len(self.keys) and self.keys[i] == key else 0
+
+    def pairs(self, min_students=MIN_SHARED_STUDENTS):
+        """(course_a, course_b, shared_students) for every conflicting pair, course_a < course_b"""
+        mask = self.counts >= min_students
+        return list(zip(self.course_ids[self.rows[mask]].tolist(), self.course_ids[self.cols[mask]].tolist(),
+                        self.counts[mask].tolist()))
+
+    def conflicts(self, min_students=MIN_SHARED_STUDENTS):
+        """{course_id: [course_id, ...]} adjacency lists in both directions"""
+        graph = {}
+        for a, b, _ in self.pairs(min_students):
+            graph.setdefault(a, []).append(b)
+            graph.setdefault(b, []).append(a)
+        return graph
+
+    def enrolled_in(self, course_id):
+        i = self._position(course_id)
+        return int(self.enrolled[i]) if i is not None else 0
+
+    def to_dense(self, course_ids):
+        """Shared-student counts between the given courses as a square array (for small groups)"""
+        course_ids = list(course_ids)
+        dense = np.zeros((len(course_ids), len(course_ids)), dtype=np.int64)
+        positions = {c: i for i, c in enumerate(course_ids)}
+        for a, b, count in self.pairs(min_students=1):
+            if a in positions and b in positions:
+                dense[positions[a], positions[b]] = dense[positions[b], positions[a]] = count
+        for c, i in positions.items():
+            dense[i, i] = self.enrolled_in(c)
+        return dense
+
+    def report(self, min_students=MIN_SHARED_STUDENTS, dept_id=None, year=None, semester=None, overlapping=None):
+        """
+        Conflicting pairs grouped by (department, year, semester). A pair is listed under
+        the group of each of its courses. overlapping is an optional set of (course_a, course_b)
+        pairs that the current timetable schedules at the same time.
+        """
+        def selected(group):
+            return ((dept_id is None or group[0] == dept_id) and (year is None or group[1] == year)
+                    and (semester is None or group[2] == semester))
+
+        groups = {}
+        for course_id, group in self.course_groups.items():
+            if selected(group):
+                groups.setdefault(group, {'courses': set(), 'pairs': []})['courses'].add(course_id)
+
+        for a, b, count in self.pairs(min_students):
+            group_a, group_b = self.course_groups.get(a), self.course_groups.get(b)
+            pair = {
+                'course_a': a,
+                'course_b': b,
+                'shared_students': count,
+                'elective_types': [self.course_electives.get(a, 'NE'), self.course_electives.get(b, 'NE')],
+                'cross_group': group_a != group_b,
+            }
+            if overlapping is not None:
+                pair['scheduled_together'] = (a, b) in overlapping
+            for group in {group_a, group_b}:
+                if group in groups:
+                    groups[group]['pairs'].append(pair)
+
+        return [
+            {
+                'dept_id': group[0],
+                'year': group[1],
+                'semester': group[2],
+                'courses': [{'course_id': c, 'enrolled': self.enrolled_in(c)} for c in sorted(data['courses'])],
+                'pairs': sorted(data['pairs'], key=lambda p: -p['shared_students']),
+            }
+            for group, data in sorted(groups.items(), key=lambda item: tuple(-1 if v is None else v for v in item[0]))
+        ]
+
+
+def scheduled_overlaps(pairs, index, section_courses):
+    """
+    The (course_a, course_b) pairs whose timetable entries overlap in time.
+
+    index           -- an OccupancyIndex
+    section_courses -- {assignment_id: course_id}
+    """
+    courses = {}
+    for assignment_id, i in index.section_index.items():
+        course_id = section_courses.get(assignment_id)
+        if course_id is not None:
+            busy = index.section_busy[i]
+            courses[course_id] = courses[course_id] | busy if course_id in courses else busy
+
+    # overlap[i, j]: slot i and slot j share some minutes
+    slot_ids = list(index.slot_index)
+    overlap = np.zeros((len(slot_ids), len(slot_ids)), dtype=bool)
+    for sid in slot_ids:
+        overlap[index.slot_index[sid], index.overlapping_slots(sid)] = True
+
+    result = set()
+    for a, b, _ in pairs:
+        if a in courses and b in courses:
+            spread = courses[a].astype(np.int32) @ overlap.astype(np.int32) > 0
+            if (spread & courses[b]).any():
+                result.add((a, b))
+    return result
@@ -0,0 +1,298 @@
+"""
+Whole-campus timetable conflict scanner.
+
+The unique constraint on Timetable only stops two entries from taking the same
+(day, slot, room). This scanner finds everything else in one pass over the
+table:
+
+    teacher       -- a teacher teaching two entries whose times overlap
+    room          -- a room booked twice at overlapping times (e.g. "A3" and "B1")
+    section       -- a course section (TeacherCourse) in two places at once
+    student_group -- overlapping entries of one department/year/semester, unless
+                     they are sections of the same regular course or electives of
+                     the same type (PE with PE, OE with OE)
+    teacher_slot  -- an entry on a day the teacher has not picked, or in a slot
+                     type other than the one picked for that day
+    slot_rules    -- TeacherSlotAssignment rule violations: more than five days,
+                     Monday and Saturday together, an invalid slot type mix, or a
+                     department over the 33% + 1 cap for a day and slot type
+
+Overlaps are found by sort-and-sweep: entries are sorted by (key, day, start)
+with one lexsort, a running maximum of end times per (key, day) run marks the
+clusters of overlapping entries, and only those clusters are expanded into
+pairs.
+"""
+import logging
+
+import numpy as np
+
+from .solver import CHANNELS
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_TYPES = ['teacher', 'room', 'section', 'student_group', 'teacher_slot', 'slot_rules']
+# Conflicts that make a timetable unusable; generation refuses to save them
+HARD_TYPES = ['teacher', 'room', 'section', 'student_group']
+SLOT_TYPES = ['A', 'B', 'C']
+MINUTES_PER_DAY = 24 * 60
+
+COLUMNS = ['entry', 'day', 'slot', 'teacher', 'room', 'assignment', 'course', 'dept', 'year', 'semester',
+           'elective']
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _column(rows, i, missing=-1):
+    return np.array([missing if row[i] is None else row[i] for row in rows], dtype=np.int64)
+
+
+def timetable_columns(entries):
+    """Column arrays for a Timetable queryset"""
+    rows = list(entries.values_list(
+        'id', 'day_of_week', 'slot_id', 'course_assignment__teacher_id', 'room_id', 'course_assignment_id',
+        'course_assignment__course_id', 'course_assignment__course_id__for_dept_id',
+        'course_assignment__course_id__course_year', 'course_assignment__course_id__course_semester',
+        'course_assignment__course_id__elective_type',
+    ))
+    columns = {name: _column(rows, i) for i, name in enumerate(COLUMNS[:-1])}
+    columns['elective'] = np.array([CHANNELS.get(row[10] or 'NE', 0) for row in rows], dtype=np.int64)
+    return columns
+
+
+def solver_columns(problem, result):
+    """Column arrays for the entries a SolverResult would write (entry id -1)"""
+    rows = []
+    for s, day, slot_ids, room_id in result.placements:
+        session = problem.sessions[s]
+        dept, year, semester = session['group']
+        for slot_id in slot_ids:
+            rows.append((-1, day, slot_id, session['teacher_id'], room_id, session['assignment_id'],
+                         session['course_id'], dept, year, semester, CHANNELS.get(session['elective_type'], 0)))
+    return {name: _column(rows, i) for i, name in enumerate(COLUMNS)}
+
+
+def merge_columns(*parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+class ConflictScanner:
+    """
+    entries -- {column: array} for COLUMNS
+    slots   -- iterable of (slot_id, slot_type, start, end), start/end in minutes
+    teacher_slots -- iterable of (teacher_id, day, slot_type, dept_id) TeacherSlotAssignment rows
+    dept_sizes    -- {dept_id: teacher count}, for the department cap
+    """
+
+    def __init__(self, entries, slots, teacher_slots=(), dept_sizes=None):
+        self.entries = {name: np.asarray(entries[name], dtype=np.int64) for name in COLUMNS}
+        self.n = len(self.entries['entry'])
+
+        slots = sorted(slots)
+        slot_ids = np.array([s[0] for s in slots], dtype=np.int64)
+        slot_type = np.array([SLOT_TYPES.index(s[1]) if s[1] in SLOT_TYPES else -1 for s in slots], dtype=np.int64)
+        slot_start = np.array([s[2] for s in slots], dtype=np.int64)
+        slot_end = np.array([s[3] for s in slots], dtype=np.int64)
+        if not len(slot_ids):
+            slot_ids = slot_type = slot_start = slot_end = np.zeros(1, dtype=np.int64) - 1
+        found = np.searchsorted(slot_ids, self.entries['slot']).clip(0, len(slot_ids) - 1)
+        self.known_slot = slot_ids[found] == self.entries['slot']
+        self.start = np.where(self.known_slot, slot_start[found], 0)
+        self.end = np.where(self.known_slot, slot_end[found], 0)
+        self.slot_type = np.where(self.known_slot, slot_type[found], -1)
+
+        self.teacher_slots = list(teacher_slots)
+        self.dept_sizes = dept_sizes or {}
+
+    @classmethod
+    def from_db(cls, entries=None, extra=None):
+        """
+        Scan stored Timetable rows (all unless a queryset is given), plus optional extra
+        column arrays, e.g. solver_columns() of entries about to be written
+        """
+        from slot.models import Slot, TeacherSlotAssignment
+        from teacher.models import Teacher
+        from django.db.models import Count
+        from .models import Timetable
+
+        columns = timetable_columns(entries if entries is not None else Timetable.objects.all())
+        if extra is not None:
+            columns = merge_columns(columns, extra)
+        slots = [(sid, slot_type, _minutes(start), _minutes(end)) for sid, slot_type, start, end in
+                 Slot.objects.values_list('id', 'slot_type', 'slot_start_time', 'slot_end_time')]
+        teacher_slots = TeacherSlotAssignment.objects.values_list(
+            'teacher_id', 'day_of_week', 'slot__slot_type', 'teacher__dept_id'
+        )
+        dept_sizes = dict(Teacher.objects.filter(dept_id__isnull=False).values('dept_id').annotate(
+            total=Count('id')).values_list('dept_id', 'total'))
+        return cls(columns, slots, teacher_slots, dept_sizes)
+
+    # ------------------------------------------------------------------
+    # Sort and sweep
+    # ------------------------------------------------------------------
+    def _clusters(self, key, mask=None):
+        """
+        Groups of entries with the same key and day whose times chain-overlap,
+        as a list of index arrays (clusters of one entry are dropped)
+        """
+        usable = self.known_slot & (key >= 0)
+        if mask is not None:
+            usable &= mask
+        rows = np.flatnonzero(usable)
+        if len(rows) < 2:
+            return []
+        order = rows[np.lexsort((self.start[rows], self.entries['day'][rows], key[rows]))]
+        run_key = key[order] * 8 + self.entries['day'][order]
+        new_run = np.r_[True, run_key[1:] != run_key[:-1]]
+        run = np.cumsum(new_run)
+        # Running maximum of end times within each run: offset every run above the previous one
+        reach = np.maximum.accumulate(run * (MINUTES_PER_DAY + 1) + self.end[order]) - run * (MINUTES_PER_DAY + 1)
+        starts = self.start[order]
+        new_cluster = new_run.copy()
+        new_cluster[1:] |= starts[1:] >= reach[:-1]
+        cluster = np.cumsum(new_cluster)
+        sizes = np.bincount(cluster)
+        big = np.flatnonzero(sizes > 1)
+        if not len(big):
+            return []
+        boundaries = np.searchsorted(cluster, big)
+        return [order[b:b + sizes[c]] for b, c in zip(boundaries, big)]
+
+    def _pairs(self, cluster):
+        for a in range(len(cluster)):
+            for b in range(a + 1, len(cluster)):
+                i, j = cluster[a], cluster[b]
+                if self.start[i] < self.end[j] and self.start[j] < self.end[i]:
+                    yield i, j
+
+    def _entry(self, i):
+        entry_id = int(self.entries['entry'][i])
+        return {
+            'timetable_id': entry_id if entry_id >= 0 else None,
+            'course_assignment': int(self.entries['assignment'][i]),
+            'slot_id': int(self.entries['slot'][i]),
+            'room_id': int(self.entries['room'][i]),
+        }
+
+    def _overlaps(self, kind, column):
+        conflicts = []
+        key = self.entries[column]
+        for cluster in self._clusters(key):
+            for i, j in self._pairs(cluster):
+                conflicts.append({
+                    'type': kind,
+                    f'{column}_id': int(key[i]),
+                    'day_of_week': int(self.entries['day'][i]),
+                    'entries': [self._entry(i), self._entry(j)],
+                })
+        return conflicts
+
+    def _student_groups(self):
+        e = self.entries
+        groups = (e['dept'] + 1) * 10000 + e['year'] * 100 + e['semester']
+        conflicts = []
+        for cluster in self._clusters(groups, mask=e['dept'] >= 0):
+            for i, j in self._pairs(cluster):
+                same_channel = e['elective'][i] == e['elective'][j]
+                if same_channel and (e['elective'][i] != CHANNELS['NE'] or e['course'][i] == e['course'][j]):
+                    continue
+                conflicts.append({
+                    'type': 'student_group',
+                    'dept_id': int(e['dept'][i]),
+                    'year': int(e['year'][i]),
+                    'semester': int(e['semester'][i]),
+                    'day_of_week': int(e['day'][i]),
+                    'entries': [self._entry(i), self._entry(j)],
+                })
+        return conflicts
+
+    def _teacher_slots(self):
+        """Entries outside the teacher's picked day and slot type"""
+        if not self.teacher_slots:
+            return []
+        picks = {(t, day): SLOT_TYPES.index(st) if st in SLOT_TYPES else -1 for t, day, st, _ in self.teacher_slots}
+        pick_keys = np.array(sorted(t * 8 + day for t, day in picks), dtype=np.int64)
+        pick_types = np.array([picks[(k // 8, k % 8)] for k in pick_keys], dtype=np.int64)
+        has_picks = np.isin(self.entries['teacher'], np.unique(pick_keys // 8))
+
+        keys = self.entries['teacher'] * 8 + self.entries['day']
+        found = np.searchsorted(pick_keys, keys).clip(0, len(pick_keys) - 1)
+        picked = pick_keys[found] == keys
+        no_pick = has_picks & ~picked & self.known_slot
+        wrong_type = has_picks & picked & self.known_slot & (pick_types[found] != self.slot_type)
+
+        conflicts = []
+        for i in np.flatnonzero(no_pick | wrong_type):
+            conflicts.append({
+                'type': 'teacher_slot',
+                'teacher_id': int(self.entries['teacher'][i]),
+                'day_of_week': int(self.entries['day'][i]),
+                'detail': ("Teacher has no slot assignment for this day" if no_pick[i] else
+                           f"Entry is in slot type {SLOT_TYPES[self.slot_type[i]]}, teacher picked "
+                           f"{SLOT_TYPES[pick_types[found[i]]]}"),
+                'entries': [self._entry(i)],
+            })
+        return conflicts
+
+    def _slot_rules(self):
+        """TeacherSlotAssignment rows breaking the per-teacher or per-department rules"""
+        from slot.planner import VALID_DISTRIBUTIONS, department_cap
+        from slot.models import TeacherSlotAssignment
+
+        conflicts = []
+        by_teacher, cells = {}, {}
+        for teacher_id, day, slot_type, dept_id in self.teacher_slots:
+            by_teacher.setdefault(teacher_id, []).append((day, slot_type))
+            if dept_id is not None:
+                cells[(dept_id, day, slot_type)] = cells.get((dept_id, day, slot_type), 0) + 1
+
+        for teacher_id, picks in sorted(by_teacher.items()):
+            days = {day for day, _ in picks}
+            counts = {t: sum(1 for _, st in picks if st == t) for t in SLOT_TYPES}
+            problems = []
+            if len(days) > 5:
+                problems.append(f"{len(days)} days assigned, maximum is 5")
+            if set(TeacherSlotAssignment.RESTRICTED_DAYS) <= days:
+                problems.append("Both Monday and Saturday assigned")
+            if not any(all(counts[t] <= d[t] for t in SLOT_TYPES) for d in VALID_DISTRIBUTIONS):
+                problems.append(f"Slot type mix A-{counts['A']}/B-{counts['B']}/C-{counts['C']} "
+                                f"fits no allowed distribution")
+            for detail in problems:
+                conflicts.append({'type': 'slot_rules', 'teacher_id': teacher_id, 'detail': detail, 'entries': []})
+
+        for (dept_id, day, slot_type), count in sorted(cells.items()):
+            cap = department_cap(self.dept_sizes.get(dept_id, 0))
+            if count > cap:
+                conflicts.append({
+                    'type': 'slot_rules',
+                    'dept_id': dept_id,
+                    'day_of_week': day,
+                    'detail': f"{count} teachers on slot type {slot_type}, department cap is {cap}",
+                    'entries': [],
+                })
+        return conflicts
+
+    def scan(self, types=None):
+        """Every conflict of the requested types (all by default), as JSON-ready dicts"""
+        types = types or CONFLICT_TYPES
+        scanners = {
+            'teacher': lambda: self._overlaps('teacher', 'teacher'),
+            'room': lambda: self._overlaps('room', 'room'),
+            'section': lambda: self._overlaps('section', 'assignment'),
+            'student_group': self._student_groups,
+            'teacher_slot': self._teacher_slots,
+            'slot_rules': self._slot_rules,
+        }
+        conflicts = []
+        for kind in CONFLICT_TYPES:
+            if kind in types:
+                conflicts.extend(scanners[kind]())
+        return conflicts
+
+
+def summarize(conflicts):
+    counts = {kind: 0 for kind in CONFLICT_TYPES}
+    for conflict in conflicts:
+        counts[conflict['type']] += 1
+    return counts
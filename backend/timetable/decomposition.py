@@ -0,0 +1,262 @@
+"""
+Department-decomposed timetable generation.
+
+Most constraints only involve one department: its teachers, its student
+groups and its courses. What couples departments is rooms, teachers who teach
+for several departments, courses taught by another department than the one
+they are for (teaching_dept_id or an approved CourseResourceAllocation), and
+courses that share students across departments. Decomposed solving runs in
+three phases:
+
+    1. Cross-department sessions (any session touching one of those couplings)
+       are solved first, campus-wide, against every room.
+    2. Every department solves its own sessions in a worker process, against
+       its own slice of the rooms, with the phase 1 placements fixed.
+    3. Reconciliation: sessions the departments could not place in their room
+       pool get one more campus-wide run against every room, with all other
+       placements fixed.
+
+Room pools are disjoint and phase 1 placements are fixed for everybody, so
+department results never clash with each other. Like the solver, this module
+never touches the ORM.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from .portfolio import default_workers, process_context, GRACE_SECONDS
+from .solver import TimetableProblem, TimetableSolver, SolverResult, UNPLACED_PENALTY
+
+logger = logging.getLogger(__name__)
+
+# Share of the time budget for the cross-department phase and for reconciliation
+CROSS_BUDGET_SHARE = 0.2
+RECONCILE_BUDGET_SHARE = 0.15
+
+
+def session_departments(problem):
+    return [s['group'][0] for s in problem.sessions]
+
+
+def cross_department_sessions(problem, shared_courses=()):
+    """Indices of sessions that couple departments and have to be solved campus-wide"""
+    departments = session_departments(problem)
+    teacher_departments, course_departments = {}, {}
+    for s, dept in zip(problem.sessions, departments):
+        teacher_departments.setdefault(s['teacher_id'], set()).add(dept)
+        course_departments.setdefault(s['course_id'], set()).add(dept)
+
+    # Courses sharing students with a course of another department
+    coupled_courses = set(shared_courses)
+    for course_id, others in problem.course_conflicts.items():
+        for other in others:
+            if len(course_departments.get(course_id, set()) | course_departments.get(other, set())) > 1:
+                coupled_courses.update((course_id, other))
+
+    return [
+        i for i, s in enumerate(problem.sessions)
+        if len(teacher_departments[s['teacher_id']]) > 1 or s['course_id'] in coupled_courses
+    ]
+
+
+def partition_rooms(problem, sessions_by_dept):
+    """
+    Split the rooms into one pool per department, in proportion to the periods each
+    department needs in lab and class rooms. Bigger rooms are handed out first, each
+    to the department furthest below its share.
+    """
+    pools = {dept: [] for dept in sessions_by_dept}
+    for is_lab in (True, False):
+        rooms = sorted((r for r in problem.rooms if bool(r['is_lab']) == is_lab),
+                       key=lambda r: (-(r['capacity'] or 0), r['id']))
+        demand = {
+            dept: sum(problem.sessions[s]['length'] for s in sessions
+                      if (problem.sessions[s]['session_type'] == 'Lab') == is_lab)
+            for dept, sessions in sessions_by_dept.items()
+        }
+        total = sum(demand.values())
+        if not rooms or not total:
+            continue
+        given = {dept: 0 for dept in pools}
+        for room in rooms:
+            dept = max(pools, key=lambda d: (demand[d] * len(rooms) / total - given[d], demand[d]))
+            pools[dept].append(room)
+            given[dept] += 1
+    return pools
+
+
+def _subproblem(problem, sessions, rooms, fixed):
+    return TimetableProblem(
+        slots=problem.slots,
+        rooms=rooms,
+        sessions=[problem.sessions[s] for s in sessions],
+        teacher_days=problem.teacher_days,
+        teacher_windows=problem.teacher_windows,
+        slot_preferences=problem.slot_preferences,
+        fixed=fixed,
+        course_conflicts=problem.course_conflicts,
+    )
+
+
+def _fixed_entries(problem, placements):
+    """Full-problem placements as fixed entries that block teachers, rooms and students"""
+    fixed = []
+    for s, day, slot_ids, room_id in placements:
+        session = problem.sessions[s]
+        for slot_id in slot_ids:
+            fixed.append({
+                'teacher_id': session['teacher_id'],
+                'room_id': room_id,
+                'day': day,
+                'slot_id': slot_id,
+                'group': session['group'],
+                'course_id': session['course_id'],
+                'elective_type': session['elective_type'],
+            })
+    return fixed
+
+
+def _relevant_fixed(problem, sessions, rooms, fixed):
+    """The fixed entries that share a room, teacher, student group or co-enrolled course with the sessions"""
+    room_ids = {r['id'] for r in rooms}
+    teachers = {problem.sessions[s]['teacher_id'] for s in sessions}
+    groups = {problem.sessions[s]['group'] for s in sessions}
+    courses = set()
+    for s in sessions:
+        courses.update(problem.course_conflicts.get(problem.sessions[s]['course_id'], ()))
+    return [
+        f for f in fixed
+        if f.get('room_id') in room_ids or f.get('teacher_id') in teachers
+        or f.get('group') in groups or f.get('course_id') in courses
+    ]
+
+
+def _solve(key, subproblem, options, seed, budget):
+    started = time.monotonic()
+    return key, TimetableSolver(subproblem, options, seed=seed).solve(deadline=started + budget)
+
+
+def _solve_phase(problem, sessions, rooms, fixed, options, seed, budget):
+    """Solve a subset of the sessions; returns (placements, unplaced, soft_cost) in full-problem indices"""
+    if not sessions:
+        return [], [], 0.0
+    _, result = _solve(None, _subproblem(problem, sessions, rooms, fixed), options, seed, budget)
+    placements = [(sessions[s], day, slot_ids, room_id) for s, day, slot_ids, room_id in result.placements]
+    return placements, [sessions[s] for s in result.unplaced], result.stats['soft_cost']
+
+
+def solve_by_department(problem, options, shared_courses=(), workers=None, seed=0, on_department=None):
+    """
+    Solve the problem department by department and return one SolverResult for the
+    whole campus. shared_courses are course ids taught across departments.
+    on_department(dept, result) is called as each department finishes.
+    """
+    started = time.monotonic()
+    budget = options.timeout if options.timeout and options.timeout > 0 else 600
+    deadline = started + budget
+    workers = workers or default_workers()
+
+    cross = cross_department_sessions(problem, shared_courses)
+    cross_set = set(cross)
+    sessions_by_dept = {}
+    for i, dept in enumerate(session_departments(problem)):
+        if i not in cross_set:
+            sessions_by_dept.setdefault(dept, []).append(i)
+    pools = partition_rooms(problem, sessions_by_dept)
+
+    # Phase 1: cross-department sessions, campus-wide
+    placements, unplaced, soft = _solve_phase(problem, cross, problem.rooms, problem.fixed, options, seed,
+                                              budget * CROSS_BUDGET_SHARE)
+    cross_seconds = time.monotonic() - started
+    logger.info(f"Placed {len(placements)}/{len(cross)} cross-department sessions in {cross_seconds:.1f}s")
+
+    # Phase 2: departments in parallel, each in its own room pool
+    fixed = problem.fixed + _fixed_entries(problem, placements)
+    phase_end = deadline - budget * RECONCILE_BUDGET_SHARE
+    jobs = [
+        (dept, _subproblem(problem, sessions, pools[dept],
+                           _relevant_fixed(problem, sessions, pools[dept], fixed)), sessions)
+        for dept, sessions in sorted(sessions_by_dept.items(), key=lambda item: -len(item[1]))
+    ]
+    job_sessions = {dept: sessions for dept, _, sessions in jobs}
+    department_stats = {}
+
+    def collect(dept, result):
+        nonlocal soft
+        sessions = job_sessions[dept]
+        placements.extend((sessions[s], day, slot_ids, room_id) for s, day, slot_ids, room_id in result.placements)
+        unplaced.extend(sessions[s] for s in result.unplaced)
+        soft += result.stats['soft_cost']
+        department_stats[dept] = {
+            'sessions': result.stats['sessions'],
+            'placed': result.stats['placed'],
+            'rooms': len(pools[dept]),
+            'wall_seconds': result.stats['wall_seconds'],
+        }
+        if on_department:
+            on_department(dept, result)
+
+    if workers == 1 or len(jobs) <= 1:
+        for dept, subproblem, _ in jobs:
+            collect(*_solve(dept, subproblem, options, seed, max(phase_end - time.monotonic(), 1)))
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=process_context())
+        phase_budget = max(phase_end - time.monotonic(), 1)
+        try:
+            futures = [executor.submit(_solve, dept, subproblem, options, seed, phase_budget)
+                       for dept, subproblem, _ in jobs]
+            try:
+                for future in as_completed(futures, timeout=phase_budget + GRACE_SECONDS):
+                    try:
+                        collect(*future.result())
+                    except Exception as e:
+                        logger.error(f"Department solve failed: {str(e)}", exc_info=True)
+            except FutureTimeoutError:
+                logger.warning("Some departments did not finish within the solver timeout")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        # Departments that failed or timed out go to reconciliation as a whole
+        for dept, _, sessions in jobs:
+            if dept not in department_stats:
+                unplaced.extend(sessions)
+
+    # Phase 3: reconciliation, campus-wide for whatever did not fit. The sessions sharing a
+    # teacher or student group with an unplaced one are freed too, so they can make room.
+    reconciled = 0
+    if unplaced:
+        missing = len(unplaced)
+        teachers = {problem.sessions[s]['teacher_id'] for s in unplaced}
+        groups = {problem.sessions[s]['group'] for s in unplaced}
+        freed = [p for p in placements
+                 if problem.sessions[p[0]]['teacher_id'] in teachers or problem.sessions[p[0]]['group'] in groups]
+        freed_sessions = {p[0] for p in freed}
+        kept = [p for p in placements if p[0] not in freed_sessions]
+        retry = sorted(set(unplaced) | freed_sessions)
+        fixed = problem.fixed + _fixed_entries(problem, kept)
+        more, still_unplaced, more_soft = _solve_phase(problem, retry, problem.rooms, fixed, options, seed,
+                                                       max(deadline - time.monotonic(), 1))
+        # Keep whichever of the two is better for the freed sessions
+        if len(still_unplaced) < missing:
+            placements = kept + more
+            unplaced = still_unplaced
+            soft += more_soft
+            reconciled = missing - len(still_unplaced)
+
+    placements.sort(key=lambda p: p[0])
+    unplaced.sort()
+    n = len(problem.sessions)
+    stats = {
+        'seed': seed,
+        'sessions': n,
+        'placed': n - len(unplaced),
+        'unplaced': len(unplaced),
+        'cross_sessions': len(cross),
+        'reconciled': reconciled,
+        'departments': department_stats,
+        'soft_cost': round(soft, 2),
+        'cross_seconds': round(cross_seconds, 3),
+        'wall_seconds': round(time.monotonic() - started, 3),
+    }
+    logger.info(f"Decomposed solve: placed {stats['placed']}/{n} across {len(jobs)} departments "
+                f"({len(cross)} cross-department sessions, {reconciled} reconciled)")
+    return SolverResult(placements, unplaced, UNPLACED_PENALTY * len(unplaced) + soft, stats)
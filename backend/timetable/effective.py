@@ -0,0 +1,184 @@
+"""
+Effective timetable: what actually happens on a given date.
+
+A Timetable entry occurs on every date that falls on its day_of_week between
+start_date and end_date (open-ended when end_date is empty). On a date where
+an approved TimetableChange of the entry is in effect, the entry takes the
+change's day, slot and room instead; when several changes overlap, the most
+recently created one wins, as in the occupancy index.
+
+Approved changes are kept in an IntervalIndex (sorted starts plus a running
+maximum of the ends), so the changes in effect on a date are found with two
+binary searches and a small mask. Schedules are resolved a whole ISO week at
+a time and cached per week under the timetable cache version, which the
+timetable signals bump whenever entries, changes, slots or rooms change.
+"""
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .occupancy import VERSION_CACHE_KEY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60 * 60
+MAX_RANGE_DAYS = 366
+OPEN_END = date.max.toordinal()
+
+
+class IntervalIndex:
+    """Closed [start, end] integer intervals, queried for the ones overlapping a range"""
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        # Running maximum of the ends: everything before the first position reaching a
+        # query start has ended before it
+        self.reach = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def overlapping(self, low, high=None):
+        """Positions (in the original order) of the intervals overlapping [low, high]"""
+        high = low if high is None else high
+        first = int(np.searchsorted(self.reach, low, side='left'))
+        last = int(np.searchsorted(self.starts, high, side='right'))
+        if first >= last:
+            return np.zeros(0, dtype=np.intp)
+        candidates = np.arange(first, last)
+        return np.sort(self.order[candidates[self.ends[first:last] >= low]])
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _cache_key(week_start):
+    year, week, _ = week_start.isocalendar()
+    return f"timetable:effective:{cache.get(VERSION_CACHE_KEY, 0)}:{year}-W{week:02d}"
+
+
+def _entry_rows(first_day, last_day):
+    from .models import Timetable
+
+    rows = Timetable.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=first_day),
+        start_date__lte=last_day,
+    ).values_list(
+        'id', 'day_of_week', 'slot_id', 'room_id', 'is_recurring', 'start_date', 'end_date', 'session_type',
+        'course_assignment_id', 'course_assignment__teacher_id',
+        'course_assignment__teacher_id__teacher_id__first_name',
+        'course_assignment__teacher_id__teacher_id__last_name',
+        'course_assignment__course_id', 'course_assignment__course_id__course_id__course_id',
+        'course_assignment__course_id__course_id__course_name', 'course_assignment__course_id__for_dept_id',
+    )
+    return list(rows)
+
+
+def resolve_week(week_start):
+    """Effective entries for the seven days from a Monday, as {date: [entry, ...]}"""
+    from rooms.models import Room
+    from slot.models import Slot
+    from .models import TimetableChange
+
+    week_end = week_start + timedelta(days=6)
+    rows = _entry_rows(week_start, week_end)
+    changes = list(TimetableChange.objects.filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gte=week_start),
+        status='Approved',
+        effective_from__lte=week_end,
+    ).order_by('created_at', 'id').values_list(
+        'id', 'original_timetable_id', 'new_day_of_week', 'new_slot_id', 'new_room_id', 'effective_from', 'effective_to'
+    ))
+    intervals = IntervalIndex(
+        [change[5].toordinal() for change in changes],
+        [change[6].toordinal() if change[6] else OPEN_END for change in changes],
+    )
+    slots = {sid: (name, start, end) for sid, name, start, end in
+             Slot.objects.values_list('id', 'slot_name', 'slot_start_time', 'slot_end_time')}
+    rooms = dict(Room.objects.values_list('id', 'room_number'))
+
+    schedule = {week_start + timedelta(days=offset): [] for offset in range(7)}
+    for day in schedule:
+        # Latest approved change per entry in effect on this day
+        active = {}
+        for i in intervals.overlapping(day.toordinal()):
+            change = changes[i]
+            active[change[1]] = change
+
+        for row in rows:
+            (entry_id, day_of_week, slot_id, room_id, is_recurring, start_date, end_date, session_type,
+             assignment_id, teacher_id, first_name, last_name, course_id, course_code, course_name, dept_id) = row
+            last = end_date or (None if is_recurring else start_date)
+            if day < start_date or (last is not None and day > last):
+                continue
+            change = active.get(entry_id)
+            if change is not None:
+                day_of_week = change[2] if change[2] is not None else day_of_week
+                slot_id = change[3] or slot_id
+                room_id = change[4] or room_id
+            if day_of_week != day.weekday():
+                continue
+            slot_name, slot_start, slot_end = slots.get(slot_id, (None, None, None))
+            schedule[day].append({
+                'timetable_id': entry_id,
+                'change_id': change[0] if change is not None else None,
+                'course_assignment': assignment_id,
+                'teacher_id': teacher_id,
+                'teacher_name': f"{first_name or ''} {last_name or ''}".strip(),
+                'course_id': course_id,
+                'course_code': course_code,
+                'course_name': course_name,
+                'dept_id': dept_id,
+                'session_type': session_type,
+                'slot_id': slot_id,
+                'slot_name': slot_name,
+                'start_time': slot_start,
+                'end_time': slot_end,
+                'room_id': room_id,
+                'room_number': rooms.get(room_id),
+            })
+        schedule[day].sort(key=lambda e: (e['start_time'] is None, e['start_time'], e['room_number'] or ''))
+    return schedule
+
+
+def get_week(day):
+    """The cached effective schedule of the ISO week containing the day"""
+    week_start = _week_start(day)
+    key = _cache_key(week_start)
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = resolve_week(week_start)
+        cache.set(key, schedule, getattr(settings, 'EFFECTIVE_TIMETABLE_CACHE_TTL', DEFAULT_TTL))
+    return schedule
+
+
+def effective_schedule(start, end=None, teacher_id=None, room_id=None, assignment_id=None, dept_id=None):
+    """[(date, [entry, ...]), ...] for every date from start to end inclusive"""
+    end = end or start
+    if end < start:
+        raise ValueError("end date is before start date")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"date range is limited to {MAX_RANGE_DAYS} days")
+
+    filters = {'teacher_id': teacher_id, 'room_id': room_id, 'course_assignment': assignment_id, 'dept_id': dept_id}
+    filters = {name: value for name, value in filters.items() if value is not None}
+
+    days = []
+    week, week_start = None, None
+    day = start
+    while day <= end:
+        if week_start != _week_start(day):
+            week_start = _week_start(day)
+            week = get_week(day)
+        entries = week[day]
+        if filters:
+            entries = [e for e in entries if all(e[name] == value for name, value in filters.items())]
+        days.append((day, entries))
+        day += timedelta(days=1)
+    return days
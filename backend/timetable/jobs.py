@@ -0,0 +1,161 @@
+"""
+Background timetable generation jobs.
+
+TimetableGenerationConfig rows are the queue: a job is a config whose
+generation_status is 'queued'. Workers claim jobs with a conditional UPDATE,
+so any number of them -- the in-process thread started by the API or the
+run_generation_worker management command -- can drain the same queue without
+running a job twice. A running job's progress_updated_at is its lease: a
+heartbeat refreshes it while the job runs, and a job whose lease ran out
+(its worker crashed or was restarted) is claimed and run again.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TimetableGenerationConfig
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+# A running job refreshes its lease this often ...
+HEARTBEAT_SECONDS = 30
+# ... and one not refreshed for this long is assumed lost with its worker
+STALE_SECONDS = 900
+
+_worker_lock = threading.Lock()
+_worker = None
+_wakeup = threading.Event()
+
+
+def _stale_running():
+    stale = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    return Q(generation_status='running') & (Q(progress_updated_at__lt=stale) | Q(progress_updated_at__isnull=True))
+
+
+def enqueue_generation(config, warm_start_version=None):
+    """
+    Queue a generation job, seeded with warm_start_version if given; returns False
+    if the config already has one queued or running
+    """
+    seed = {'warm_start_version': warm_start_version} if warm_start_version is not None else {}
+    queued = TimetableGenerationConfig.objects.filter(
+        ~Q(generation_status__in=ACTIVE_STATUSES) | _stale_running(), id=config.id
+    ).update(
+        **seed,
+        generation_status='queued',
+        generation_phase='queued',
+        generation_log='',
+        best_score=None,
+        constraint_violations=None,
+        generation_started_at=None,
+        generation_completed_at=None,
+        progress_updated_at=timezone.now(),
+    )
+    if not queued:
+        return False
+    if getattr(settings, 'TIMETABLE_GENERATION_IN_PROCESS', True):
+        start_worker()
+    return True
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job, or a running job whose lease ran out, as running
+    and return its id, or None if there is none
+    """
+    candidates = TimetableGenerationConfig.objects.filter(
+        Q(generation_status='queued') | _stale_running()
+    ).order_by('progress_updated_at', 'id')
+    for config_id, job_status, updated_at in candidates.values_list(
+            'id', 'generation_status', 'progress_updated_at'):
+        claimed = TimetableGenerationConfig.objects.filter(
+            id=config_id, generation_status=job_status, progress_updated_at=updated_at
+        ).update(
+            generation_status='running',
+            generation_phase='starting',
+            progress_updated_at=timezone.now(),
+        )
+        if claimed:
+            if job_status == 'running':
+                logger.warning(f"Timetable generation job {config_id} lost its worker; running it again")
+            return config_id
+    return None
+
+
+def _heartbeat(config_id, stop):
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            TimetableGenerationConfig.objects.filter(id=config_id, generation_status='running').update(
+                progress_updated_at=timezone.now()
+            )
+    except Exception as e:
+        logger.error(f"Timetable generation job {config_id} heartbeat failed: {str(e)}", exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def run_job(config_id):
+    from .services import TimetableGenerationService
+
+    logger.info(f"Running timetable generation job {config_id}")
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(config_id, stop), name=f'timetable-heartbeat-{config_id}',
+                     daemon=True).start()
+    try:
+        return TimetableGenerationService(config_id=config_id).generate_timetable()
+    except Exception as e:
+        logger.error(f"Timetable generation job {config_id} crashed: {str(e)}", exc_info=True)
+        TimetableGenerationConfig.objects.filter(id=config_id).update(
+            generation_status='failed',
+            generation_phase='done',
+            generation_completed_at=timezone.now(),
+        )
+        return False
+    finally:
+        stop.set()
+
+
+def run_pending_jobs():
+    """Run queued jobs until the queue is empty; returns how many ran"""
+    count = 0
+    try:
+        while True:
+            config_id = claim_next_job()
+            if config_id is None:
+                return count
+            run_job(config_id)
+            count += 1
+    finally:
+        close_old_connections()
+
+
+def _drain():
+    global _worker
+    while True:
+        try:
+            run_pending_jobs()
+        except Exception as e:
+            logger.error(f"Timetable generation worker failed: {str(e)}", exc_info=True)
+        with _worker_lock:
+            # A job queued while the last one was running gets picked up here
+            if not _wakeup.is_set():
+                _worker = None
+                return
+            _wakeup.clear()
+
+
+def start_worker():
+    """Drain the queue on a background thread of this process, unless one is already doing it"""
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _wakeup.set()
+            return
+        _worker = threading.Thread(target=_drain, name='timetable-generation', daemon=True)
+        _worker.start()
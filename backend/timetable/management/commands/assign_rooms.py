@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from timetable.room_assignment import reassign_timetable
+
+
+class Command(BaseCommand):
+    help = 'Re-picks timetable rooms by capacity, lab type and course room preferences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the moves without saving them')
+
+    def handle(self, *args, **options):
+        moves = reassign_timetable(dry_run=options['dry_run'])
+        for entry_id, old_room, new_room in moves:
+            self.stdout.write(f'Timetable entry {entry_id}: room {old_room} -> {new_room}')
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(moves)} timetable entries'))
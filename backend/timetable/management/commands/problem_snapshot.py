@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable.models import TimetableGenerationConfig
+from timetable.snapshot import ProblemSnapshot
+from timetable.solver import TimetableSolver
+
+
+class Command(BaseCommand):
+    help = 'Exports the timetable generation problem to a .npz snapshot, or replays a snapshot without the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file (.npz)')
+        parser.add_argument('--config', type=int, help='Export the problem for this generation config')
+        parser.add_argument('--solve', action='store_true', help='Solve the snapshot and print the run stats')
+        parser.add_argument('--seed', type=int, default=0, help='Solver seed used with --solve')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['config'] is not None:
+            try:
+                config = TimetableGenerationConfig.objects.get(id=options['config'])
+            except TimetableGenerationConfig.DoesNotExist:
+                raise CommandError(f"Timetable generation config {options['config']} not found")
+            snapshot = ProblemSnapshot.from_db(config)
+            snapshot.save(path)
+            self.stdout.write(self.style.SUCCESS(f'Saved {snapshot.summary()} to {path}'))
+
+        if options['solve']:
+            snapshot = ProblemSnapshot.load(path)
+            result = TimetableSolver(snapshot.to_problem(), snapshot.solver_options(), seed=options['seed']).solve()
+            for name, value in result.stats.items():
+                self.stdout.write(f'{name}: {value}')
+            self.stdout.write(self.style.SUCCESS(f'Score {result.score:.2f}'))
+        elif options['config'] is None:
+            raise CommandError('Pass --config to export a snapshot or --solve to replay one')
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from timetable.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued timetable generation jobs; polls for new ones unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Waiting for timetable generation jobs...'))
+        while True:
+            ran = run_pending_jobs()
+            if ran:
+                self.stdout.write(self.style.SUCCESS(f'Finished {ran} generation job(s)'))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable.conflicts import ConflictScanner, CONFLICT_TYPES, summarize
+
+
+class Command(BaseCommand):
+    help = 'Scans the whole timetable for teacher, room, section, student group and slot rule conflicts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', choices=CONFLICT_TYPES, dest='types',
+                            help='Conflict type to scan for (repeatable, default all)')
+        parser.add_argument('--limit', type=int, default=100, help='Print at most this many conflicts')
+        parser.add_argument('--fail-on-conflict', action='store_true',
+                            help='Exit with an error when any conflict is found')
+
+    def handle(self, *args, **options):
+        conflicts = ConflictScanner.from_db().scan(options['types'])
+        for conflict in conflicts[:options['limit']]:
+            self.stdout.write(str(conflict))
+
+        counts = ', '.join(f'{kind}: {count}' for kind, count in summarize(conflicts).items() if count)
+        if conflicts and options['fail_on_conflict']:
+            raise CommandError(f'Found {len(conflicts)} timetable conflicts ({counts})')
+        self.stdout.write(self.style.SUCCESS(f'Found {len(conflicts)} timetable conflicts' +
+                                             (f' ({counts})' if counts else '')))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 05:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0002_generation_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('generation', 'Generation'), ('rollback', 'Before rollback')], default='manual', max_length=20)),
+                ('note', models.TextField(blank=True)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('checksum', models.CharField(max_length=64)),
+                ('data', models.BinaryField()),
+                ('config', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='timetable.timetablegenerationconfig')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timetable_versions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'timetable_version',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
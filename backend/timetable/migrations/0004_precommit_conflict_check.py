@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0003_timetable_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetablegenerationconfig',
+            name='precommit_conflict_check',
+            field=models.BooleanField(default=False),
+        ),
+    ]
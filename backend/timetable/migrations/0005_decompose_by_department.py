@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0004_precommit_conflict_check'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetablegenerationconfig',
+            name='decompose_by_department',
+            field=models.BooleanField(default=False),
+        ),
+    ]
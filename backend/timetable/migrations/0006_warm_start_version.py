@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 05:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0005_decompose_by_department'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetablegenerationconfig',
+            name='warm_start_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='warm_started_configs', to='timetable.timetableversion'),
+        ),
+    ]
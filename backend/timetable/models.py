@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from teacherCourse.models import TeacherCourse
 from slot.models import Slot
 from rooms.models import Room
@@ -75,7 +76,7 @@ class TimetableChange(models.Model):
 
 class TimetableGenerationConfig(models.Model):
     """
-    Configuration for timetable generation process (currently disabled)
+    Configuration for timetable generation process
     """
     DIVISION_CHOICES = [
         ('A', 'Division A (8 AM - 3 PM)'),
@@ -83,6 +84,14 @@ class TimetableGenerationConfig(models.Model):
         ('C', 'Division C (12 PM - 7 PM)'),
     ]
     
+    STATUS_CHOICES = [
+        ('idle', 'Idle'),
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
     name = models.CharField(max_length=100)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timetable_configs')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -102,14 +111,68 @@ class TimetableGenerationConfig(models.Model):
     # Solver timeout (in seconds)
     solver_timeout = models.IntegerField(default=600)
     
+    # Scan the generated timetable for conflicts before saving it, and refuse to save on any
+    precommit_conflict_check = models.BooleanField(default=False)
+    
+    # Solve departments in parallel on their own room pools (see timetable.decomposition)
+    decompose_by_department = models.BooleanField(default=False)
+    
+    # Start the next generation run from an earlier timetable version and only re-solve what
+    # changed (see timetable.warmstart); cleared once that run is done
+    warm_start_version = models.ForeignKey('TimetableVersion', on_delete=models.SET_NULL, null=True, blank=True,
+                                           related_name='warm_started_configs')
+    
     # Generation status
     is_generated = models.BooleanField(default=False)
     generation_started_at = models.DateTimeField(null=True, blank=True)
     generation_completed_at = models.DateTimeField(null=True, blank=True)
     generation_log = models.TextField(blank=True)
     
+    # Progress of the background generation job
+    generation_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='idle')
+    generation_phase = models.CharField(max_length=100, blank=True)
+    best_score = models.FloatField(null=True, blank=True)
+    constraint_violations = models.IntegerField(null=True, blank=True)
+    progress_updated_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         db_table = 'timetable_generation_config'
     
     def __str__(self):
         return self.name
+
+
+class TimetableVersion(models.Model):
+    """
+    Named, immutable snapshot of the Timetable table, stored as a compressed
+    NumPy blob of integer columns (see versions.py)
+    """
+    SOURCE_CHOICES = [
+        ('manual', 'Manual'),
+        ('generation', 'Generation'),
+        ('rollback', 'Before rollback'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    config = models.ForeignKey(TimetableGenerationConfig, on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='versions')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='timetable_versions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    note = models.TextField(blank=True)
+    entry_count = models.IntegerField(default=0)
+    checksum = models.CharField(max_length=64)
+    data = models.BinaryField()
+    
+    class Meta:
+        db_table = 'timetable_version'
+        ordering = ['-created_at', '-id']
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Timetable versions are immutable")
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.name} ({self.entry_count} entries)"
@@ -0,0 +1,235 @@
+"""
+Process-wide occupancy index of the timetable.
+
+Availability and clash questions ("is room 12 free on Monday in slot A3?")
+used to issue a Timetable query each. The index answers them from NumPy
+boolean arrays shaped (entity, day, slot) that are rebuilt lazily, in four
+queries, whenever Timetable or TimetableChange rows change.
+
+Invalidation: signals bump a version number in the Django cache when the
+writing transaction commits, so every process sharing the cache rebuilds on
+its next lookup. With a per-process cache backend, OCCUPANCY_INDEX_TTL bounds
+how stale another worker's index can get.
+"""
+import logging
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'timetable:occupancy:version'
+DEFAULT_TTL = 60
+DAYS_IN_WEEK = 7
+
+
+class OccupancyIndex:
+    """Room, teacher and course-section occupancy as (entity, day, slot) bitsets"""
+
+    def __init__(self, entries, slots, rooms, on_date=None):
+        """
+        entries -- iterable of (entry_id, room_id, teacher_id, assignment_id, day, slot_id)
+        slots   -- iterable of (slot_id, slot_name, slot_type, start_time, end_time)
+        rooms   -- iterable of (room_id, room_number, block, capacity, is_lab)
+        """
+        self.on_date = on_date or date.today()
+        self.slots = {sid: {'slot_name': name, 'slot_type': slot_type, 'start_time': start, 'end_time': end}
+                      for sid, name, slot_type, start, end in slots}
+        self.rooms = {rid: {'room_number': number, 'block': block, 'capacity': capacity, 'is_lab': is_lab}
+                      for rid, number, block, capacity, is_lab in rooms}
+        self.slot_index = {sid: i for i, sid in enumerate(self.slots)}
+        self.room_index = {rid: i for i, rid in enumerate(self.rooms)}
+
+        entries = list(entries)
+        self.teacher_index = {t: i for i, t in enumerate(sorted({e[2] for e in entries if e[2] is not None}))}
+        self.section_index = {a: i for i, a in enumerate(sorted({e[3] for e in entries}))}
+
+        n_slots = len(self.slot_index)
+        self.room_busy = np.zeros((len(self.room_index), DAYS_IN_WEEK, n_slots), dtype=bool)
+        self.teacher_busy = np.zeros((len(self.teacher_index), DAYS_IN_WEEK, n_slots), dtype=bool)
+        self.section_busy = np.zeros((len(self.section_index), DAYS_IN_WEEK, n_slots), dtype=bool)
+
+        # Entries per section, so a course-section's schedule is a dict lookup
+        self.entries = []
+        self.section_entries = {}
+        for entry_id, room_id, teacher_id, assignment_id, day, slot_id in entries:
+            s = self.slot_index.get(slot_id)
+            if s is None or not 0 <= day < DAYS_IN_WEEK:
+                continue
+            r = self.room_index.get(room_id)
+            if r is not None:
+                self.room_busy[r, day, s] = True
+            t = self.teacher_index.get(teacher_id)
+            if t is not None:
+                self.teacher_busy[t, day, s] = True
+            self.section_busy[self.section_index[assignment_id], day, s] = True
+            entry = {
+                'id': entry_id, 'room_id': room_id, 'teacher_id': teacher_id, 'assignment_id': assignment_id,
+                'day_of_week': day, 'slot_id': slot_id,
+            }
+            self.entries.append(entry)
+            self.section_entries.setdefault(assignment_id, []).append(entry)
+
+    @classmethod
+    def from_db(cls, on_date=None):
+        from rooms.models import Room
+        from slot.models import Slot
+        from .models import Timetable, TimetableChange
+
+        on_date = on_date or date.today()
+        rows = Timetable.objects.values_list(
+            'id', 'room_id', 'course_assignment__teacher_id', 'course_assignment_id', 'day_of_week', 'slot_id'
+        )
+        entries = {row[0]: list(row) for row in rows}
+
+        # Approved changes in effect on the build date move their entry to the new cell
+        active_changes = TimetableChange.objects.filter(
+            Q(effective_to__isnull=True) | Q(effective_to__gte=on_date),
+            status='Approved',
+            effective_from__lte=on_date,
+        ).order_by('created_at').values_list('original_timetable_id', 'new_day_of_week', 'new_slot_id', 'new_room_id')
+        for entry_id, new_day, new_slot, new_room in active_changes:
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            if new_room is not None:
+                entry[1] = new_room
+            if new_day is not None:
+                entry[4] = new_day
+            if new_slot is not None:
+                entry[5] = new_slot
+
+        slots = Slot.objects.values_list('id', 'slot_name', 'slot_type', 'slot_start_time', 'slot_end_time')
+        rooms = Room.objects.values_list('id', 'room_number', 'block', 'room_max_cap', 'is_lab')
+        return cls(entries.values(), slots, rooms, on_date=on_date)
+
+    def _lookup(self, array, index, key, day, slot_id):
+        i = index.get(key)
+        s = self.slot_index.get(slot_id)
+        if i is None or s is None or not 0 <= day < DAYS_IN_WEEK:
+            return False
+        return bool(array[i, day, s])
+
+    def is_room_busy(self, room_id, day, slot_id):
+        return self._lookup(self.room_busy, self.room_index, room_id, day, slot_id)
+
+    def is_teacher_busy(self, teacher_id, day, slot_id):
+        return self._lookup(self.teacher_busy, self.teacher_index, teacher_id, day, slot_id)
+
+    def is_section_busy(self, assignment_id, day, slot_id):
+        return self._lookup(self.section_busy, self.section_index, assignment_id, day, slot_id)
+
+    def free_rooms(self, day, slot_id):
+        """Room ids with nothing booked in this cell"""
+        s = self.slot_index.get(slot_id)
+        if s is None or not 0 <= day < DAYS_IN_WEEK:
+            return []
+        room_ids = list(self.room_index)
+        return [room_ids[i] for i in np.flatnonzero(~self.room_busy[:, day, s])]
+
+    def overlapping_slots(self, slot_id):
+        """Slot indices whose time range intersects the given slot, the slot itself included"""
+        slot = self.slots[slot_id]
+        return [self.slot_index[sid] for sid, other in self.slots.items()
+                if other['start_time'] < slot['end_time'] and slot['start_time'] < other['end_time']
+                or sid == slot_id]
+
+    def set_busy(self, entry, busy=True):
+        """Mark (or clear) an entry's cell; entities unknown to the index are added on the fly"""
+        s = self.slot_index[entry['slot_id']]
+        day = entry['day_of_week']
+        r = self.room_index.get(entry['room_id'])
+        if r is not None:
+            self.room_busy[r, day, s] = busy
+        for array_name, index, key in (('teacher_busy', self.teacher_index, entry['teacher_id']),
+                                       ('section_busy', self.section_index, entry['assignment_id'])):
+            if key is None:
+                continue
+            if key not in index:
+                index[key] = len(index)
+                array = getattr(self, array_name)
+                setattr(self, array_name, np.concatenate([array, np.zeros((1,) + array.shape[1:], dtype=bool)]))
+            getattr(self, array_name)[index[key], day, s] = busy
+
+    def entries_for_section(self, assignment_id):
+        return self.section_entries.get(assignment_id, [])
+
+    def section_schedule(self, assignment_id):
+        """A course-section's timetable in the shape the slot pickers return"""
+        from .models import Timetable
+
+        day_names = dict(Timetable.DAY_CHOICES)
+        schedule = []
+        for entry in self.entries_for_section(assignment_id):
+            slot = self.slots[entry['slot_id']]
+            room = self.rooms.get(entry['room_id'], {})
+            schedule.append({
+                "id": entry['slot_id'],
+                "slot_name": slot['slot_name'],
+                "day_of_week": day_names.get(entry['day_of_week']),
+                "start_time": slot['start_time'].strftime('%H:%M') if slot['start_time'] else None,
+                "end_time": slot['end_time'].strftime('%H:%M') if slot['end_time'] else None,
+                "room": {
+                    "id": entry['room_id'],
+                    "room_number": room.get('room_number'),
+                    "room_name": f"{room.get('block', '')} {room.get('room_number', '')}".strip(),
+                },
+                "is_from_timetable": True,
+                "course_assignment": assignment_id,
+            })
+        return schedule
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'version': None, 'built_at': 0.0}
+
+
+def _current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    _state['index'] = None
+
+
+def invalidate_occupancy_index():
+    """
+    Mark the index stale in this process and, once the surrounding transaction
+    commits, in every process sharing the cache. Bumping before the commit would
+    let a concurrent reader cache pre-commit rows under the new version.
+    """
+    _state['index'] = None
+    transaction.on_commit(_bump_version)
+
+
+def get_occupancy_index():
+    """Return the current index, rebuilding it if it is stale"""
+    ttl = getattr(settings, 'OCCUPANCY_INDEX_TTL', DEFAULT_TTL)
+    version = _current_version()
+    index = _state['index']
+    if (index is not None and _state['version'] == version
+            and time.monotonic() - _state['built_at'] < ttl and index.on_date == date.today()):
+        return index
+
+    with _lock:
+        index = _state['index']
+        if (index is not None and _state['version'] == version
+                and time.monotonic() - _state['built_at'] < ttl and index.on_date == date.today()):
+            return index
+        started = time.monotonic()
+        index = OccupancyIndex.from_db()
+        # An index built inside a transaction may hold rows that are never committed
+        if not transaction.get_connection().in_atomic_block:
+            _state.update(index=index, version=version, built_at=time.monotonic())
+        logger.info(f"Rebuilt timetable occupancy index in {time.monotonic() - started:.3f}s")
+        return index
@@ -0,0 +1,113 @@
+"""
+Portfolio solving: several differently seeded and tuned solver runs in a
+process pool, best result wins.
+
+The problem snapshot is handed to each worker once through the pool
+initializer, so runs only ship back their placements. Workers are started
+with forkserver (spawn where that is missing), never fork: generation runs on
+a thread of a threaded or gevent web worker, and a forked child can inherit
+locks held by the other threads. Like the solver, this module never touches
+the ORM.
+"""
+import copy
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from .solver import TimetableSolver
+
+logger = logging.getLogger(__name__)
+
+# Construction noise per run, cycled: plain greedy, light and heavy diversification
+NOISE_LEVELS = [0.05, 0.0, 0.5, 2.0]
+
+# Extra seconds a run may take past the budget to pack up its result
+GRACE_SECONDS = 5
+
+_problem = None
+
+
+def _init_worker(problem):
+    global _problem
+    _problem = problem
+
+
+def _run(options, seed, budget):
+    started = time.monotonic()
+    result = TimetableSolver(_problem, options, seed=seed).solve(deadline=started + budget)
+    return seed, options.noise, result
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def process_context():
+    """A multiprocessing context that does not fork the calling, possibly threaded, process"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def run_portfolio(problem, options, runs=None, workers=None, on_result=None):
+    """
+    Solve the problem `runs` times in parallel and return (best_result, run_log).
+
+    run_log holds one dict per finished run: seed, noise, placed, sessions, score,
+    wall_seconds. Runs still going after options.timeout are abandoned.
+    on_result(run, best_result) is called as each run finishes.
+    """
+    workers = workers or default_workers()
+    runs = runs or workers
+    budget = options.timeout if options.timeout and options.timeout > 0 else 600
+
+    variants = []
+    for run in range(runs):
+        variant = copy.copy(options)
+        variant.noise = NOISE_LEVELS[run % len(NOISE_LEVELS)]
+        variants.append(variant)
+
+    best, run_log = None, []
+
+    def collect(seed, noise, result):
+        nonlocal best
+        run = {
+            'seed': seed,
+            'noise': noise,
+            'placed': result.stats['placed'],
+            'sessions': result.stats['sessions'],
+            'score': round(result.score, 2),
+            'wall_seconds': result.stats['wall_seconds'],
+        }
+        run_log.append(run)
+        if best is None or (len(result.unplaced), result.score) < (len(best.unplaced), best.score):
+            best = result
+        if on_result:
+            on_result(run, best)
+
+    if workers == 1 or runs == 1:
+        _init_worker(problem)
+        deadline = time.monotonic() + budget
+        for seed, variant in enumerate(variants):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            collect(*_run(variant, seed, remaining))
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, runs), mp_context=process_context(),
+                                       initializer=_init_worker, initargs=(problem,))
+        try:
+            futures = [executor.submit(_run, variant, seed, budget) for seed, variant in enumerate(variants)]
+            try:
+                for future in as_completed(futures, timeout=budget + GRACE_SECONDS):
+                    try:
+                        collect(*future.result())
+                    except Exception as e:
+                        logger.error(f"Portfolio run failed: {str(e)}", exc_info=True)
+            except FutureTimeoutError:
+                logger.warning("Some portfolio runs did not finish within the solver timeout")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return best, run_log
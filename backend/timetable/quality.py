@@ -0,0 +1,331 @@
+"""
+Timetable quality scoring.
+
+TimetableQuality takes a timetable as parallel arrays (one element per entry,
+i.e. per course section taught in one slot on one day) and measures it with
+array operations only:
+
+    - teacher idle gaps and double bookings
+    - per-day teacher load against max_teacher_slots_per_day
+    - room capacity fit, lab/class room mismatches and room double bookings
+    - lab adjacency (lab periods of a section that have no lab neighbour)
+    - slot-type balance across the week
+    - student clashes: overlapping courses of one department/year/semester and
+      overlapping courses that share students (see coenrollment)
+
+Time is discretised into units, one per distinct period (start, end); an
+entry occupies every unit its slot overlaps, so window slots and periods of
+different slot types line up. The same scorer reads a stored timetable
+(from_db) or a solver result (from_solver).
+"""
+import numpy as np
+
+from .coenrollment import CoEnrollmentMatrix
+from .solver import CHANNELS, MAX_CONSECUTIVE_GAP, MAX_PERIOD_MINUTES
+
+SLOT_TYPES = ['A', 'B', 'C']
+DAYS_IN_WEEK = 7
+
+# Weight of a hard violation in the overall score, against one unit of soft cost
+HARD_WEIGHT = 100
+# Soft cost per idle teacher hour, per isolated lab period and for a fully one-sided slot-type mix
+IDLE_HOUR_WEIGHT = 1.0
+ISOLATED_LAB_WEIGHT = 2.0
+IMBALANCE_WEIGHT = 10.0
+
+ENTRY_COLUMNS = ['day', 'slot', 'room', 'teacher', 'assignment', 'course', 'dept', 'year', 'semester',
+                 'elective', 'is_lab', 'students']
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _codes(values):
+    """Dense 0..n-1 codes of the values, and n"""
+    unique, codes = np.unique(values, return_inverse=True)
+    return codes.reshape(-1), len(unique)
+
+
+class TimetableQuality:
+    """
+    slots   -- iterable of (slot_id, slot_type, start, end), start/end in minutes since midnight
+    rooms   -- iterable of (room_id, capacity, is_lab)
+    entries -- {column: array} for ENTRY_COLUMNS; dept is -1 when unknown, elective is a CHANNELS code
+    conflict_pairs -- iterable of (course_a, course_b, shared_students)
+    """
+
+    def __init__(self, slots, rooms, entries, max_teacher_slots_per_day=5, conflict_pairs=()):
+        self.max_teacher_slots_per_day = max_teacher_slots_per_day
+
+        slots = sorted(slots)
+        self.slot_ids = np.array([s[0] for s in slots], dtype=np.int64)
+        self.slot_type = np.array([SLOT_TYPES.index(s[1]) if s[1] in SLOT_TYPES else 0 for s in slots],
+                                  dtype=np.intp)
+        slot_start = np.array([s[2] for s in slots], dtype=np.int32)
+        slot_end = np.array([s[3] for s in slots], dtype=np.int32)
+
+        # Units: distinct period time ranges, in time order
+        periods = sorted({(s[2], s[3]) for s in slots if s[3] - s[2] <= MAX_PERIOD_MINUTES}) or \
+            sorted({(s[2], s[3]) for s in slots})
+        self.unit_start = np.array([p[0] for p in periods], dtype=np.int32)
+        self.unit_end = np.array([p[1] for p in periods], dtype=np.int32)
+        self.n_units = len(periods)
+        # slot_units[i, u]: slot i covers unit u
+        self.slot_units = (slot_start[:, None] < self.unit_end[None, :]) & \
+                          (self.unit_start[None, :] < slot_end[:, None])
+        # unit u and u + 1 follow each other without a break
+        self.unit_consecutive = np.zeros(self.n_units, dtype=bool)
+        if self.n_units > 1:
+            self.unit_consecutive[:-1] = self.unit_start[1:] - self.unit_end[:-1] <= MAX_CONSECUTIVE_GAP
+
+        rooms = sorted(rooms)
+        self.room_ids = np.array([r[0] for r in rooms], dtype=np.int64)
+        self.room_capacity = np.array([r[1] or 0 for r in rooms], dtype=np.int32)
+        self.room_is_lab = np.array([bool(r[2]) for r in rooms], dtype=bool)
+
+        self.entries = {name: np.asarray(entries[name]) for name in ENTRY_COLUMNS}
+        self.n_entries = len(self.entries['day'])
+        self.e_slot = self._lookup(self.slot_ids, self.entries['slot'])
+        self.e_room = self._lookup(self.room_ids, self.entries['room'])
+
+        # Entries expanded to the units they cover: x_entry[k] occupies unit x_unit[k]
+        known = self.e_slot >= 0
+        covered = np.zeros((self.n_entries, self.n_units), dtype=bool)
+        covered[known] = self.slot_units[self.e_slot[known]]
+        self.x_entry, self.x_unit = np.nonzero(covered)
+        self.x_day = self.entries['day'][self.x_entry].astype(np.int64)
+
+        self.conflict_pairs = np.array(list(conflict_pairs), dtype=np.int64).reshape(-1, 3)
+
+    @staticmethod
+    def _lookup(ids, values):
+        values = np.asarray(values, dtype=np.int64)
+        if not len(ids) or not len(values):
+            return np.full(len(values), -1, dtype=np.intp)
+        found = np.searchsorted(ids, values).clip(0, len(ids) - 1)
+        return np.where(ids[found] == values, found, -1)
+
+    @classmethod
+    def from_db(cls, entries=None, max_teacher_slots_per_day=5, conflicts=True):
+        """Score stored Timetable rows (all of them unless a queryset is given)"""
+        from rooms.models import Room
+        from slot.models import Slot
+        from .models import Timetable
+
+        if entries is None:
+            entries = Timetable.objects.all()
+        rows = list(entries.values_list(
+            'day_of_week', 'slot_id', 'room_id', 'course_assignment__teacher_id', 'course_assignment_id',
+            'course_assignment__course_id', 'course_assignment__course_id__for_dept_id',
+            'course_assignment__course_id__course_year', 'course_assignment__course_id__course_semester',
+            'course_assignment__course_id__elective_type', 'session_type', 'course_assignment__student_count',
+        ))
+        slots = [(sid, slot_type, _minutes(start), _minutes(end)) for sid, slot_type, start, end in
+                 Slot.objects.values_list('id', 'slot_type', 'slot_start_time', 'slot_end_time')]
+        rooms = list(Room.objects.values_list('id', 'room_max_cap', 'is_lab'))
+
+        def column(i, missing=0):
+            return np.array([missing if row[i] is None else row[i] for row in rows], dtype=np.int64)
+
+        columns = {
+            'day': column(0), 'slot': column(1), 'room': column(2), 'teacher': column(3, -1),
+            'assignment': column(4), 'course': column(5, -1), 'dept': column(6, -1), 'year': column(7),
+            'semester': column(8),
+            'elective': np.array([CHANNELS.get(row[9] or 'NE', 0) for row in rows], dtype=np.int64),
+            'is_lab': np.array([row[10] == 'Lab' for row in rows], dtype=bool),
+            'students': column(11),
+        }
+        conflict_pairs = ()
+        if conflicts:
+            course_ids = np.unique(columns['course'][columns['course'] >= 0]).tolist()
+            conflict_pairs = CoEnrollmentMatrix.from_db(course_ids).pairs()
+        return cls(slots, rooms, columns, max_teacher_slots_per_day, conflict_pairs)
+
+    @classmethod
+    def from_solver(cls, problem, result, options=None):
+        """Score a SolverResult against the TimetableProblem it solved"""
+        rows = []
+        for s, day, slot_ids, room_id in result.placements:
+            session = problem.sessions[s]
+            dept, year, semester = session['group']
+            for slot_id in slot_ids:
+                rows.append((
+                    day, slot_id, room_id, session['teacher_id'], session['assignment_id'], session['course_id'],
+                    -1 if dept is None else dept, year, semester, CHANNELS.get(session['elective_type'], 0),
+                    session['session_type'] == 'Lab', session['student_count'] or 0,
+                ))
+        columns = {name: np.array([row[i] for row in rows], dtype=bool if name == 'is_lab' else np.int64)
+                   for i, name in enumerate(ENTRY_COLUMNS)}
+        slots = [(s['id'], s['slot_type'], s['start'], s['end']) for s in problem.slots]
+        rooms = [(r['id'], r['capacity'], r['is_lab']) for r in problem.rooms]
+        conflict_pairs = [(a, b, 1) for a, others in problem.course_conflicts.items() for b in others if a < b]
+        max_slots = options.max_teacher_slots_per_day if options is not None else 5
+        return cls(slots, rooms, columns, max_slots, conflict_pairs)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    def _occupancy(self, owner):
+        """(owner, day, unit) entry counts for an entry column; unknown (-1) owners are left out"""
+        values = self.entries[owner][self.x_entry]
+        known = values >= 0
+        codes, n = _codes(values[known])
+        counts = np.zeros((n, DAYS_IN_WEEK, self.n_units), dtype=np.int32)
+        np.add.at(counts, (codes, self.x_day[known], self.x_unit[known]), 1)
+        return counts
+
+    def teacher_metrics(self):
+        counts = self._occupancy('teacher')
+        busy = counts > 0
+        teaching = busy.any(axis=2)
+        first = np.argmax(busy, axis=2)
+        last = self.n_units - 1 - np.argmax(busy[:, :, ::-1], axis=2)
+        units = np.arange(self.n_units)
+        inside = (units >= first[..., None]) & (units <= last[..., None]) & teaching[..., None]
+        idle = inside & ~busy
+        unit_minutes = self.unit_end - self.unit_start
+        idle_minutes = (idle * unit_minutes).sum(axis=2)
+        # A gap is a run of idle units: count the units whose predecessor is not idle
+        gap_starts = idle.copy()
+        gap_starts[:, :, 1:] &= ~idle[:, :, :-1]
+
+        load = busy.sum(axis=2)
+        over = np.clip(load - self.max_teacher_slots_per_day, 0, None)
+        teaching_days = int(teaching.sum())
+        return {
+            'teachers': int(counts.shape[0]),
+            'teaching_days': teaching_days,
+            'idle_gaps': int(gap_starts.sum()),
+            'idle_minutes': int(idle_minutes.sum()),
+            'max_idle_minutes_per_day': int(idle_minutes.max()) if idle_minutes.size else 0,
+            'teacher_days_with_gaps': int((idle_minutes > 0).sum()),
+            'double_booked_periods': int((counts > 1).sum()),
+            'max_daily_load': int(load.max()) if load.size else 0,
+            'mean_daily_load': round(float(load[teaching].mean()), 2) if teaching_days else 0.0,
+            'overloaded_teacher_days': int((over > 0).sum()),
+            'excess_periods': int(over.sum()),
+            'max_teacher_slots_per_day': self.max_teacher_slots_per_day,
+        }
+
+    def room_metrics(self):
+        placed = self.e_room >= 0
+        capacity = np.where(placed, self.room_capacity[self.e_room.clip(0)], 0)
+        students = self.entries['students']
+        known = placed & (capacity > 0) & (students > 0)
+        utilisation = students[known] / capacity[known]
+        is_lab_room = np.where(placed, self.room_is_lab[self.e_room.clip(0)], False)
+        counts = self._occupancy('room')
+        return {
+            'entries': self.n_entries,
+            'over_capacity_entries': int((known & (students > capacity)).sum()),
+            'seats_short': int(np.clip(students - capacity, 0, None)[known].sum()),
+            'seats_wasted': int(np.clip(capacity - students, 0, None)[known].sum()),
+            'mean_utilisation': round(float(utilisation.mean()), 3) if utilisation.size else None,
+            'room_type_mismatches': int((placed & (is_lab_room != self.entries['is_lab'])).sum()),
+            'double_booked_periods': int((counts > 1).sum()),
+        }
+
+    def lab_metrics(self):
+        """Lab periods of a section with no lab period of the same section right before or after"""
+        lab = self.entries['is_lab'][self.x_entry]
+        assignment = self.entries['assignment'][self.x_entry][lab]
+        day, unit = self.x_day[lab], self.x_unit[lab]
+        n_units = max(self.n_units, 1)
+        keys = (assignment * DAYS_IN_WEEK + day) * n_units + unit
+        linked_prev = (unit > 0) & self.unit_consecutive[(unit - 1).clip(0)] & np.isin(keys - 1, keys)
+        linked_next = self.unit_consecutive[unit] & np.isin(keys + 1, keys)
+        isolated = ~(linked_prev | linked_next)
+        return {
+            'lab_periods': int(lab.sum()),
+            'isolated_lab_periods': int(isolated.sum()),
+        }
+
+    def slot_type_metrics(self):
+        placed = self.e_slot >= 0
+        types = self.slot_type[self.e_slot[placed]]
+        days = self.entries['day'][placed]
+        per_day = np.zeros((DAYS_IN_WEEK, len(SLOT_TYPES)), dtype=np.int64)
+        np.add.at(per_day, (days, types), 1)
+        totals = per_day.sum(axis=0)
+        imbalance = float(totals.std() / totals.mean()) if totals.sum() else 0.0
+        return {
+            'entries_per_type': {t: int(n) for t, n in zip(SLOT_TYPES, totals)},
+            'entries_per_day': {int(d): {t: int(n) for t, n in zip(SLOT_TYPES, per_day[d])}
+                                for d in range(DAYS_IN_WEEK) if per_day[d].any()},
+            'imbalance': round(imbalance, 3),
+        }
+
+    def student_metrics(self):
+        x = self.x_entry
+        n_units = max(self.n_units, 1)
+        group, _ = _codes((self.entries['dept'][x] + 1) * 10000 + self.entries['year'][x] * 100
+                          + self.entries['semester'][x])
+        cell, n_cells = _codes((group * DAYS_IN_WEEK + self.x_day) * n_units + self.x_unit)
+        channel = self.entries['elective'][x]
+        course, n_courses = _codes(self.entries['course'][x])
+        course_values = np.unique(self.entries['course'][x])
+
+        # A group clashes in a cell when two channels meet there, or two different regular courses
+        channels = np.unique(cell * len(CHANNELS) + channel) // len(CHANNELS)
+        regular = channel == CHANNELS['NE']
+        ne_courses = np.unique(cell[regular] * max(n_courses, 1) + course[regular]) // max(n_courses, 1)
+        group_clashes = (np.bincount(channels, minlength=n_cells) > 1) | \
+                        (np.bincount(ne_courses, minlength=n_cells) > 1)
+
+        # Courses sharing students that meet in the same (day, unit): look up every cell of
+        # course a of a conflicting pair in the sorted (course, cell) keys of course b
+        n_times = DAYS_IN_WEEK * n_units
+        keys = np.unique(course.astype(np.int64) * n_times + self.x_day * n_units + self.x_unit)
+        pairs = self.conflict_pairs
+        a = self._lookup(course_values, pairs[:, 0])
+        b = self._lookup(course_values, pairs[:, 1])
+        known = (a >= 0) & (b >= 0)
+        pairs, a, b = pairs[known], a[known], b[known]
+        starts = np.searchsorted(keys, np.arange(n_courses + 1) * n_times)
+        lengths = (starts[1:] - starts[:-1])[a]
+        pair_of = np.repeat(np.arange(len(pairs)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        probes = b[pair_of] * n_times + keys[starts[a][pair_of] + offsets] % n_times
+        found = np.searchsorted(keys, probes).clip(0, max(len(keys) - 1, 0))
+        hit = keys[found] == probes if len(keys) else np.zeros(len(probes), dtype=bool)
+        overlap = np.bincount(pair_of[hit], minlength=len(pairs))
+        clashing = overlap > 0
+
+        return {
+            'group_clash_periods': int(group_clashes.sum()),
+            'coenrolled_clash_pairs': int(clashing.sum()),
+            'coenrolled_clash_periods': int(overlap.sum()),
+            'students_affected': int(pairs[clashing, 2].sum()),
+        }
+
+    def report(self):
+        teachers = self.teacher_metrics()
+        rooms = self.room_metrics()
+        labs = self.lab_metrics()
+        slot_types = self.slot_type_metrics()
+        students = self.student_metrics()
+
+        hard = (teachers['double_booked_periods'] + teachers['excess_periods'] + rooms['double_booked_periods']
+                + rooms['over_capacity_entries'] + students['group_clash_periods']
+                + students['coenrolled_clash_periods'])
+        soft = (IDLE_HOUR_WEIGHT * teachers['idle_minutes'] / 60 + ISOLATED_LAB_WEIGHT * labs['isolated_lab_periods']
+                + IMBALANCE_WEIGHT * slot_types['imbalance'])
+        return {
+            'score': round(HARD_WEIGHT * hard + soft, 2),
+            'hard_violations': hard,
+            'soft_cost': round(soft, 2),
+            'teachers': teachers,
+            'rooms': rooms,
+            'labs': labs,
+            'slot_types': slot_types,
+            'students': students,
+        }
+
+    def summary(self):
+        report = self.report()
+        return (f"quality score {report['score']}: {report['hard_violations']} hard violations, "
+                f"{report['teachers']['idle_gaps']} teacher idle gaps, "
+                f"{report['labs']['isolated_lab_periods']} isolated lab periods, "
+                f"{report['students']['group_clash_periods'] + report['students']['coenrolled_clash_periods']} "
+                f"student clash periods")
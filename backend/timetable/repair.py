@@ -0,0 +1,178 @@
+"""
+Incremental repair after a TimetableChange is approved.
+
+An approved change moves one entry into a new (day, slot, room) cell. Entries
+that now clash with it -- same room, same teacher or same course-section in an
+overlapping slot -- are moved to the nearest free cell, preferring the same day
+and the same room. Nothing else in the week is touched.
+
+Moves are recorded as approved TimetableChange rows over the same effective
+range as the triggering change, so recurring entries stay as they were and a
+temporary change repairs only temporarily.
+"""
+import logging
+import time
+
+import numpy as np
+from django.db import transaction
+
+from slot.models import TeacherSlotAssignment
+from teacherCourse.models import TeacherCourse
+from .models import TimetableChange
+from .occupancy import OccupancyIndex, invalidate_occupancy_index
+from .solver import MAX_PERIOD_MINUTES, DEFAULT_DAYS
+
+logger = logging.getLogger(__name__)
+
+OTHER_DAY_PENALTY = 100
+
+
+class RepairError(Exception):
+    """Raised when a conflicting entry has no free cell to move to"""
+
+    def __init__(self, message, unresolved):
+        super().__init__(message)
+        self.unresolved = unresolved
+
+
+class TimetableRepairService:
+    """Move only the entries that clash with an approved change"""
+
+    def __init__(self, change):
+        self.change = change
+
+    def _build_index(self):
+        change = self.change
+        index = OccupancyIndex.from_db(on_date=change.effective_from)
+
+        # Approved changes starting later in the range still claim their cells
+        later = TimetableChange.objects.filter(
+            status='Approved',
+            effective_from__gt=change.effective_from,
+        ).exclude(id=change.id)
+        if change.effective_to:
+            later = later.filter(effective_from__lte=change.effective_to)
+        entries = {entry['id']: entry for entry in index.entries}
+        for entry_id, new_day, new_slot, new_room in later.values_list(
+                'original_timetable_id', 'new_day_of_week', 'new_slot_id', 'new_room_id'):
+            entry = entries.get(entry_id)
+            if entry is not None:
+                index.set_busy(dict(entry, day_of_week=new_day if new_day is not None else entry['day_of_week'],
+                                    slot_id=new_slot or entry['slot_id'], room_id=new_room or entry['room_id']))
+        return index, entries
+
+    def _conflicts(self, index, moved):
+        overlapping = set(index.overlapping_slots(moved['slot_id']))
+        return [
+            entry for entry in index.entries
+            if entry['id'] != moved['id']
+            and entry['day_of_week'] == moved['day_of_week']
+            and index.slot_index[entry['slot_id']] in overlapping
+            and (entry['room_id'] == moved['room_id']
+                 or entry['teacher_id'] == moved['teacher_id']
+                 or entry['assignment_id'] == moved['assignment_id'])
+        ]
+
+    def _candidate_cells(self, index, entry, teacher_days):
+        """(day, slot_id) cells the entry may move to, nearest first"""
+        origin = index.slots[entry['slot_id']]['start_time']
+        days = teacher_days.get(entry['teacher_id'])
+        cells = []
+        for slot_id, slot in index.slots.items():
+            start, end = slot['start_time'], slot['end_time']
+            length = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+            if length <= 0 or length > MAX_PERIOD_MINUTES:
+                continue
+            distance = abs((start.hour * 60 + start.minute) - (origin.hour * 60 + origin.minute))
+            for day in (days.keys() if days else DEFAULT_DAYS):
+                if days and days[day] != slot['slot_type']:
+                    continue
+                penalty = 0 if day == entry['day_of_week'] else OTHER_DAY_PENALTY
+                cells.append((penalty + distance / 60, day, slot_id))
+        cells.sort()
+        return cells
+
+    def _find_cell(self, index, entry, teacher_days, needs):
+        room_ids = np.array(list(index.room_index))
+        capacities = np.array([index.rooms[r]['capacity'] or 0 for r in room_ids])
+        is_lab = np.array([bool(index.rooms[r]['is_lab']) for r in room_ids])
+        current = index.rooms.get(entry['room_id'], {})
+        compatible = (is_lab == bool(current.get('is_lab'))) & ((capacities >= needs) | (capacities == 0))
+        if entry['room_id'] in index.room_index:
+            compatible[index.room_index[entry['room_id']]] = True
+
+        t = index.teacher_index.get(entry['teacher_id'])
+        a = index.section_index.get(entry['assignment_id'])
+        for _, day, slot_id in self._candidate_cells(index, entry, teacher_days):
+            overlapping = index.overlapping_slots(slot_id)
+            if t is not None and index.teacher_busy[t, day, overlapping].any():
+                continue
+            if a is not None and index.section_busy[a, day, overlapping].any():
+                continue
+            free = compatible & ~index.room_busy[:, day, overlapping].any(axis=1)
+            if not free.any():
+                continue
+            # Keep the room if it is free, otherwise the tightest fit
+            r = index.room_index.get(entry['room_id'])
+            if r is None or not free[r]:
+                waste = np.where(free, capacities - needs, np.iinfo(np.int64).max)
+                r = int(np.argmin(waste))
+            return day, slot_id, int(room_ids[r])
+        return None
+
+    def repair(self, user):
+        """Record moves for every entry that clashes with the change; returns the new changes"""
+        started = time.monotonic()
+        change = self.change
+        index, entries = self._build_index()
+        moved = entries.get(change.original_timetable_id)
+        if moved is None:
+            return []
+
+        conflicts = self._conflicts(index, moved)
+        if not conflicts:
+            return []
+
+        assignment_ids = {entry['assignment_id'] for entry in conflicts}
+        student_counts = dict(TeacherCourse.objects.filter(id__in=assignment_ids).values_list('id', 'student_count'))
+        teacher_days = {}
+        for teacher_id, day, slot_type in TeacherSlotAssignment.objects.filter(
+                teacher_id__in={entry['teacher_id'] for entry in conflicts}
+        ).values_list('teacher_id', 'day_of_week', 'slot__slot_type'):
+            teacher_days.setdefault(teacher_id, {})[day] = slot_type
+
+        for entry in conflicts:
+            index.set_busy(entry, busy=False)
+        # A conflict may have shared the moved entry's exact cell
+        index.set_busy(moved)
+
+        repairs, unresolved = [], []
+        for entry in conflicts:
+            cell = self._find_cell(index, entry, teacher_days, student_counts.get(entry['assignment_id']) or 0)
+            if cell is None:
+                unresolved.append(entry['id'])
+                continue
+            day, slot_id, room_id = cell
+            index.set_busy(dict(entry, day_of_week=day, slot_id=slot_id, room_id=room_id))
+            repairs.append(TimetableChange(
+                original_timetable_id=entry['id'],
+                new_day_of_week=day,
+                new_slot_id=slot_id,
+                new_room_id=room_id,
+                reason=f"Moved automatically to make room for change #{change.id}",
+                effective_from=change.effective_from,
+                effective_to=change.effective_to,
+                created_by=user,
+                status='Approved',
+            ))
+
+        if unresolved:
+            raise RepairError(f"No free cell for {len(unresolved)} conflicting entries", unresolved)
+
+        with transaction.atomic():
+            created = TimetableChange.objects.bulk_create(repairs)
+        # bulk_create sends no post_save signals
+        invalidate_occupancy_index()
+        logger.info(f"Repaired change {change.id}: moved {len(created)} entries in "
+                    f"{time.monotonic() - started:.3f}s")
+        return created
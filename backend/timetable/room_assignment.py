@@ -0,0 +1,327 @@
+"""
+Room assignment as a sequence of assignment problems.
+
+Every (session, room) pair gets a cost from one vectorized matrix: seat waste,
+CourseRoomPreference room type, tech level and lab type fit, explicitly
+preferred rooms. Sessions are then swept per day in start-time order and each
+(day, start time) cell is solved as a minimum-cost bipartite matching over the
+rooms still free for the whole length of each session, so lab and capacity
+placement is optimal per cell instead of first-fit.
+
+Hard rules are the solver's: lab sessions go to labs, other sessions to class
+rooms, and the room must seat the class (falling back to the largest rooms of
+the right kind). Everything else is soft, so any timetable the solver produced
+can always keep its rooms; a day whose sweep runs into a dead end keeps its
+original rooms.
+
+RoomAssigner works on plain dicts; reassign_timetable() runs it standalone on
+the stored timetable.
+"""
+import logging
+
+import numpy as np
+
+from .solver import MAX_CONSECUTIVE_GAP
+
+logger = logging.getLogger(__name__)
+
+TECH_RANK = {'None': 0, 'Basic': 1, 'Advanced': 2, 'High-tech': 3}
+# Minimum tech level a lab type needs
+LAB_TYPE_TECH = {'low-end': 1, 'mid-end': 2, 'high-end': 3}
+# Room.room_type each CourseRoomPreference.preferred_for asks for
+PREFERRED_ROOM_TYPE = {'GENERAL': 'Class-Room', 'TL': 'Computer-Lab', 'NTL': 'Core-Lab'}
+
+# Cost weights
+WASTE_WEIGHT = 1.0
+ROOM_TYPE_PENALTY = 2.0
+TECH_SHORTFALL_WEIGHT = 1.0
+TECH_SURPLUS_WEIGHT = 0.1
+PREFERRED_ROOM_BONUS = 0.5
+STAY_BONUS = 0.05
+INFEASIBLE = 1e9
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment for a rectangular cost matrix (Hungarian method with
+    potentials, inner loop vectorized). Returns the column chosen for each row;
+    needs at least as many columns as rows.
+    """
+    cost = np.asarray(cost, dtype=float)
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("More rows than columns")
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.intp)    # p[j]: row (1-based) matched to column j
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            used_columns = np.flatnonzero(used)
+            u[p[used_columns]] += delta
+            v[used_columns] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    columns = np.empty(n, dtype=np.intp)
+    for j in range(1, m + 1):
+        if p[j]:
+            columns[p[j] - 1] = j - 1
+    return columns
+
+
+class RoomAssigner:
+    """
+    rooms       -- list of dicts: id, capacity, is_lab, room_type, tech_level
+    preferences -- {course_id: [dict(room_id, preference_level, preferred_for,
+                   tech_level_preference, lab_type), ...]}
+    """
+
+    def __init__(self, rooms, preferences=None):
+        self.room_ids = np.array([r['id'] for r in rooms], dtype=np.int64)
+        self.room_index = {rid: i for i, rid in enumerate(self.room_ids.tolist())}
+        self.capacity = np.array([r['capacity'] or 0 for r in rooms], dtype=np.int32)
+        self.is_lab = np.array([bool(r['is_lab']) for r in rooms], dtype=bool)
+        self.room_type = np.array([r.get('room_type') or '' for r in rooms])
+        self.tech = np.array([TECH_RANK.get(r.get('tech_level'), 0) for r in rooms], dtype=np.int8)
+        self.preferences = preferences or {}
+
+    @classmethod
+    def from_db(cls):
+        from course.models import CourseRoomPreference
+        from rooms.models import Room
+
+        rooms = [
+            {'id': rid, 'capacity': capacity, 'is_lab': is_lab, 'room_type': room_type, 'tech_level': tech_level}
+            for rid, capacity, is_lab, room_type, tech_level in Room.objects.values_list(
+                'id', 'room_max_cap', 'is_lab', 'room_type', 'tech_level'
+            )
+        ]
+        preferences = {}
+        for course_id, room_id, level, preferred_for, tech_level, lab_type in CourseRoomPreference.objects.values_list(
+                'course_id', 'room_id', 'preference_level', 'preferred_for', 'tech_level_preference', 'lab_type'):
+            preferences.setdefault(course_id, []).append({
+                'room_id': room_id,
+                'preference_level': level or 0,
+                'preferred_for': preferred_for,
+                'tech_level_preference': tech_level,
+                'lab_type': lab_type,
+            })
+        return cls(rooms, preferences)
+
+    def _course_needs(self, course_id):
+        """(room_type, min tech rank, {room index: preference level}) from a course's room preferences"""
+        prefs = sorted(self.preferences.get(course_id, []), key=lambda p: -p['preference_level'])
+        if not prefs:
+            return None, 0, {}
+        top = prefs[0]
+        tech = max(TECH_RANK.get(top['tech_level_preference'], 0), LAB_TYPE_TECH.get(top['lab_type'], 0))
+        preferred = {}
+        for pref in prefs:
+            r = self.room_index.get(pref['room_id'])
+            if r is not None:
+                preferred[r] = max(preferred.get(r, 0), pref['preference_level'])
+        return PREFERRED_ROOM_TYPE.get(top['preferred_for']), tech, preferred
+
+    def cost_matrix(self, sessions):
+        """
+        sessions -- list of dicts: course_id, student_count, is_lab and optionally room_id (current room)
+        Returns an (S, R) array; incompatible pairs cost INFEASIBLE.
+        """
+        n_rooms = len(self.room_ids)
+        students = np.array([s['student_count'] or 0 for s in sessions], dtype=np.int32)[:, None]
+        wants_lab = np.array([bool(s['is_lab']) for s in sessions], dtype=bool)[:, None]
+        capacity = self.capacity[None, :]
+
+        kind = self.is_lab[None, :] == wants_lab
+        kind |= ~kind.any(axis=1, keepdims=True)
+        fits = (capacity >= students) | (capacity <= 0)
+        allowed = kind & fits
+        # Nobody seats the whole class: fall back to the largest rooms of the right kind
+        largest = np.where(kind, capacity, -1).max(axis=1, keepdims=True)
+        allowed |= ~allowed.any(axis=1, keepdims=True) & kind & (capacity >= largest)
+
+        max_cap = max(int(self.capacity.max()), 1) if n_rooms else 1
+        waste = np.where(capacity > 0, capacity - students, max_cap // 2)
+        cost = WASTE_WEIGHT * np.clip(waste, 0, None) / max_cap
+
+        needs = [self._course_needs(s['course_id']) for s in sessions]
+        wanted_type = np.array([need[0] or '' for need in needs])[:, None]
+        min_tech = np.array([need[1] for need in needs], dtype=np.int8)[:, None]
+        cost += ROOM_TYPE_PENALTY * ((wanted_type != '') & (self.room_type[None, :] != wanted_type))
+        gap = self.tech[None, :].astype(np.int16) - min_tech
+        cost += TECH_SHORTFALL_WEIGHT * np.clip(-gap, 0, None) + TECH_SURPLUS_WEIGHT * np.clip(gap, 0, None)
+
+        for i, (_, _, preferred) in enumerate(needs):
+            for r, level in preferred.items():
+                cost[i, r] -= PREFERRED_ROOM_BONUS * level
+        for i, s in enumerate(sessions):
+            r = self.room_index.get(s.get('room_id'))
+            if r is not None:
+                cost[i, r] -= STAY_BONUS
+
+        return np.where(allowed, cost, INFEASIBLE)
+
+    def assign(self, sessions, held=()):
+        """
+        sessions -- dicts as for cost_matrix plus day, start, end (minutes); all of them are (re)assigned
+        held     -- (day, start, end, room_id) tuples for rooms taken by entries left alone
+        Returns a room id per session.
+        """
+        rooms = [s.get('room_id') for s in sessions]
+        if not sessions or not len(self.room_ids):
+            return rooms
+        cost = self.cost_matrix(sessions)
+
+        days = {}
+        for i, s in enumerate(sessions):
+            days.setdefault(s['day'], []).append(i)
+        held_by_day = {}
+        for day, start, end, room_id in held:
+            r = self.room_index.get(room_id)
+            if r is not None:
+                held_by_day.setdefault(day, []).append((start, end, r))
+
+        for day, indices in days.items():
+            holdings = list(held_by_day.get(day, []))
+            chosen = {}
+            cells = {}
+            for i in indices:
+                cells.setdefault(sessions[i]['start'], []).append(i)
+            for start in sorted(cells):
+                group = cells[start]
+                sub = cost[group].copy()
+                if holdings:
+                    h_start, h_end, h_room = (np.array(column) for column in zip(*holdings))
+                    for row, i in enumerate(group):
+                        overlap = (h_start < sessions[i]['end']) & (sessions[i]['start'] < h_end)
+                        sub[row, h_room[overlap]] = INFEASIBLE
+                columns = np.flatnonzero((sub < INFEASIBLE).any(axis=0))
+                if len(columns) < len(group):
+                    break
+                picks = columns[solve_assignment(sub[:, columns])]
+                if (sub[np.arange(len(group)), picks] >= INFEASIBLE).any():
+                    break
+                for i, r in zip(group, picks):
+                    chosen[i] = int(r)
+                    holdings.append((sessions[i]['start'], sessions[i]['end'], int(r)))
+            else:
+                for i, r in chosen.items():
+                    rooms[i] = int(self.room_ids[r])
+                continue
+            logger.warning(f"Room assignment found no complete matching for day {day}; keeping its rooms")
+        return rooms
+
+
+def assign_result_rooms(problem, result, assigner=None):
+    """Re-pick the rooms of a SolverResult in place; returns how many sessions changed room"""
+    assigner = assigner or RoomAssigner.from_db()
+    slots = {slot['id']: slot for slot in problem.slots}
+    sessions = []
+    for session_index, day, slot_ids, room_id in result.placements:
+        session = problem.sessions[session_index]
+        sessions.append({
+            'course_id': session['course_id'],
+            'student_count': session['student_count'],
+            'is_lab': session['session_type'] == 'Lab',
+            'room_id': room_id,
+            'day': day,
+            'start': min(slots[sid]['start'] for sid in slot_ids),
+            'end': max(slots[sid]['end'] for sid in slot_ids),
+        })
+    held = [(f['day'], slots[f['slot_id']]['start'], slots[f['slot_id']]['end'], f['room_id'])
+            for f in problem.fixed if f['slot_id'] in slots]
+
+    rooms = assigner.assign(sessions, held)
+    changed = 0
+    for k, (session_index, day, slot_ids, room_id) in enumerate(result.placements):
+        if rooms[k] != room_id:
+            result.placements[k] = (session_index, day, slot_ids, rooms[k])
+            changed += 1
+    return changed
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def reassign_timetable(dry_run=False):
+    """
+    Re-pick rooms for the stored timetable. Consecutive entries of the same
+    course-section in the same room on the same day move together.
+    Returns a list of (timetable_id, old_room_id, new_room_id).
+    """
+    from django.db import transaction
+    from slot.models import Slot
+    from .models import Timetable
+    from .occupancy import invalidate_occupancy_index
+
+    slot_times = {sid: (_minutes(start), _minutes(end))
+                  for sid, start, end in Slot.objects.values_list('id', 'slot_start_time', 'slot_end_time')}
+    rows = sorted(
+        Timetable.objects.values_list(
+            'id', 'day_of_week', 'slot_id', 'room_id', 'session_type', 'course_assignment_id',
+            'course_assignment__course_id', 'course_assignment__student_count',
+        ),
+        key=lambda row: (row[5], row[1], slot_times[row[2]][0]),
+    )
+
+    blocks = []
+    for entry_id, day, slot_id, room_id, session_type, assignment_id, course_id, students in rows:
+        start, end = slot_times[slot_id]
+        last = blocks[-1] if blocks else None
+        if (last and last['assignment_id'] == assignment_id and last['day'] == day
+                and last['room_id'] == room_id and last['session_type'] == session_type
+                and 0 <= start - last['end'] <= MAX_CONSECUTIVE_GAP):
+            last['end'] = end
+            last['entries'].append(entry_id)
+            continue
+        blocks.append({
+            'assignment_id': assignment_id, 'course_id': course_id, 'student_count': students,
+            'session_type': session_type, 'is_lab': session_type == 'Lab',
+            'room_id': room_id, 'day': day, 'start': start, 'end': end, 'entries': [entry_id],
+        })
+
+    rooms = RoomAssigner.from_db().assign(blocks)
+    moves = []
+    for block, new_room in zip(blocks, rooms):
+        if new_room != block['room_id']:
+            moves.extend((entry_id, block['room_id'], new_room) for entry_id in block['entries'])
+    if dry_run or not moves:
+        return moves
+
+    new_rooms = {entry_id: new_room for entry_id, _, new_room in moves}
+    with transaction.atomic():
+        entries = list(Timetable.objects.filter(id__in=list(new_rooms)))
+        # Rooms are swapped between entries; park the moved rows on an unused day first so
+        # the (day_of_week, slot, room) unique constraint holds after every statement
+        for entry in entries:
+            entry.day_of_week += 100
+        Timetable.objects.bulk_update(entries, ['day_of_week'], batch_size=1000)
+        for entry in entries:
+            entry.day_of_week -= 100
+            entry.room_id = new_rooms[entry.id]
+        Timetable.objects.bulk_update(entries, ['day_of_week', 'room_id'], batch_size=1000)
+    # bulk_update sends no post_save signals
+    invalidate_occupancy_index()
+    logger.info(f"Reassigned rooms of {len(moves)} timetable entries")
+    return moves
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Timetable, TimetableChange, TimetableGenerationConfig
+from .models import Timetable, TimetableChange, TimetableGenerationConfig, TimetableVersion
 from teacher.serializers import TeacherSerializer
 from course.serializers import CourseSerializer
 from slot.serializers import SlotSerializer
@@ -51,12 +51,15 @@ class TimetableGenerationConfigSerializer(serializers.ModelSerializer):
             'id', 'name', 'created_by', 'created_by_username', 'created_at', 'modified_at',
             'max_teacher_slots_per_day', 'enable_lunch_breaks', 'enable_lab_consecutive',
             'enable_student_conflicts', 'enable_staggered_schedule', 'min_course_instances',
-            'division_assignment', 'solver_timeout', 'is_generated', 'generation_started_at',
-            'generation_completed_at'
+            'division_assignment', 'solver_timeout', 'precommit_conflict_check', 'decompose_by_department',
+            'warm_start_version', 'is_generated',
+            'generation_started_at', 'generation_completed_at', 'generation_status', 'generation_phase', 'best_score',
+            'constraint_violations', 'progress_updated_at'
         ]
         read_only_fields = [
             'created_at', 'modified_at', 'is_generated', 'generation_started_at',
-            'generation_completed_at', 'generation_log'
+            'generation_completed_at', 'generation_log', 'generation_status', 'generation_phase',
+            'best_score', 'constraint_violations', 'progress_updated_at'
         ]
         extra_kwargs = {
             'created_by': {'required': False}
@@ -66,4 +69,13 @@ class TimetableGenerationConfigSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['created_by'] = request.user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+
+class TimetableVersionSerializer(serializers.ModelSerializer):
+    """Serializer for timetable versions; the snapshot blob itself is never sent"""
+    
+    class Meta:
+        model = TimetableVersion
+        fields = ['id', 'name', 'config', 'created_by', 'created_at', 'source', 'note', 'entry_count', 'checksum']
+        read_only_fields = ['created_by', 'created_at', 'source', 'entry_count', 'checksum']
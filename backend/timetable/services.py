@@ -8,17 +8,22 @@ from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
-from course.models import Course
-from teacher.models import Teacher
-from teacherCourse.models import TeacherCourse
-from slot.models import Slot
-from rooms.models import Room
+from .conflicts import ConflictScanner, HARD_TYPES, solver_columns
+from .decomposition import solve_by_department
 from .models import Timetable, TimetableGenerationConfig
+from .occupancy import invalidate_occupancy_index
+from .portfolio import run_portfolio, default_workers
+from .quality import TimetableQuality
+from .room_assignment import assign_result_rooms
+from .snapshot import ProblemSnapshot
+from .versions import create_version, latest_generated_version, version_arrays, SESSION_TYPES
+from .warmstart import seed_placements, solve_warm
 
 logger = logging.getLogger(__name__)
 
+
 class TimetableGenerationService:
-    """Service for generating timetables (currently disabled)"""
+    """Service for generating timetables with the local constraint solver"""
     
     def __init__(self, config_id=None):
         """Initialize the timetable generation service"""
@@ -29,87 +34,206 @@ class TimetableGenerationService:
             except TimetableGenerationConfig.DoesNotExist:
                 logger.error(f"Timetable generation config {config_id} not found")
         
-        # Constants
-        self.days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        self.day_indices = {day: i for i, day in enumerate(self.days)}
-        
-        # Data structures
-        self.teachers = []
-        self.courses = []
-        self.rooms = []
-        self.slots = []
-        
-        # Mapping dictionaries
-        self.teacher_courses = {}  # Teacher -> courses
-        self.course_teachers = {}  # Course -> teachers
-        self.room_capacities = {}  # Room -> capacity
-        self.lab_rooms = set()     # Set of lab rooms
-        
-        # Course types
-        self.lab_courses = set()    # Set of lab courses
-        self.theory_courses = set() # Set of theory courses
-        
-        # Load data from database
-        self._load_data_from_db()
+        # Problem data, loaded as a columnar snapshot when generation starts
+        self.snapshot = None
         
     def _load_data_from_db(self):
-        """Load data from the database"""
+        """Load the problem from the database as a columnar snapshot"""
         logger.info("Loading data from database...")
-        
-        # Load teachers
-        self.teachers = list(Teacher.objects.all().values_list('id', flat=True))
-        
-        # Load courses
-        self.courses = list(Course.objects.all().values_list('id', flat=True))
-        
-        # Identify lab courses
-        lab_courses = Course.objects.filter(practical_hours__gt=0)
-        self.lab_courses = set(lab_courses.values_list('id', flat=True))
-        
-        # Identify theory courses
-        self.theory_courses = set(self.courses) - self.lab_courses
-        
-        # Load rooms
-        self.rooms = list(Room.objects.all().values_list('id', flat=True))
-        
-        # Identify lab rooms
-        lab_rooms = Room.objects.filter(is_lab=True)
-        self.lab_rooms = set(lab_rooms.values_list('id', flat=True))
-        
-        # Load room capacities
-        for room in Room.objects.all():
-            self.room_capacities[room.id] = room.room_max_cap
-        
-        # Load slots
-        self.slots = list(Slot.objects.all().values_list('id', flat=True))
-        
-        # Load teacher-course assignments
-        for tc in TeacherCourse.objects.all():
-            teacher_id = tc.teacher_id_id
-            course_id = tc.course_id_id
-            
-            if teacher_id not in self.teacher_courses:
-                self.teacher_courses[teacher_id] = []
-            self.teacher_courses[teacher_id].append(course_id)
-            
-            if course_id not in self.course_teachers:
-                self.course_teachers[course_id] = []
-            self.course_teachers[course_id].append(teacher_id)
-        
-        logger.info(f"Loaded: {len(self.teachers)} teachers, {len(self.courses)} courses, "
-                   f"{len(self.rooms)} rooms, {len(self.slots)} slots")
-    
-    def generate_timetable(self, config=None):
-        """Generate timetable (currently disabled)"""
-        logger.error("Timetable generation is currently disabled.")
+        self.snapshot = ProblemSnapshot.from_db(self.config)
+        logger.info(f"Loaded: {self.snapshot.summary()}")
+        return self.snapshot
+
+    def build_problem(self):
+        """Collect everything the solver needs into a TimetableProblem"""
+        problem = self._load_data_from_db().to_problem()
+        logger.info(f"Built problem: {len(problem.sessions)} sessions, {len(problem.slots)} slots, "
+                    f"{len(problem.rooms)} rooms, {len(problem.fixed)} fixed entries")
+        return problem
+
+    def save_result(self, problem, result):
+        """Replace the timetable of every scheduled assignment in one transaction"""
+        start_date = timezone.localdate()
+        entries = []
+        for session_index, day, slot_ids, room_id in result.placements:
+            session = problem.sessions[session_index]
+            for slot_id in slot_ids:
+                entries.append(Timetable(
+                    day_of_week=day,
+                    course_assignment_id=session['assignment_id'],
+                    slot_id=slot_id,
+                    room_id=room_id,
+                    is_recurring=True,
+                    start_date=start_date,
+                    session_type=session['session_type'],
+                ))
+
+        scheduled = {s['assignment_id'] for s in problem.sessions}
+        with transaction.atomic():
+            Timetable.objects.filter(course_assignment_id__in=scheduled).delete()
+            Timetable.objects.bulk_create(entries, batch_size=1000)
+        # bulk_create sends no post_save signals
+        invalidate_occupancy_index()
+        return len(entries)
+
+    def shared_courses(self):
+        """Courses taught by another department than the one they are for"""
+        from django.db.models import F
+        from course.models import Course, CourseResourceAllocation
+
+        courses = set(Course.objects.filter(
+            teaching_dept_id__isnull=False, for_dept_id__isnull=False
+        ).exclude(teaching_dept_id=F('for_dept_id')).values_list('id', flat=True))
+        courses.update(CourseResourceAllocation.objects.filter(status='approved').values_list('course_id', flat=True))
+        return courses
+
+    def warm_start_version(self, warm_start=None):
+        """
+        The version to start from: the one given, the latest generated version of a given
+        config, or the config's own warm_start_version, which the run clears once done
+        """
+        if warm_start is None:
+            return self.config.warm_start_version
+        if isinstance(warm_start, TimetableGenerationConfig):
+            return latest_generated_version(warm_start)
+        return warm_start
+
+    def _department_finished(self, dept, result):
+        self._progress(f"Department {dept}: placed {result.stats['placed']}/{result.stats['sessions']} sessions "
+                       f"in {result.stats['wall_seconds']}s.")
+
+    def check_conflicts(self, problem, result):
+        """Hard conflicts the result would create together with the entries it leaves in place"""
+        scheduled = {s['assignment_id'] for s in problem.sessions}
+        scanner = ConflictScanner.from_db(
+            entries=Timetable.objects.exclude(course_assignment_id__in=scheduled),
+            extra=solver_columns(problem, result),
+        )
+        return scanner.scan(HARD_TYPES)
+
+    def _progress(self, line=None, **fields):
+        """Append a log line and push progress fields to the config row as the job runs"""
+        if line:
+            self._log.append(line)
+        fields['generation_log'] = "\n".join(self._log) + "\n"
+        fields['progress_updated_at'] = timezone.now()
+        for name, value in fields.items():
+            setattr(self.config, name, value)
+        TimetableGenerationConfig.objects.filter(id=self.config.id).update(**fields)
+
+    def _run_finished(self, run, best):
+        self._progress(
+            f"Run seed {run['seed']} (noise {run['noise']}): placed {run['placed']}/{run['sessions']}, "
+            f"score {run['score']:.2f}, {run['wall_seconds']}s.",
+            best_score=round(best.score, 2),
+            constraint_violations=len(best.unplaced),
+        )
+
+    def generate_timetable(self, config=None, warm_start=None):
+        """
+        Generate a timetable for the configuration and store it. warm_start is a
+        TimetableVersion or an earlier TimetableGenerationConfig to start from.
+        """
         if config:
             self.config = config
         if not self.config:
             logger.error("No configuration provided for timetable generation")
             return False
-        self.config.is_generated = False
-        self.config.generation_started_at = timezone.now()
-        self.config.generation_log = "Timetable generation is currently disabled.\n"
-        self.config.generation_completed_at = timezone.now()
-        self.config.save()
-        return False 
+
+        self._log = []
+        self._progress(
+            is_generated=False,
+            generation_status='running',
+            generation_phase='loading',
+            generation_started_at=timezone.now(),
+            generation_completed_at=None,
+            best_score=None,
+            constraint_violations=None,
+        )
+
+        succeeded = False
+        try:
+            problem = self.build_problem()
+            self._progress(f"Loaded {len(problem.sessions)} sessions, {len(problem.slots)} slots, "
+                           f"{len(problem.rooms)} rooms.")
+            if not problem.sessions:
+                self._progress("Nothing to schedule: no active teacher-course assignments found.")
+                return False
+
+            workers = getattr(settings, 'TIMETABLE_SOLVER_WORKERS', None) or default_workers()
+            seed_version = self.warm_start_version(warm_start)
+            if seed_version is not None:
+                seeds = seed_placements(problem, version_arrays(seed_version), SESSION_TYPES)
+                self._progress(f"Warm start from version {seed_version.id}: {len(seeds)} of "
+                               f"{len(problem.sessions)} sessions have an earlier placement.",
+                               generation_phase='solving')
+                result, kept = solve_warm(problem, self.snapshot.solver_options(), seeds)
+                self._progress(f"Warm start kept {kept} placements and placed {result.stats['placed']}/"
+                               f"{result.stats['sessions']} sessions in {result.stats['wall_seconds']}s "
+                               f"(score {result.score:.2f}).",
+                               generation_phase='saving', best_score=round(result.score, 2),
+                               constraint_violations=len(result.unplaced))
+            elif self.config.decompose_by_department:
+                self._progress(f"Solving departments on {workers} workers.", generation_phase='solving')
+                result = solve_by_department(problem, self.snapshot.solver_options(),
+                                             shared_courses=self.shared_courses(), workers=workers,
+                                             on_department=self._department_finished)
+                self._progress(f"Decomposed solve placed {result.stats['placed']}/{result.stats['sessions']} "
+                               f"sessions ({result.stats['cross_sessions']} cross-department, "
+                               f"{result.stats['reconciled']} reconciled, score {result.score:.2f}).",
+                               generation_phase='saving', best_score=round(result.score, 2),
+                               constraint_violations=len(result.unplaced))
+            else:
+                runs = getattr(settings, 'TIMETABLE_PORTFOLIO_RUNS', None) or workers
+                self._progress(f"Running {runs} solver runs on {workers} workers.", generation_phase='solving')
+                result, run_log = run_portfolio(problem, self.snapshot.solver_options(),
+                                                runs=runs, workers=workers, on_result=self._run_finished)
+                if result is None:
+                    self._progress("No solver run finished within the solver timeout.")
+                    return False
+                self._progress(f"Best run seed {result.stats['seed']} placed {result.stats['placed']}/"
+                               f"{result.stats['sessions']} sessions (score {result.score:.2f}).",
+                               generation_phase='saving')
+
+            changed = assign_result_rooms(problem, result)
+            self._progress(f"Room assignment moved {changed} of {len(result.placements)} placed sessions "
+                           f"to better-fitting rooms.")
+            quality = TimetableQuality.from_solver(problem, result, self.snapshot.solver_options())
+            self._progress(f"Timetable {quality.summary()}.")
+
+            for session_index in result.unplaced:
+                session = problem.sessions[session_index]
+                self._log.append(f"Unplaced: {session['session_type']} for teacher-course "
+                                 f"{session['assignment_id']} (length {session['length']}).")
+
+            if self.config.precommit_conflict_check:
+                conflicts = self.check_conflicts(problem, result)
+                if conflicts:
+                    self._progress(f"Pre-commit check found {len(conflicts)} conflicts; the timetable was not saved.")
+                    for conflict in conflicts[:20]:
+                        self._log.append(f"Conflict: {conflict}")
+                    return False
+                self._progress("Pre-commit check found no conflicts.")
+
+            saved = self.save_result(problem, result)
+            self._progress(f"Wrote {saved} timetable entries.")
+            version = create_version(f"{self.config.name} (generated)", config=self.config,
+                                     user=self.config.created_by, source='generation')
+            self._progress(f"Saved timetable version {version.id}.")
+
+            succeeded = result.is_complete
+            return succeeded
+        except Exception as e:
+            logger.error(f"Timetable generation failed: {str(e)}", exc_info=True)
+            self._log.append(f"Generation failed: {str(e)}")
+            return False
+        finally:
+            # The config's seed is for one run; later runs start cold unless seeded again
+            seed = {'warm_start_version': None} if warm_start is None else {}
+            self._progress(
+                is_generated=succeeded,
+                generation_status='completed' if succeeded else 'failed',
+                generation_phase='done',
+                generation_completed_at=timezone.now(),
+                **seed,
+            )
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rooms.models import Room
+from slot.models import Slot
+from .models import Timetable, TimetableChange
+from .occupancy import invalidate_occupancy_index
+
+
+@receiver(post_save, sender=Timetable)
+@receiver(post_delete, sender=Timetable)
+@receiver(post_save, sender=TimetableChange)
+@receiver(post_delete, sender=TimetableChange)
+@receiver(post_save, sender=Slot)
+@receiver(post_delete, sender=Slot)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_occupancy(sender, **kwargs):
+    """Any change to the timetable, its changes, slots or rooms makes the occupancy index stale"""
+    invalidate_occupancy_index()
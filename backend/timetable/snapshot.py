@@ -0,0 +1,308 @@
+"""
+Columnar snapshot of a timetable generation problem.
+
+ProblemSnapshot.from_db loads everything the solver needs with a handful of
+values_list queries into integer-indexed NumPy arrays. A snapshot can be saved
+to a compressed .npz file and loaded back without a database, so solver runs,
+benchmarks and bug reports replay exactly the same problem:
+
+    snapshot = ProblemSnapshot.from_db(config)
+    snapshot.save('problem.npz')
+    ...
+    snapshot = ProblemSnapshot.load('problem.npz')
+    result = TimetableSolver(snapshot.to_problem(), snapshot.solver_options()).solve()
+
+Entity references are indices into the id arrays: assignment_teacher[i] is a
+position in teacher_ids, preference_course[j] a position in course_ids, and so
+on. Missing foreign keys are stored as -1.
+"""
+import numpy as np
+
+from .coenrollment import CoEnrollmentMatrix, MIN_SHARED_STUDENTS
+from .solver import TimetableProblem, SolverOptions, CHANNELS, LAB_BLOCK_LENGTH
+
+SLOT_TYPES = ['A', 'B', 'C']
+ELECTIVE_TYPES = list(CHANNELS)
+SNAPSHOT_VERSION = 2
+
+# Solver options stored with the snapshot, with their defaults
+OPTION_DEFAULTS = {
+    'max_teacher_slots_per_day': 5,
+    'enable_lunch_breaks': True,
+    'enable_lab_consecutive': True,
+    'enable_student_conflicts': True,
+    'enable_staggered_schedule': False,
+    'min_course_instances': 1,
+    'division': 'A',
+    'timeout': 600,
+}
+
+ARRAYS = [
+    'slot_ids', 'slot_type', 'slot_start', 'slot_end',
+    'room_ids', 'room_capacity', 'room_is_lab',
+    'teacher_ids', 'course_ids',
+    'assignment_ids', 'assignment_teacher', 'assignment_course', 'assignment_students',
+    'course_dept', 'course_year', 'course_semester', 'course_elective',
+    'course_lecture_hours', 'course_tutorial_hours', 'course_practical_hours',
+    'teacher_day_teacher', 'teacher_day_day', 'teacher_day_slot_type',
+    'window_teacher', 'window_day', 'window_start', 'window_end',
+    'preference_course', 'preference_slot_type', 'preference_level',
+    'fixed_teacher', 'fixed_room', 'fixed_day', 'fixed_slot',
+    'conflict_course_a', 'conflict_course_b', 'conflict_students',
+]
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _codes(values, choices):
+    lookup = {value: i for i, value in enumerate(choices)}
+    return np.array([lookup.get(value, 0) for value in values], dtype=np.int8)
+
+
+def _positions(ids, values):
+    """Index of every value in the sorted id array, -1 where it is missing"""
+    values = np.asarray(values, dtype=np.int64)
+    if not len(ids) or not len(values):
+        return np.full(len(values), -1, dtype=np.int32)
+    found = np.searchsorted(ids, values).clip(0, len(ids) - 1)
+    return np.where(ids[found] == values, found, -1).astype(np.int32)
+
+
+def _column(rows, i, dtype, missing=0):
+    return np.array([missing if row[i] is None else row[i] for row in rows], dtype=dtype)
+
+
+class ProblemSnapshot:
+    """Problem data as NumPy arrays plus the solver options it was built with"""
+
+    def __init__(self, arrays, options=None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.options = dict(OPTION_DEFAULTS, **(options or {}))
+
+    @classmethod
+    def from_db(cls, config=None):
+        from course.models import CourseSlotPreference
+        from rooms.models import Room
+        from slot.models import Slot, TeacherSlotAssignment
+        from teacher.models import TeacherAvailability
+        from teacherCourse.models import TeacherCourse
+        from .models import Timetable
+
+        options = {}
+        if config is not None:
+            options = {
+                'max_teacher_slots_per_day': config.max_teacher_slots_per_day,
+                'enable_lunch_breaks': config.enable_lunch_breaks,
+                'enable_lab_consecutive': config.enable_lab_consecutive,
+                'enable_student_conflicts': config.enable_student_conflicts,
+                'enable_staggered_schedule': config.enable_staggered_schedule,
+                'min_course_instances': config.min_course_instances,
+                'division': config.division_assignment,
+                'timeout': config.solver_timeout,
+            }
+
+        slots = list(Slot.objects.order_by('id').values_list('id', 'slot_type', 'slot_start_time', 'slot_end_time'))
+        rooms = list(Room.objects.order_by('id').values_list('id', 'room_max_cap', 'is_lab'))
+        assignments = list(TeacherCourse.objects.filter(
+            teacher_id__isnull=False,
+            course_id__isnull=False,
+            is_assistant=False,
+            course_id__teaching_status='active',
+        ).exclude(teacher_id__resignation_status='resigned').order_by('id').values_list(
+            'id', 'teacher_id', 'course_id', 'student_count',
+            'course_id__for_dept_id', 'course_id__course_year', 'course_id__course_semester',
+            'course_id__elective_type',
+            'course_id__course_id__lecture_hours', 'course_id__course_id__tutorial_hours',
+            'course_id__course_id__practical_hours',
+        ))
+
+        arrays = {
+            'slot_ids': _column(slots, 0, np.int64),
+            'slot_type': _codes([row[1] for row in slots], SLOT_TYPES),
+            'slot_start': np.array([_minutes(row[2]) for row in slots], dtype=np.int16),
+            'slot_end': np.array([_minutes(row[3]) for row in slots], dtype=np.int16),
+            'room_ids': _column(rooms, 0, np.int64),
+            'room_capacity': _column(rooms, 1, np.int32),
+            'room_is_lab': _column(rooms, 2, bool, missing=False),
+            'assignment_ids': _column(assignments, 0, np.int64),
+            'assignment_students': _column(assignments, 3, np.int32),
+        }
+
+        teacher_ids = np.unique(_column(assignments, 1, np.int64))
+        arrays['teacher_ids'] = teacher_ids
+        arrays['assignment_teacher'] = _positions(teacher_ids, [row[1] for row in assignments])
+
+        # Course attributes are stored once per course, not once per assignment
+        courses = {}
+        for row in assignments:
+            courses.setdefault(row[2], row)
+        course_rows = [courses[course_id] for course_id in sorted(courses)]
+        course_ids = np.array(sorted(courses), dtype=np.int64)
+        arrays['course_ids'] = course_ids
+        arrays['assignment_course'] = _positions(course_ids, [row[2] for row in assignments])
+        arrays['course_dept'] = _column(course_rows, 4, np.int64, missing=-1)
+        arrays['course_year'] = _column(course_rows, 5, np.int16)
+        arrays['course_semester'] = _column(course_rows, 6, np.int16)
+        arrays['course_elective'] = _codes([row[7] or 'NE' for row in course_rows], ELECTIVE_TYPES)
+        arrays['course_lecture_hours'] = _column(course_rows, 8, np.int16)
+        arrays['course_tutorial_hours'] = _column(course_rows, 9, np.int16)
+        arrays['course_practical_hours'] = _column(course_rows, 10, np.int16)
+
+        teacher_days = list(TeacherSlotAssignment.objects.filter(teacher_id__in=teacher_ids.tolist()).values_list(
+            'teacher_id', 'day_of_week', 'slot__slot_type'
+        ))
+        arrays['teacher_day_teacher'] = _positions(teacher_ids, [row[0] for row in teacher_days])
+        arrays['teacher_day_day'] = _column(teacher_days, 1, np.int8)
+        arrays['teacher_day_slot_type'] = _codes([row[2] for row in teacher_days], SLOT_TYPES)
+
+        windows = list(TeacherAvailability.objects.filter(
+            teacher__availability_type='limited', teacher_id__in=teacher_ids.tolist()
+        ).values_list('teacher_id', 'day_of_week', 'start_time', 'end_time'))
+        arrays['window_teacher'] = _positions(teacher_ids, [row[0] for row in windows])
+        arrays['window_day'] = _column(windows, 1, np.int8)
+        arrays['window_start'] = np.array([_minutes(row[2]) for row in windows], dtype=np.int16)
+        arrays['window_end'] = np.array([_minutes(row[3]) for row in windows], dtype=np.int16)
+
+        preferences = list(CourseSlotPreference.objects.filter(course_id__in=course_ids.tolist()).values_list(
+            'course_id', 'slot_id__slot_type', 'preference_level'
+        ))
+        arrays['preference_course'] = _positions(course_ids, [row[0] for row in preferences])
+        arrays['preference_slot_type'] = _codes([row[1] for row in preferences], SLOT_TYPES)
+        arrays['preference_level'] = _column(preferences, 2, np.int8)
+
+        # Entries of assignments we are not regenerating stay where they are
+        fixed = list(Timetable.objects.exclude(
+            course_assignment_id__in=arrays['assignment_ids'].tolist()
+        ).values_list('course_assignment__teacher_id', 'room_id', 'day_of_week', 'slot_id'))
+        arrays['fixed_teacher'] = _column(fixed, 0, np.int64, missing=-1)
+        arrays['fixed_room'] = _column(fixed, 1, np.int64)
+        arrays['fixed_day'] = _column(fixed, 2, np.int8)
+        arrays['fixed_slot'] = _column(fixed, 3, np.int64)
+
+        # Course pairs that share students, as positions in course_ids
+        matrix = CoEnrollmentMatrix.from_db(course_ids.tolist())
+        pairs = matrix.pairs(min_students=1)
+        arrays['conflict_course_a'] = _positions(course_ids, [row[0] for row in pairs])
+        arrays['conflict_course_b'] = _positions(course_ids, [row[1] for row in pairs])
+        arrays['conflict_students'] = _column(pairs, 2, np.int32)
+
+        return cls(arrays, options)
+
+    def save(self, path):
+        """Write the snapshot to a compressed .npz file"""
+        options = {f'option_{name}': np.array(value) for name, value in self.options.items()}
+        np.savez_compressed(path, version=np.array(SNAPSHOT_VERSION), **options,
+                            **{name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = int(data['version'])
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            arrays = {name: data[name] for name in ARRAYS}
+            options = {name: data[f'option_{name}'].item() for name in OPTION_DEFAULTS
+                       if f'option_{name}' in data}
+        return cls(arrays, options)
+
+    def solver_options(self):
+        return SolverOptions(
+            max_teacher_slots_per_day=self.options['max_teacher_slots_per_day'],
+            enable_lunch_breaks=self.options['enable_lunch_breaks'],
+            enable_lab_consecutive=self.options['enable_lab_consecutive'],
+            enable_student_conflicts=self.options['enable_student_conflicts'],
+            enable_staggered_schedule=self.options['enable_staggered_schedule'],
+            division=self.options['division'],
+            timeout=self.options['timeout'],
+        )
+
+    def session_specs(self, lecture_hours, tutorial_hours, practical_hours):
+        """Split weekly hours into (session_type, length) pieces"""
+        specs = [('Lecture', 1)] * lecture_hours + [('Tutorial', 1)] * tutorial_hours
+        if self.options['enable_lab_consecutive']:
+            remaining = practical_hours
+            while remaining > 0:
+                length = min(LAB_BLOCK_LENGTH, remaining)
+                specs.append(('Lab', length))
+                remaining -= length
+        else:
+            specs += [('Lab', 1)] * practical_hours
+        while len(specs) < self.options['min_course_instances']:
+            specs.append(('Lecture', 1))
+        return specs
+
+    def to_problem(self):
+        """Expand the arrays into the TimetableProblem the solver works on"""
+        slots = [
+            {'id': int(sid), 'slot_type': SLOT_TYPES[code], 'start': int(start), 'end': int(end)}
+            for sid, code, start, end in zip(self.slot_ids, self.slot_type, self.slot_start, self.slot_end)
+        ]
+        rooms = [
+            {'id': int(rid), 'capacity': int(capacity), 'is_lab': bool(is_lab)}
+            for rid, capacity, is_lab in zip(self.room_ids, self.room_capacity, self.room_is_lab)
+        ]
+
+        sessions = []
+        for i, assignment_id in enumerate(self.assignment_ids.tolist()):
+            c = self.assignment_course[i]
+            dept = int(self.course_dept[c])
+            specs = self.session_specs(int(self.course_lecture_hours[c]), int(self.course_tutorial_hours[c]),
+                                       int(self.course_practical_hours[c]))
+            for session_type, length in specs:
+                sessions.append({
+                    'assignment_id': assignment_id,
+                    'teacher_id': int(self.teacher_ids[self.assignment_teacher[i]]),
+                    'course_id': int(self.course_ids[c]),
+                    'group': (dept if dept >= 0 else None, int(self.course_year[c]), int(self.course_semester[c])),
+                    'elective_type': ELECTIVE_TYPES[self.course_elective[c]],
+                    'session_type': session_type,
+                    'length': length,
+                    'student_count': int(self.assignment_students[i]),
+                })
+
+        teacher_days = {}
+        for t, day, code in zip(self.teacher_day_teacher, self.teacher_day_day, self.teacher_day_slot_type):
+            teacher_days.setdefault(int(self.teacher_ids[t]), {})[int(day)] = SLOT_TYPES[code]
+
+        teacher_windows = {}
+        for t, day, start, end in zip(self.window_teacher, self.window_day, self.window_start, self.window_end):
+            teacher_windows.setdefault(int(self.teacher_ids[t]), {}).setdefault(int(day), []).append(
+                (int(start), int(end))
+            )
+
+        slot_preferences = {}
+        for c, code, level in zip(self.preference_course, self.preference_slot_type, self.preference_level):
+            prefs = slot_preferences.setdefault(int(self.course_ids[c]), {})
+            slot_type = SLOT_TYPES[code]
+            prefs[slot_type] = max(prefs.get(slot_type, 0), int(level))
+
+        fixed = [
+            {'teacher_id': int(t) if t >= 0 else None, 'room_id': int(room), 'day': int(day), 'slot_id': int(slot)}
+            for t, room, day, slot in zip(self.fixed_teacher, self.fixed_room, self.fixed_day, self.fixed_slot)
+        ]
+
+        course_conflicts = {}
+        for a, b, shared in zip(self.conflict_course_a, self.conflict_course_b, self.conflict_students):
+            if shared >= MIN_SHARED_STUDENTS:
+                course_a, course_b = int(self.course_ids[a]), int(self.course_ids[b])
+                course_conflicts.setdefault(course_a, []).append(course_b)
+                course_conflicts.setdefault(course_b, []).append(course_a)
+
+        return TimetableProblem(
+            slots=slots,
+            rooms=rooms,
+            sessions=sessions,
+            teacher_days=teacher_days,
+            teacher_windows=teacher_windows,
+            slot_preferences=slot_preferences,
+            fixed=fixed,
+            course_conflicts=course_conflicts,
+        )
+
+    def summary(self):
+        return (f"{len(self.teacher_ids)} teachers, {len(self.course_ids)} courses, "
+                f"{len(self.assignment_ids)} assignments, {len(self.room_ids)} rooms, {len(self.slot_ids)} slots, "
+                f"{len(self.conflict_students)} co-enrolled course pairs")
@@ -0,0 +1,700 @@
+"""
+Local constraint solver for timetable generation.
+
+The solver never touches the ORM. TimetableGenerationService loads everything
+from the database into a TimetableProblem, the solver places every session on
+a (day, slot, room) cell and hands back a SolverResult that the service writes
+as Timetable rows.
+
+Search strategy:
+    1. Greedy construction, most constrained session first.
+    2. Ejection repair for sessions that could not be placed: the session takes
+       the cell with the fewest blocking sessions and those are re-queued.
+    3. Reinsertion passes that move single sessions to cheaper cells until the
+       soft cost stops improving or the time budget runs out.
+"""
+import logging
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Days a session may be placed on (Monday - Saturday)
+WORKING_DAYS = [0, 1, 2, 3, 4, 5]
+# Days used when the staggered schedule is disabled (Monday - Friday)
+DEFAULT_DAYS = [0, 1, 2, 3, 4]
+
+# Sessions of the same student group clash unless both are electives of the same type
+CHANNELS = {'NE': 0, 'PE': 1, 'OE': 2}
+
+# A free period that starts inside this window counts as a lunch break (minutes)
+LUNCH_WINDOW = (11 * 60, 14 * 60)
+
+# Lab hours are scheduled as blocks of this many consecutive periods
+LAB_BLOCK_LENGTH = 2
+
+# Two slots are consecutive when the gap between them is at most this many minutes
+MAX_CONSECUTIVE_GAP = 15
+
+# Slots longer than this are division windows (e.g. "Slot A" 8AM - 3PM), not periods
+MAX_PERIOD_MINUTES = 60
+
+# Extra passes over sessions that are still unplaced after the first repair
+REPAIR_ROUNDS = 5
+
+# Soft cost weights
+UNPLACED_PENALTY = 1000
+SAME_DAY_PENALTY = 10
+ISOLATED_PENALTY = 2
+GROUP_LOAD_WEIGHT = 0.5
+ROOM_WASTE_WEIGHT = 1.0
+
+
+class TimetableProblem:
+    """
+    Everything the solver needs, as plain Python data.
+
+    slots      -- list of dicts: id, slot_type, start, end (minutes since midnight)
+    rooms      -- list of dicts: id, capacity, is_lab
+    sessions   -- list of dicts: assignment_id, teacher_id, course_id, group,
+                  elective_type, session_type, length, student_count
+    teacher_days     -- {teacher_id: {day: slot_type}} picked through TeacherSlotAssignment
+    teacher_windows  -- {teacher_id: {day: [(start, end), ...]}} for limited availability
+    slot_preferences -- {course_id: {slot_type: preference_level}}
+    fixed      -- list of dicts: teacher_id, room_id, day, slot_id; cells already taken. May also
+                  carry group, course_id and elective_type, so the entry blocks its students too
+    course_conflicts -- {course_id: [course_id, ...]} courses sharing students (see coenrollment)
+    """
+
+    def __init__(self, slots, rooms, sessions, teacher_days=None, teacher_windows=None,
+                 slot_preferences=None, fixed=None, course_conflicts=None):
+        self.slots = slots
+        self.rooms = rooms
+        self.sessions = sessions
+        self.teacher_days = teacher_days or {}
+        self.teacher_windows = teacher_windows or {}
+        self.slot_preferences = slot_preferences or {}
+        self.fixed = fixed or []
+        self.course_conflicts = course_conflicts or {}
+
+
+class SolverOptions:
+    """Solver knobs, normally taken from a TimetableGenerationConfig"""
+
+    def __init__(self, max_teacher_slots_per_day=5, enable_lunch_breaks=True,
+                 enable_lab_consecutive=True, enable_student_conflicts=True,
+                 enable_staggered_schedule=False, division='A', timeout=600, noise=0.05):
+        self.max_teacher_slots_per_day = max_teacher_slots_per_day
+        self.enable_lunch_breaks = enable_lunch_breaks
+        self.enable_lab_consecutive = enable_lab_consecutive
+        self.enable_student_conflicts = enable_student_conflicts
+        self.enable_staggered_schedule = enable_staggered_schedule
+        self.division = division
+        self.timeout = timeout
+        # Random jitter added to placement costs during construction
+        self.noise = noise
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_teacher_slots_per_day=config.max_teacher_slots_per_day,
+            enable_lunch_breaks=config.enable_lunch_breaks,
+            enable_lab_consecutive=config.enable_lab_consecutive,
+            enable_student_conflicts=config.enable_student_conflicts,
+            enable_staggered_schedule=config.enable_staggered_schedule,
+            division=config.division_assignment,
+            timeout=config.solver_timeout,
+        )
+
+
+class SolverResult:
+    """Outcome of a solver run"""
+
+    def __init__(self, placements, unplaced, score, stats):
+        # placements: list of (session_index, day, [slot_id, ...], room_id)
+        self.placements = placements
+        self.unplaced = unplaced
+        self.score = score
+        self.stats = stats
+
+    @property
+    def is_complete(self):
+        return not self.unplaced
+
+
+class TimetableSolver:
+    """Greedy construction + ejection repair + reinsertion local search"""
+
+    def __init__(self, problem, options=None, seed=0):
+        self.problem = problem
+        self.options = options or SolverOptions()
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        self._index_slots()
+        self._index_entities()
+        self._build_templates()
+        self._build_candidates()
+        self._reset_state()
+
+    # ------------------------------------------------------------------
+    # Problem indexing
+    # ------------------------------------------------------------------
+    def _index_slots(self):
+        periods = [s for s in self.problem.slots if s['end'] - s['start'] <= MAX_PERIOD_MINUTES]
+        # With only the division windows defined (the default Slot A/B/C rows), every
+        # window is one cell that holds a whole session of any length
+        self.windows_only = not periods
+        if not periods:
+            periods = list(self.problem.slots)
+        periods.sort(key=lambda s: (s['start'], s['slot_type']))
+        self.periods = periods
+
+        # Time units are the distinct period start times; overlapping slots of
+        # different types (A3 and B1 both at 10:00) share a unit.
+        self.unit_starts = sorted({s['start'] for s in periods})
+        unit_index = {start: i for i, start in enumerate(self.unit_starts)}
+        self.period_units = []
+        for s in periods:
+            units = [unit_index[u] for u in self.unit_starts if s['start'] <= u < s['end']]
+            self.period_units.append(units or [unit_index[s['start']]])
+
+        self.periods_by_type = {}
+        for i, s in enumerate(periods):
+            self.periods_by_type.setdefault(s['slot_type'], []).append(i)
+
+        lunch_start, lunch_end = LUNCH_WINDOW
+        self.lunch_units = {}
+        # A division window spans the lunch window and leaves the break inside it
+        for slot_type, indices in ({} if self.windows_only else self.periods_by_type).items():
+            units = sorted({
+                u for i in indices if lunch_start <= periods[i]['start'] <= lunch_end
+                for u in self.period_units[i]
+            })
+            self.lunch_units[slot_type] = np.array(units, dtype=np.intp)
+
+        self.slot_index = {s['id']: i for i, s in enumerate(periods)}
+        self.n_units = len(self.unit_starts)
+
+    def _index_entities(self):
+        sessions = self.problem.sessions
+        self.teacher_ids = sorted({s['teacher_id'] for s in sessions} |
+                                  {f['teacher_id'] for f in self.problem.fixed if f.get('teacher_id') is not None})
+        self.teacher_index = {t: i for i, t in enumerate(self.teacher_ids)}
+        self.group_keys = sorted({s['group'] for s in sessions}, key=str)
+        self.group_index = {g: i for i, g in enumerate(self.group_keys)}
+        self.course_ids = sorted({s['course_id'] for s in sessions} |
+                                 {f['course_id'] for f in self.problem.fixed if f.get('course_id') is not None})
+        self.course_index = {c: i for i, c in enumerate(self.course_ids)}
+        # Courses that share students must not overlap, whatever group or elective type they are
+        self.course_conflicts = [
+            np.array(sorted({self.course_index[o] for o in self.problem.course_conflicts.get(c, ())
+                             if o in self.course_index and o != c}), dtype=np.intp)
+            for c in self.course_ids
+        ]
+        self.assignment_ids = sorted({s['assignment_id'] for s in sessions})
+        self.assignment_index = {a: i for i, a in enumerate(self.assignment_ids)}
+
+        rooms = self.problem.rooms
+        self.room_ids = [r['id'] for r in rooms]
+        self.room_index = {r: i for i, r in enumerate(self.room_ids)}
+        self.room_capacity = np.array([r['capacity'] or 0 for r in rooms], dtype=np.int32)
+        self.room_is_lab = np.array([bool(r['is_lab']) for r in rooms], dtype=bool)
+
+        self.day_index = {d: i for i, d in enumerate(WORKING_DAYS)}
+        self.n_days = len(WORKING_DAYS)
+
+        # Per-session index arrays
+        self.s_teacher = np.array([self.teacher_index[s['teacher_id']] for s in sessions], dtype=np.intp)
+        self.s_group = np.array([self.group_index[s['group']] for s in sessions], dtype=np.intp)
+        self.s_course = np.array([self.course_index[s['course_id']] for s in sessions], dtype=np.intp)
+        self.s_assignment = np.array([self.assignment_index[s['assignment_id']] for s in sessions], dtype=np.intp)
+        self.s_channel = np.array([CHANNELS.get(s['elective_type'], 0) for s in sessions], dtype=np.intp)
+        self.s_length = np.array([s['length'] for s in sessions], dtype=np.intp)
+        self.s_students = np.array([s['student_count'] or 0 for s in sessions], dtype=np.int32)
+
+        # Compatible rooms per session: lab sessions need lab rooms, others need class rooms,
+        # and the room must seat the class. Rooms with unknown capacity (0) are accepted.
+        self.room_masks = []
+        self.room_cost = []
+        max_cap = max(int(self.room_capacity.max()), 1) if len(rooms) else 1
+        for i, s in enumerate(sessions):
+            kind = self.room_is_lab == (s['session_type'] == 'Lab')
+            if not kind.any():
+                kind = np.ones(len(rooms), dtype=bool)
+            fits = (self.room_capacity >= self.s_students[i]) | (self.room_capacity <= 0)
+            mask = kind & fits
+            if not mask.any():
+                # Nobody seats the whole class; fall back to the largest rooms of the right kind
+                largest = self.room_capacity[kind].max() if kind.any() else 0
+                mask = kind & (self.room_capacity >= largest)
+            self.room_masks.append(mask)
+            waste = np.where(self.room_capacity > 0, self.room_capacity - self.s_students[i], max_cap // 2)
+            self.room_cost.append(ROOM_WASTE_WEIGHT * np.clip(waste, 0, None) / max_cap)
+
+    def _build_templates(self):
+        """
+        Blocks of consecutive periods of the same slot type, keyed by (slot_type, length).
+        In windows-only mode a block is a single window long enough for the session.
+        """
+        self.templates = []
+        self.templates_by_key = {}
+        lengths = {int(l) for l in self.s_length} | {1}
+        for slot_type, indices in self.periods_by_type.items():
+            for length in lengths:
+                keys = []
+                if self.windows_only:
+                    blocks = [[i] for i in indices
+                              if self.periods[i]['end'] - self.periods[i]['start'] >= length * MAX_PERIOD_MINUTES]
+                else:
+                    blocks = [indices[start:start + length] for start in range(len(indices) - length + 1)]
+                for block in blocks:
+                    if not self._is_consecutive(block):
+                        continue
+                    units = sorted({u for p in block for u in self.period_units[p]})
+                    self.templates.append({
+                        'slot_type': slot_type,
+                        'length': length,
+                        'periods': block,
+                        'units': np.array(units, dtype=np.intp),
+                        'start': self.periods[block[0]]['start'],
+                        'end': self.periods[block[-1]]['end'],
+                    })
+                    keys.append(len(self.templates) - 1)
+                self.templates_by_key[(slot_type, length)] = keys
+
+    def _is_consecutive(self, block):
+        for a, b in zip(block, block[1:]):
+            if self.periods[b]['start'] - self.periods[a]['end'] > MAX_CONSECUTIVE_GAP:
+                return False
+        return True
+
+    def _allowed_days(self, teacher_id):
+        """Map of day -> slot type the teacher may teach in"""
+        opts = self.options
+        if opts.enable_staggered_schedule:
+            picked = self.problem.teacher_days.get(teacher_id)
+            if picked:
+                return {d: t for d, t in picked.items() if d in self.day_index}
+            return {d: opts.division for d in WORKING_DAYS}
+        return {d: opts.division for d in DEFAULT_DAYS}
+
+    def _within_windows(self, teacher_id, day, template):
+        windows = self.problem.teacher_windows.get(teacher_id)
+        if windows is None:
+            return True
+        return any(start <= template['start'] and template['end'] <= end
+                   for start, end in windows.get(day, []))
+
+    def _build_candidates(self):
+        """(day_index, template_index) pairs each session may use, before occupancy"""
+        self.candidates = []
+        for i, s in enumerate(self.problem.sessions):
+            cands = []
+            for day, slot_type in self._allowed_days(s['teacher_id']).items():
+                for t in self.templates_by_key.get((slot_type, int(self.s_length[i])), []):
+                    if self._within_windows(s['teacher_id'], day, self.templates[t]):
+                        cands.append((self.day_index[day], t))
+            self.candidates.append(cands)
+
+        self.preference = []
+        for s in self.problem.sessions:
+            self.preference.append(self.problem.slot_preferences.get(s['course_id'], {}))
+
+    # ------------------------------------------------------------------
+    # Mutable state
+    # ------------------------------------------------------------------
+    def _reset_state(self):
+        n_t, n_r, n_g = len(self.teacher_ids), len(self.room_ids), len(self.group_keys)
+        shape = (self.n_days, self.n_units)
+        self.teacher_busy = np.zeros((n_t,) + shape, dtype=bool)
+        self.room_busy = np.zeros((n_r,) + shape, dtype=bool)
+        self.group_count = np.zeros((n_g,) + shape + (len(CHANNELS),), dtype=np.int16)
+        self.group_course = np.full((n_g,) + shape, -1, dtype=np.intp)
+        self.course_busy = np.zeros((len(self.course_ids),) + shape, dtype=np.int16)
+        self.teacher_load = np.zeros((n_t, self.n_days), dtype=np.int16)
+        self.group_load = np.zeros((n_g, self.n_days), dtype=np.int16)
+        self.assignment_days = np.zeros((len(self.assignment_ids), self.n_days), dtype=np.int16)
+
+        # Cell owners, used to find which sessions block a placement
+        self.teacher_owner = {}
+        self.room_owner = {}
+        self.group_owner = {}
+        self.course_owner = {}
+        self.placement = [None] * len(self.problem.sessions)
+        # Sessions that keep their warm-start placement: never evicted or moved
+        self.pinned = set()
+
+        for f in self.problem.fixed:
+            p = self.slot_index.get(f['slot_id'])
+            d = self.day_index.get(f['day'])
+            if p is None or d is None:
+                continue
+            units = self.period_units[p]
+            r = self.room_index.get(f.get('room_id'))
+            if r is not None:
+                self.room_busy[r, d, units] = True
+            t = self.teacher_index.get(f.get('teacher_id'))
+            if t is not None:
+                self.teacher_busy[t, d, units] = True
+                self.teacher_load[t, d] += 1
+            g = self.group_index.get(f.get('group'))
+            if g is not None:
+                channel = CHANNELS.get(f.get('elective_type'), 0)
+                self.group_count[g, d, units, channel] += 1
+                if channel == CHANNELS['NE']:
+                    self.group_course[g, d, units] = self.course_index.get(f.get('course_id'), -1)
+                self.group_load[g, d] += 1
+            c = self.course_index.get(f.get('course_id'))
+            if c is not None:
+                self.course_busy[c, d, units] += 1
+
+    def _group_blocked(self, s, d, units):
+        if not self.options.enable_student_conflicts:
+            return False
+        g, channel = self.s_group[s], self.s_channel[s]
+        counts = self.group_count[g, d, units]
+        others = np.delete(counts, channel, axis=1)
+        if others.any():
+            return True
+        if channel == CHANNELS['NE']:
+            same = counts[:, channel] > 0
+            if same.any() and (self.group_course[g, d, units][same] != self.s_course[s]).any():
+                return True
+        conflicts = self.course_conflicts[self.s_course[s]]
+        return bool(len(conflicts) and self.course_busy[conflicts, d][:, units].any())
+
+    def _lunch_ok(self, s, d, template):
+        if not self.options.enable_lunch_breaks:
+            return True
+        lunch = self.lunch_units.get(template['slot_type'])
+        if lunch is None or not len(lunch):
+            return True
+        taken = np.isin(lunch, template['units'])
+        if taken.all():
+            return False
+        t = self.s_teacher[s]
+        if (self.teacher_busy[t, d, lunch] | taken).all():
+            return False
+        if self.options.enable_student_conflicts:
+            g = self.s_group[s]
+            group_busy = self.group_count[g, d, lunch].sum(axis=1) > 0
+            if (group_busy | taken).all():
+                return False
+        return True
+
+    def _free_rooms(self, s, d, units):
+        busy = self.room_busy[:, d, units].any(axis=1)
+        return self.room_masks[s] & ~busy
+
+    def _feasible(self, s, d, tpl_index):
+        """Return the best room index for this placement, or None"""
+        template = self.templates[tpl_index]
+        units = template['units']
+        t = self.s_teacher[s]
+        if self.teacher_load[t, d] + self.s_length[s] > self.options.max_teacher_slots_per_day:
+            return None
+        if self.teacher_busy[t, d, units].any():
+            return None
+        if self._group_blocked(s, d, units):
+            return None
+        if not self._lunch_ok(s, d, template):
+            return None
+        free = self._free_rooms(s, d, units)
+        if not free.any():
+            return None
+        costs = np.where(free, self.room_cost[s], np.inf)
+        return int(np.argmin(costs))
+
+    def _cost(self, s, d, tpl_index, room):
+        template = self.templates[tpl_index]
+        cost = 0.0
+        a = self.s_assignment[s]
+        if self.assignment_days[a, d] > 0:
+            cost += SAME_DAY_PENALTY * self.assignment_days[a, d]
+        t = self.s_teacher[s]
+        if self.teacher_load[t, d] > 0:
+            units = template['units']
+            before, after = units[0] - 1, units[-1] + 1
+            adjacent = (before >= 0 and self.teacher_busy[t, d, before]) or \
+                       (after < self.n_units and self.teacher_busy[t, d, after])
+            if not adjacent:
+                cost += ISOLATED_PENALTY
+        cost += GROUP_LOAD_WEIGHT * self.group_load[self.s_group[s], d]
+        cost -= self.preference[s].get(template['slot_type'], 0)
+        cost += float(self.room_cost[s][room])
+        return cost
+
+    def _place(self, s, d, tpl_index, room):
+        units = self.templates[tpl_index]['units']
+        t, g, length = self.s_teacher[s], self.s_group[s], int(self.s_length[s])
+        self.teacher_busy[t, d, units] = True
+        self.room_busy[room, d, units] = True
+        self.group_count[g, d, units, self.s_channel[s]] += 1
+        if self.s_channel[s] == CHANNELS['NE']:
+            self.group_course[g, d, units] = self.s_course[s]
+        self.teacher_load[t, d] += length
+        self.group_load[g, d] += length
+        self.assignment_days[self.s_assignment[s], d] += 1
+        c = self.s_course[s]
+        tracked = len(self.course_conflicts[c]) > 0
+        if tracked:
+            self.course_busy[c, d, units] += 1
+        for u in units:
+            self.teacher_owner[(t, d, u)] = s
+            self.room_owner[(room, d, u)] = s
+            self.group_owner.setdefault((g, d, u), set()).add(s)
+            if tracked:
+                self.course_owner.setdefault((c, d, u), set()).add(s)
+        self.placement[s] = (d, tpl_index, room)
+
+    def _remove(self, s):
+        d, tpl_index, room = self.placement[s]
+        units = self.templates[tpl_index]['units']
+        t, g, length = self.s_teacher[s], self.s_group[s], int(self.s_length[s])
+        self.teacher_busy[t, d, units] = False
+        self.room_busy[room, d, units] = False
+        self.group_count[g, d, units, self.s_channel[s]] -= 1
+        self.teacher_load[t, d] -= length
+        self.group_load[g, d] -= length
+        self.assignment_days[self.s_assignment[s], d] -= 1
+        c = self.s_course[s]
+        tracked = len(self.course_conflicts[c]) > 0
+        if tracked:
+            self.course_busy[c, d, units] -= 1
+        for u in units:
+            self.teacher_owner.pop((t, d, u), None)
+            self.room_owner.pop((room, d, u), None)
+            for owner_map, key in ((self.group_owner, (g, d, u)), (self.course_owner, (c, d, u))):
+                owners = owner_map.get(key)
+                if owners:
+                    owners.discard(s)
+                    if not owners:
+                        del owner_map[key]
+        self.placement[s] = None
+
+    def warm_start(self, placements, pin=False):
+        """
+        Start from earlier placements, (session_index, day, [slot_id, ...], room_id) as in
+        SolverResult. A placement is kept only if it still satisfies every hard constraint
+        given the ones kept before it; pinned placements are never moved by the search.
+        Returns the indices of the sessions kept.
+        """
+        by_periods = {(tuple(tpl['periods']), tpl['length']): t for t, tpl in enumerate(self.templates)}
+        kept = []
+        for s, day, slot_ids, room_id in placements:
+            if self.placement[s] is not None:
+                continue
+            periods = tuple(self.slot_index.get(slot_id, -1) for slot_id in slot_ids)
+            tpl_index = by_periods.get((periods, int(self.s_length[s])))
+            d = self.day_index.get(day)
+            room = self.room_index.get(room_id)
+            if tpl_index is None or d is None or room is None or (d, tpl_index) not in self.candidates[s]:
+                continue
+            if not self.room_masks[s][room] or self.room_busy[room, d, self.templates[tpl_index]['units']].any():
+                continue
+            if self._feasible(s, d, tpl_index) is None:
+                continue
+            self._place(s, d, tpl_index, room)
+            if pin:
+                self.pinned.add(s)
+            kept.append(s)
+        return kept
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _best_placement(self, s, noise=0.05):
+        best, best_cost = None, None
+        for d, tpl_index in self.candidates[s]:
+            room = self._feasible(s, d, tpl_index)
+            if room is None:
+                continue
+            cost = self._cost(s, d, tpl_index, room) + self.rng.random() * noise
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (d, tpl_index, room), cost
+        return best, best_cost
+
+    def _blockers(self, s, d, tpl_index):
+        """Sessions that would have to move for s to take this cell (ignores rooms)"""
+        units = self.templates[tpl_index]['units']
+        t, g = self.s_teacher[s], self.s_group[s]
+        blockers = set()
+        for u in units:
+            owner = self.teacher_owner.get((t, d, u))
+            if owner is not None:
+                blockers.add(owner)
+            if self.options.enable_student_conflicts:
+                for other in self.group_owner.get((g, d, u), ()):
+                    same_channel = self.s_channel[other] == self.s_channel[s]
+                    if same_channel and (self.s_channel[s] != CHANNELS['NE'] or
+                                         self.s_course[other] == self.s_course[s]):
+                        continue
+                    blockers.add(other)
+                for c in self.course_conflicts[self.s_course[s]]:
+                    blockers.update(self.course_owner.get((c, d, u), ()))
+        return blockers
+
+    def _room_blockers(self, s, d, tpl_index):
+        """Cheapest compatible room and the sessions occupying it"""
+        units = self.templates[tpl_index]['units']
+        best = None
+        for room in np.flatnonzero(self.room_masks[s]):
+            # Cells taken by fixed entries have no owner and cannot be freed
+            if any(self.room_busy[room, d, u] and (room, d, u) not in self.room_owner for u in units):
+                continue
+            owners = {self.room_owner[(room, d, u)] for u in units if (room, d, u) in self.room_owner}
+            if best is None or len(owners) < len(best[1]):
+                best = (int(room), owners)
+                if not owners:
+                    break
+        return best
+
+    def _eject_into(self, s, tabu, iteration):
+        options = []
+        for d, tpl_index in self.candidates[s]:
+            blockers = self._blockers(s, d, tpl_index)
+            if any(tabu.get(b, -1) > iteration or b in self.pinned for b in blockers):
+                continue
+            options.append((len(blockers) + self.rng.random(), d, tpl_index, blockers))
+        options.sort(key=lambda o: o[0])
+
+        for _, d, tpl_index, blockers in options[:8]:
+            saved = {}
+            for b in blockers:
+                saved[b] = self.placement[b]
+                self._remove(b)
+            room_choice = self._room_blockers(s, d, tpl_index)
+            evicted = set(blockers)
+            if room_choice is not None:
+                room, room_owners = room_choice
+                if any(tabu.get(b, -1) > iteration or b in self.pinned for b in room_owners):
+                    room_choice = None
+                else:
+                    for b in room_owners:
+                        saved[b] = self.placement[b]
+                        self._remove(b)
+                    evicted |= room_owners
+            if room_choice is not None and self._feasible(s, d, tpl_index) is not None:
+                self._place(s, d, tpl_index, room_choice[0])
+                return evicted
+            # Roll back: put every evicted session back where it was
+            for b, placed in saved.items():
+                self._place(b, *placed)
+        return None
+
+    def solve(self, deadline=None):
+        started = time.monotonic()
+        timeout = self.options.timeout
+        if deadline is None:
+            deadline = started + (timeout if timeout and timeout > 0 else 600)
+        n = len(self.problem.sessions)
+
+        # Most constrained first: fewest candidate cells, longest blocks, biggest classes
+        order = sorted(range(n), key=lambda s: (
+            len(self.candidates[s]), -int(self.s_length[s]), -int(self.s_students[s]), self.rng.random()
+        ))
+        queue = deque(order)
+        tabu = {}
+        iteration = 0
+        ejections = 0
+        max_ejections = 50 * max(n, 1)
+        rounds = 0
+
+        while True:
+            while queue and time.monotonic() < deadline:
+                iteration += 1
+                s = queue.popleft()
+                if self.placement[s] is not None:
+                    continue
+                best, _ = self._best_placement(s, noise=self.options.noise)
+                if best is not None:
+                    self._place(s, *best)
+                    continue
+                if ejections >= max_ejections or not self.candidates[s]:
+                    continue
+                evicted = self._eject_into(s, tabu, iteration)
+                if evicted is None:
+                    continue
+                ejections += len(evicted)
+                tabu[s] = iteration + 10 + self.rng.randint(0, 10)
+                queue.extend(evicted)
+
+            # Give sessions that got stuck another go with a fresh tabu list
+            stuck = [s for s in range(n) if self.placement[s] is None and self.candidates[s]]
+            rounds += 1
+            if not stuck or rounds >= REPAIR_ROUNDS or ejections >= max_ejections \
+                    or time.monotonic() >= deadline:
+                break
+            self.rng.shuffle(stuck)
+            queue = deque(stuck)
+            tabu = {}
+
+        construction_time = time.monotonic() - started
+        improved = self._improve(deadline)
+        unplaced = [s for s in range(n) if self.placement[s] is None]
+        soft = self.soft_cost()
+        score = UNPLACED_PENALTY * len(unplaced) + soft
+
+        placements = []
+        for s in range(n):
+            if self.placement[s] is None:
+                continue
+            d, tpl_index, room = self.placement[s]
+            slot_ids = [self.periods[p]['id'] for p in self.templates[tpl_index]['periods']]
+            placements.append((s, WORKING_DAYS[d], slot_ids, self.room_ids[room]))
+
+        stats = {
+            'seed': self.seed,
+            'sessions': n,
+            'placed': n - len(unplaced),
+            'unplaced': len(unplaced),
+            'ejections': ejections,
+            'improving_moves': improved,
+            'soft_cost': round(soft, 2),
+            'construction_seconds': round(construction_time, 3),
+            'wall_seconds': round(time.monotonic() - started, 3),
+        }
+        logger.info(f"Solver seed {self.seed}: placed {stats['placed']}/{n}, score {score:.2f}")
+        return SolverResult(placements, unplaced, score, stats)
+
+    def _improve(self, deadline):
+        """Move single sessions to cheaper cells until no pass improves the cost"""
+        moves = 0
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            order = [s for s in range(len(self.placement)) if self.placement[s] is not None and s not in self.pinned]
+            self.rng.shuffle(order)
+            for s in order:
+                if time.monotonic() >= deadline:
+                    break
+                current = self.placement[s]
+                self._remove(s)
+                current_cost = self._cost(s, *current)
+                best, best_cost = self._best_placement(s, noise=0)
+                if best is not None and best_cost < current_cost - 1e-6:
+                    self._place(s, *best)
+                    moves += 1
+                    improved = True
+                else:
+                    self._place(s, *current)
+        return moves
+
+    def soft_cost(self):
+        total = 0.0
+        for s, placed in enumerate(self.placement):
+            if placed is None:
+                continue
+            self._remove(s)
+            total += self._cost(s, *placed)
+            self._place(s, *placed)
+        return total
+
+
+def solve(problem, options=None, seed=0, deadline=None):
+    """Convenience wrapper: build a solver and run it once"""
+    return TimetableSolver(problem, options, seed=seed).solve(deadline=deadline)
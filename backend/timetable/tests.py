@@ -1,3 +1,193 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from authentication.models import User
+from course.models import Course
+from courseMaster.models import CourseMaster
+from department.models import Department
+from rooms.models import Room
+from slot.models import Slot
+from teacher.models import Teacher
+from teacherCourse.models import TeacherCourse
+
+from . import jobs, occupancy
+from .models import Timetable, TimetableGenerationConfig
+from .services import TimetableGenerationService
+from .snapshot import ProblemSnapshot
+from .solver import TimetableSolver
+from .versions import create_version, restore_version
+
+
+class SectionFixture:
+    """One course section, three consecutive slots and a room"""
+
+    def setUp(self):
+        dept = Department.objects.create(dept_name='CSE')
+        user = User.objects.create(email='t1@example.com', first_name='T', last_name='One', user_type='teacher',
+                                   password='x')
+        teacher = Teacher.objects.create(teacher_id=user, dept_id=dept, teacher_working_hours=30)
+        master = CourseMaster.objects.create(course_id='CS101', course_name='Programming', course_dept_id=dept,
+                                             lecture_hours=3, tutorial_hours=0, practical_hours=0, course_type='T')
+        course = Course.objects.create(course_id=master, course_year=1, course_semester=1, for_dept_id=dept,
+                                       teaching_dept_id=dept, elective_type='NE')
+        self.assignment = TeacherCourse.objects.create(teacher_id=teacher, course_id=course, student_count=60)
+        self.slots = [Slot.objects.create(slot_name=f'A{i}', slot_type='A', slot_start_time=time(8 + i),
+                                          slot_end_time=time(8 + i, 50)) for i in range(3)]
+        self.room = Room.objects.create(room_number='R1', block='X', is_lab=False, room_type='Class-Room',
+                                        room_max_cap=60)
+
+    def entry(self, day, slot):
+        return Timetable.objects.create(day_of_week=day, slot=slot, room=self.room,
+                                        course_assignment=self.assignment, session_type='Lecture',
+                                        start_date=date(2026, 1, 5))
+
+
+class RestoreVersionTests(SectionFixture, TestCase):
+    def test_rollback_when_kept_entries_share_slot_and_room_now_but_not_in_version(self):
+        # Both entries sat on Wednesday in the version, in different slots of the
+        # same room; now they share a slot and room on Monday and Tuesday
+        first, second = self.entry(2, self.slots[1]), self.entry(2, self.slots[2])
+        version = create_version('Wednesday')
+        Timetable.objects.filter(id=first.id).update(day_of_week=0, slot=self.slots[0])
+        Timetable.objects.filter(id=second.id).update(day_of_week=1, slot=self.slots[0])
+
+        backup, restored, created, deleted, skipped = restore_version(version)
+
+        self.assertEqual((restored, created, deleted, skipped), (2, 0, 0, 0))
+        self.assertEqual(
+            sorted(Timetable.objects.values_list('id', 'day_of_week', 'slot_id')),
+            sorted([(first.id, 2, self.slots[1].id), (second.id, 2, self.slots[2].id)]),
+        )
+        self.assertEqual(backup.source, 'rollback')
+
+
+class WarmStartSeedTests(SectionFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry(0, self.slots[0])
+        self.version = create_version('Earlier')
+        self.config = TimetableGenerationConfig.objects.create(
+            name='Seeded', created_by=self.assignment.teacher_id.teacher_id, solver_timeout=10
+        )
+
+    def enqueue(self):
+        with self.settings(TIMETABLE_GENERATION_IN_PROCESS=False):
+            return jobs.enqueue_generation(self.config, warm_start_version=self.version)
+
+    def seed(self):
+        return TimetableGenerationConfig.objects.get(id=self.config.id).warm_start_version_id
+
+    def test_refused_enqueue_stores_no_seed(self):
+        TimetableGenerationConfig.objects.filter(id=self.config.id).update(
+            generation_status='running', progress_updated_at=timezone.now()
+        )
+
+        self.assertFalse(self.enqueue())
+        self.assertIsNone(self.seed())
+
+    def test_seed_is_used_once_and_cleared(self):
+        self.assertTrue(self.enqueue())
+        self.assertEqual(self.seed(), self.version.id)
+
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+
+        config = TimetableGenerationConfig.objects.get(id=self.config.id)
+        self.assertEqual(config.generation_status, 'completed')
+        self.assertIn(f"Warm start from version {self.version.id}", config.generation_log)
+        self.assertIsNone(config.warm_start_version_id)
+
+    def test_seed_is_cleared_when_generation_fails(self):
+        self.assertTrue(self.enqueue())
+
+        with mock.patch.object(TimetableGenerationService, 'build_problem', side_effect=RuntimeError("boom")):
+            self.assertEqual(jobs.run_pending_jobs(), 1)
+
+        config = TimetableGenerationConfig.objects.get(id=self.config.id)
+        self.assertEqual(config.generation_status, 'failed')
+        self.assertIsNone(config.warm_start_version_id)
+
+
+class OccupancyIndexCommitTests(SectionFixture, TransactionTestCase):
+    def test_index_built_before_commit_is_not_served_after_it(self):
+        stale = occupancy.get_occupancy_index()
+        with transaction.atomic():
+            self.entry(0, self.slots[0])
+            # A concurrent reader caching what it saw before the commit
+            occupancy._state.update(index=stale, version=occupancy._current_version())
+
+        index = occupancy.get_occupancy_index()
+        self.assertIsNot(index, stale)
+        self.assertTrue(index.is_room_busy(self.room.id, 0, self.slots[0].id))
+
+    def test_rolled_back_write_does_not_bump_the_shared_version(self):
+        version = occupancy._current_version()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.entry(0, self.slots[0])
+            raise RuntimeError
+
+        self.assertEqual(occupancy._current_version(), version)
+
+
+class SolverDefaultSlotTests(TestCase):
+    """The solver on the three division windows the slot initialize view creates"""
+
+    def setUp(self):
+        for slot_type, start, end in [('A', '08:00:00', '15:00:00'), ('B', '10:00:00', '17:00:00'),
+                                      ('C', '12:00:00', '19:00:00')]:
+            Slot.objects.create(slot_name=f'Slot {slot_type}', slot_type=slot_type, slot_start_time=start,
+                                slot_end_time=end)
+        Room.objects.create(room_number='R1', block='X', is_lab=False, room_type='Class-Room', room_max_cap=60)
+        Room.objects.create(room_number='L1', block='Y', is_lab=True, room_type='Computer-Lab', room_max_cap=60)
+        dept = Department.objects.create(dept_name='CSE')
+        user = User.objects.create(email='t1@example.com', first_name='T', last_name='One', user_type='teacher',
+                                   password='x')
+        teacher = Teacher.objects.create(teacher_id=user, dept_id=dept, teacher_working_hours=30)
+        master = CourseMaster.objects.create(course_id='CS102', course_name='Data Structures', course_dept_id=dept,
+                                             lecture_hours=2, tutorial_hours=0, practical_hours=2, course_type='LoT')
+        course = Course.objects.create(course_id=master, course_year=1, course_semester=1, for_dept_id=dept,
+                                       teaching_dept_id=dept, elective_type='NE')
+        TeacherCourse.objects.create(teacher_id=teacher, course_id=course, student_count=60)
+        self.config = TimetableGenerationConfig.objects.create(name='C division', created_by=user,
+                                                               division_assignment='C', solver_timeout=10)
+
+    def test_places_labs_and_slot_c_sessions_with_lunch_breaks_on(self):
+        snapshot = ProblemSnapshot.from_db(self.config)
+        problem = snapshot.to_problem()
+        result = TimetableSolver(problem, snapshot.solver_options()).solve()
+
+        self.assertTrue(self.config.enable_lunch_breaks)
+        self.assertEqual(result.unplaced, [])
+        slot_c = Slot.objects.get(slot_type='C').id
+        placed = {problem.sessions[s]['session_type']: slot_ids for s, _, slot_ids, _ in result.placements}
+        self.assertEqual(placed, {'Lecture': [slot_c], 'Lab': [slot_c]})
+
+
+class GenerationJobLeaseTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(email='admin@example.com', first_name='A', last_name='Admin', user_type='teacher',
+                                   password='x')
+        self.config = TimetableGenerationConfig.objects.create(name='Lease', created_by=user)
+
+    def set_running(self, seconds_ago):
+        TimetableGenerationConfig.objects.filter(id=self.config.id).update(
+            generation_status='running', progress_updated_at=timezone.now() - timedelta(seconds=seconds_ago)
+        )
+
+    def test_job_with_fresh_heartbeat_is_not_reclaimed(self):
+        self.set_running(jobs.HEARTBEAT_SECONDS)
+
+        self.assertIsNone(jobs.claim_next_job())
+        with self.settings(TIMETABLE_GENERATION_IN_PROCESS=False):
+            self.assertFalse(jobs.enqueue_generation(self.config))
+
+    def test_stale_job_is_reclaimed_once(self):
+        self.set_running(jobs.STALE_SECONDS + 60)
+
+        self.assertEqual(jobs.claim_next_job(), self.config.id)
+        self.assertIsNone(jobs.claim_next_job())
+        config = TimetableGenerationConfig.objects.get(id=self.config.id)
+        self.assertEqual((config.generation_status, config.generation_phase), ('running', 'starting'))
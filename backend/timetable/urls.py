@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TimetableViewSet, TimetableChangeViewSet, TimetableGenerationViewSet
+from .views import TimetableViewSet, TimetableChangeViewSet, TimetableGenerationViewSet, TimetableVersionViewSet
 
 router = DefaultRouter()
 router.register(r'timetables', TimetableViewSet)
 router.register(r'timetable-changes', TimetableChangeViewSet)
 router.register(r'timetable-generation', TimetableGenerationViewSet)
+router.register(r'timetable-versions', TimetableVersionViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,272 @@
+"""
+Named, immutable timetable versions.
+
+A TimetableVersion stores the whole Timetable table as integer columns in a
+compressed .npz blob (one element per entry), so taking a version is one
+values_list query and one INSERT, and comparing or restoring versions never
+joins through the ORM.
+
+Diffs match sessions by sorted integer keys:
+    - an entry is unchanged when the other side has the same course section,
+      session type, day, slot and room (the k-th copy matches the k-th copy)
+    - the remaining entries of one section and session type are paired up in
+      (day, slot, room) order and reported as moved
+    - whatever is left over was added or removed
+"""
+import hashlib
+import io
+import logging
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+
+from .models import Timetable, TimetableVersion
+from .occupancy import invalidate_occupancy_index
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['entry', 'day', 'slot', 'room', 'assignment', 'teacher', 'course', 'session_type',
+           'is_recurring', 'start_date', 'end_date']
+SESSION_TYPES = [choice for choice, _ in Timetable.SESSION_TYPE_CHOICES]
+
+# Rows being restored are parked on their current day + PARK_OFFSET first, so the
+# (day_of_week, slot, room) unique constraint holds after every statement
+PARK_OFFSET = 100
+DELETE_BATCH = 500
+
+
+def capture(entries=None):
+    """The current Timetable rows as a dict of column arrays, ordered by entry id"""
+    if entries is None:
+        entries = Timetable.objects.all()
+    rows = list(entries.order_by('id').values_list(
+        'id', 'day_of_week', 'slot_id', 'room_id', 'course_assignment_id', 'course_assignment__teacher_id',
+        'course_assignment__course_id', 'session_type', 'is_recurring', 'start_date', 'end_date',
+    ))
+
+    def column(i, missing=-1):
+        return np.array([missing if row[i] is None else row[i] for row in rows], dtype=np.int64)
+
+    return {
+        'entry': column(0), 'day': column(1), 'slot': column(2), 'room': column(3), 'assignment': column(4),
+        'teacher': column(5), 'course': column(6),
+        'session_type': np.array([SESSION_TYPES.index(row[7]) if row[7] in SESSION_TYPES else 0 for row in rows],
+                                 dtype=np.int64),
+        'is_recurring': np.array([bool(row[8]) for row in rows], dtype=bool),
+        'start_date': np.array([row[9].toordinal() for row in rows], dtype=np.int64),
+        'end_date': np.array([row[10].toordinal() if row[10] else -1 for row in rows], dtype=np.int64),
+    }
+
+
+def pack(arrays):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{name: arrays[name] for name in COLUMNS})
+    return buffer.getvalue()
+
+
+def unpack(data):
+    with np.load(io.BytesIO(bytes(data))) as blob:
+        return {name: blob[name] for name in COLUMNS}
+
+
+def checksum(arrays):
+    digest = hashlib.sha256()
+    for name in COLUMNS:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+
+def create_version(name, config=None, user=None, source='manual', note='', arrays=None):
+    """Store the current timetable (or the given arrays) as a new version"""
+    if arrays is None:
+        arrays = capture()
+    version = TimetableVersion.objects.create(
+        name=name,
+        config=config,
+        created_by=user,
+        source=source,
+        note=note,
+        entry_count=len(arrays['entry']),
+        checksum=checksum(arrays),
+        data=pack(arrays),
+    )
+    logger.info(f"Saved timetable version {version.id} '{name}' with {version.entry_count} entries")
+    return version
+
+
+def latest_generated_version(config):
+    """The most recent version saved by a generation run of the config, or None"""
+    return TimetableVersion.objects.filter(config=config, source='generation').order_by('-created_at', '-id').first()
+
+
+def version_arrays(version):
+    return unpack(version.data)
+
+
+def _dense(*columns):
+    """Dense integer code per row of the given equal-length columns, in lexicographic row order"""
+    if not len(columns[0]):
+        return np.zeros(0, dtype=np.int64)
+    _, codes = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+    return codes.reshape(-1).astype(np.int64)
+
+
+def _occurrence(codes, order):
+    """Rank of every row among the rows with the same code, counted in `order` order"""
+    n = len(codes)
+    ranks = np.zeros(n, dtype=np.int64)
+    if not n:
+        return ranks
+    sorted_rows = np.lexsort((order, codes))
+    sorted_codes = codes[sorted_rows]
+    run_start = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    first = np.maximum.accumulate(np.where(run_start, np.arange(n), 0))
+    ranks[sorted_rows] = np.arange(n) - first
+    return ranks
+
+
+def _placement(arrays, i):
+    return {'day_of_week': int(arrays['day'][i]), 'slot_id': int(arrays['slot'][i]), 'room_id': int(arrays['room'][i])}
+
+
+def _session(arrays, i):
+    return {
+        'entry_id': int(arrays['entry'][i]),
+        'assignment_id': int(arrays['assignment'][i]),
+        'teacher_id': int(arrays['teacher'][i]) if arrays['teacher'][i] >= 0 else None,
+        'course_id': int(arrays['course'][i]) if arrays['course'][i] >= 0 else None,
+        'session_type': SESSION_TYPES[int(arrays['session_type'][i])],
+    }
+
+
+def diff(old, new):
+    """
+    Compare two capture()-style column dicts. Returns (unchanged, moved, added, removed):
+    unchanged is a count, moved a list of (old_index, new_index), added and removed index arrays.
+    """
+    n_old, n_new = len(old['entry']), len(new['entry'])
+    both = {name: np.concatenate([old[name], new[name]]) for name in ('assignment', 'session_type', 'day', 'slot', 'room')}
+    identity = _dense(both['assignment'], both['session_type'])
+    placement = _dense(identity, both['day'], both['slot'], both['room'])
+    span = n_old + n_new + 1
+
+    # Same session, same place
+    old_key = placement[:n_old] * span + _occurrence(placement[:n_old], np.arange(n_old))
+    new_key = placement[n_old:] * span + _occurrence(placement[n_old:], np.arange(n_new))
+    kept_old = np.isin(old_key, new_key)
+    kept_new = np.isin(new_key, old_key)
+
+    # Same session, another place: pair the leftovers of each session in placement order
+    old_rest, new_rest = np.flatnonzero(~kept_old), np.flatnonzero(~kept_new)
+    old_identity, new_identity = identity[:n_old][old_rest], identity[n_old:][new_rest]
+    old_pair = old_identity * span + _occurrence(old_identity, placement[:n_old][old_rest])
+    new_pair = new_identity * span + _occurrence(new_identity, placement[n_old:][new_rest])
+    _, old_at, new_at = np.intersect1d(old_pair, new_pair, assume_unique=True, return_indices=True)
+    moved = list(zip(old_rest[old_at].tolist(), new_rest[new_at].tolist()))
+
+    removed = np.setdiff1d(old_rest, old_rest[old_at])
+    added = np.setdiff1d(new_rest, new_rest[new_at])
+    return int(kept_old.sum()), moved, added, removed
+
+
+def diff_report(old, new, teacher_id=None, room_id=None, assignment_id=None):
+    """diff() as JSON-ready lists plus per-teacher, per-room and per-section counts"""
+    unchanged, moved, added, removed = diff(old, new)
+
+    def wanted(arrays, i, rooms):
+        return ((teacher_id is None or arrays['teacher'][i] == teacher_id)
+                and (room_id is None or room_id in rooms)
+                and (assignment_id is None or arrays['assignment'][i] == assignment_id))
+
+    report = {'unchanged': unchanged, 'moved': [], 'added': [], 'removed': []}
+    by_teacher, by_room, by_section = {}, {}, {}
+
+    def count(kind, arrays, i, extra_room=None):
+        for summary, key in ((by_teacher, int(arrays['teacher'][i])), (by_section, int(arrays['assignment'][i]))):
+            summary.setdefault(key, {'moved': 0, 'added': 0, 'removed': 0})[kind] += 1
+        for room in {int(arrays['room'][i]), extra_room} - {None}:
+            by_room.setdefault(room, {'moved': 0, 'added': 0, 'removed': 0})[kind] += 1
+
+    for i, j in moved:
+        if not wanted(new, j, {int(new['room'][j]), int(old['room'][i])}):
+            continue
+        report['moved'].append(dict(_session(new, j), old_entry_id=int(old['entry'][i]),
+                                    **{'from': _placement(old, i), 'to': _placement(new, j)}))
+        count('moved', new, j, extra_room=int(old['room'][i]))
+    for j in added.tolist():
+        if wanted(new, j, {int(new['room'][j])}):
+            report['added'].append(dict(_session(new, j), to=_placement(new, j)))
+            count('added', new, j)
+    for i in removed.tolist():
+        if wanted(old, i, {int(old['room'][i])}):
+            report['removed'].append(dict(_session(old, i), **{'from': _placement(old, i)}))
+            count('removed', old, i)
+
+    report['by_teacher'] = by_teacher
+    report['by_room'] = by_room
+    report['by_section'] = by_section
+    return report
+
+
+def _entry(arrays, i, keep_id):
+    end_date = int(arrays['end_date'][i])
+    return Timetable(
+        id=int(arrays['entry'][i]) if keep_id else None,
+        day_of_week=int(arrays['day'][i]),
+        slot_id=int(arrays['slot'][i]),
+        room_id=int(arrays['room'][i]),
+        course_assignment_id=int(arrays['assignment'][i]),
+        session_type=SESSION_TYPES[int(arrays['session_type'][i])],
+        is_recurring=bool(arrays['is_recurring'][i]),
+        start_date=date.fromordinal(int(arrays['start_date'][i])),
+        end_date=date.fromordinal(end_date) if end_date > 0 else None,
+    )
+
+
+def restore_version(version, user=None):
+    """
+    Make the Timetable table match a version again, in one transaction. The current
+    state is saved as a 'rollback' version first so the rollback itself can be undone.
+    Entries whose section, slot or room no longer exists are skipped.
+    Returns (backup_version, restored, created, deleted, skipped).
+    """
+    from rooms.models import Room
+    from slot.models import Slot
+    from teacherCourse.models import TeacherCourse
+
+    target = unpack(version.data)
+    with transaction.atomic():
+        current = capture()
+        backup = create_version(f"Before rollback to {version.name}", config=version.config, user=user,
+                                source='rollback', arrays=current)
+
+        valid = (np.isin(target['assignment'], list(TeacherCourse.objects.values_list('id', flat=True)))
+                 & np.isin(target['slot'], list(Slot.objects.values_list('id', flat=True)))
+                 & np.isin(target['room'], list(Room.objects.values_list('id', flat=True))))
+        skipped = int((~valid).sum())
+        rows = np.flatnonzero(valid)
+        existing = np.isin(target['entry'][rows], current['entry'])
+        keep, create = rows[existing], rows[~existing]
+
+        stale = np.setdiff1d(current['entry'], target['entry'][keep]).tolist()
+        for start in range(0, len(stale), DELETE_BATCH):
+            Timetable.objects.filter(id__in=stale[start:start + DELETE_BATCH]).delete()
+
+        fields = ['day_of_week', 'slot_id', 'room_id', 'course_assignment_id', 'session_type', 'is_recurring',
+                  'start_date', 'end_date']
+        # Park from the current day: current (day, slot, room) triples are unique,
+        # target days combined with current slots and rooms need not be
+        current_day = dict(zip(current['entry'].tolist(), current['day'].tolist()))
+        parked = [Timetable(id=int(target['entry'][i]), day_of_week=current_day[int(target['entry'][i])] + PARK_OFFSET)
+                  for i in keep]
+        Timetable.objects.bulk_update(parked, ['day_of_week'], batch_size=1000)
+        entries = [_entry(target, i, keep_id=True) for i in keep]
+        Timetable.objects.bulk_update(entries, fields, batch_size=1000)
+
+        Timetable.objects.bulk_create([_entry(target, i, keep_id=False) for i in create], batch_size=1000)
+    # bulk operations send no post_save signals
+    invalidate_occupancy_index()
+    logger.info(f"Rolled back timetable to version {version.id}: {len(keep)} restored, {len(create)} recreated, "
+                f"{len(stale)} deleted, {skipped} skipped")
+    return backup, len(keep), len(create), len(stale), skipped
@@ -4,14 +4,23 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from datetime import date
 
-from .models import Timetable, TimetableChange, TimetableGenerationConfig
+from .models import Timetable, TimetableChange, TimetableGenerationConfig, TimetableVersion
 from .serializers import (
     TimetableSerializer, TimetableWriteSerializer, 
-    TimetableChangeSerializer, TimetableGenerationConfigSerializer
+    TimetableChangeSerializer, TimetableGenerationConfigSerializer, TimetableVersionSerializer
 )
-from .services import TimetableGenerationService
+from .conflicts import ConflictScanner, CONFLICT_TYPES, summarize
+from .coenrollment import CoEnrollmentMatrix, MIN_SHARED_STUDENTS, scheduled_overlaps
+from .effective import effective_schedule
+from .jobs import enqueue_generation
+from .occupancy import get_occupancy_index
+from .quality import TimetableQuality
+from .repair import TimetableRepairService, RepairError
+from .room_assignment import reassign_timetable
+from .versions import create_version, capture, latest_generated_version, version_arrays, diff_report, restore_version
 from teacherCourse.models import TeacherCourse
 from slot.models import Slot
 from rooms.models import Room
@@ -111,14 +120,131 @@ class TimetableViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if timetable entry exists
-        is_booked = Timetable.objects.filter(
-            room_id=room_id,
-            slot_id=slot_id,
-            day_of_week=day_of_week
-        ).exists()
+        try:
+            room_id, slot_id, day_of_week = int(room_id), int(slot_id), int(day_of_week)
+        except ValueError:
+            return Response(
+                {"error": "room_id, slot_id, and day_of_week must be valid integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        is_booked = get_occupancy_index().is_room_busy(room_id, day_of_week, slot_id)
         
         return Response({"is_available": not is_booked})
+    
+    @action(detail=False, methods=['post'])
+    def assign_rooms(self, request):
+        """Re-pick rooms for the whole timetable by capacity, lab and room preference fit"""
+        dry_run = str(request.data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('1', 'true')
+        moves = reassign_timetable(dry_run=dry_run)
+        return Response({
+            "dry_run": dry_run,
+            "moved_entries": len(moves),
+            "moves": [
+                {"timetable_id": entry_id, "old_room_id": old_room, "new_room_id": new_room}
+                for entry_id, old_room, new_room in moves
+            ]
+        })
+    
+    @action(detail=False, methods=['get'])
+    def effective(self, request):
+        """What actually happens on a date (?date=) or date range (?start=&end=), with approved changes applied"""
+        try:
+            start = date.fromisoformat(request.query_params.get('start') or request.query_params['date'])
+            end = date.fromisoformat(request.query_params.get('end') or start.isoformat())
+            filters = {
+                name: int(request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('teacher_id', 'room_id', 'assignment_id', 'dept_id')
+            }
+        except KeyError:
+            return Response({"error": "date or start parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response(
+                {"error": "Dates must be YYYY-MM-DD and teacher_id, room_id, assignment_id, dept_id integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            days = effective_schedule(start, end, **filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            "start": start,
+            "end": end,
+            "days": [
+                {"date": day, "day_of_week": day.weekday(), "entries": entries}
+                for day, entries in days
+            ]
+        })
+    
+    @action(detail=False, methods=['get'])
+    def quality(self, request):
+        """Score the stored timetable: teacher gaps and load, room fit, lab adjacency, slot balance, clashes"""
+        max_slots = 5
+        config_id = request.query_params.get('config_id')
+        if config_id:
+            config = get_object_or_404(TimetableGenerationConfig, id=config_id)
+            max_slots = config.max_teacher_slots_per_day
+        
+        entries = Timetable.objects.all()
+        dept_id = request.query_params.get('dept_id')
+        if dept_id:
+            entries = entries.filter(course_assignment__course_id__for_dept_id=dept_id)
+        
+        report = TimetableQuality.from_db(entries, max_teacher_slots_per_day=max_slots).report()
+        return Response(report)
+    
+    @action(detail=False, methods=['get'])
+    def co_enrollment(self, request):
+        """Course pairs that share students, grouped by department, year and semester"""
+        try:
+            filters = {
+                name: int(request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('dept_id', 'year', 'semester')
+            }
+            min_students = int(request.query_params.get('min_students', MIN_SHARED_STUDENTS))
+        except ValueError:
+            return Response(
+                {"error": "dept_id, year, semester and min_students must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        matrix = CoEnrollmentMatrix.from_db()
+        pairs = matrix.pairs(min_students)
+        section_courses = dict(TeacherCourse.objects.values_list('id', 'course_id'))
+        overlapping = scheduled_overlaps(pairs, get_occupancy_index(), section_courses)
+        groups = matrix.report(min_students, overlapping=overlapping, **filters)
+        return Response({
+            "min_students": min_students,
+            "conflicting_pairs": len(pairs),
+            "scheduled_clashes": len(overlapping),
+            "groups": groups,
+        })
+
+    
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """Scan the whole stored timetable for teacher, room, section, student group and slot rule conflicts"""
+        types = request.query_params.get('types')
+        types = [t.strip() for t in types.split(',') if t.strip()] if types else CONFLICT_TYPES
+        unknown = [t for t in types if t not in CONFLICT_TYPES]
+        if unknown:
+            return Response(
+                {"error": f"Unknown conflict types: {', '.join(unknown)}. Choose from {', '.join(CONFLICT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 500))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        conflicts = ConflictScanner.from_db().scan(types)
+        return Response({
+            "total": len(conflicts),
+            "counts": summarize(conflicts),
+            "conflicts": conflicts[:max(limit, 0)],
+        })
 
 
 class TimetableChangeViewSet(viewsets.ModelViewSet):
@@ -166,7 +292,7 @@ class TimetableChangeViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
-        """Approve a timetable change request"""
+        """Approve a timetable change request and move the entries it displaces"""
         timetable_change = self.get_object()
         if timetable_change.status != 'Pending':
             return Response(
@@ -174,9 +300,29 @@ class TimetableChangeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        timetable_change.status = 'Approved'
-        timetable_change.save()
-        return Response({"status": "approved"})
+        try:
+            with transaction.atomic():
+                timetable_change.status = 'Approved'
+                timetable_change.save()
+                repairs = TimetableRepairService(timetable_change).repair(request.user)
+        except RepairError as e:
+            return Response(
+                {"error": str(e), "unresolved_entries": e.unresolved},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({
+            "status": "approved",
+            "moved_entries": [
+                {
+                    "timetable_id": change.original_timetable_id,
+                    "day_of_week": change.new_day_of_week,
+                    "slot_id": change.new_slot_id,
+                    "room_id": change.new_room_id,
+                }
+                for change in repairs
+            ]
+        })
     
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
@@ -203,7 +349,7 @@ class TimetableGenerationViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def generate(self, request, pk=None):
-        """Generate timetable (currently disabled)"""
+        """Queue timetable generation as a background job; poll status or get_log for progress"""
         config = self.get_object()
         
         # Check if already generated
@@ -213,13 +359,28 @@ class TimetableGenerationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate timetable
-        service = TimetableGenerationService(config_id=pk)
-        success = service.generate_timetable()
+        # Optionally start from an earlier version, or the latest generated version of another config
+        warm_start = None
+        if request.data.get('warm_start_version'):
+            warm_start = get_object_or_404(TimetableVersion, id=request.data['warm_start_version'])
+        elif request.data.get('warm_start_config'):
+            source = get_object_or_404(TimetableGenerationConfig, id=request.data['warm_start_config'])
+            warm_start = latest_generated_version(source)
+            if warm_start is None:
+                return Response(
+                    {"error": "That configuration has no generated timetable version to start from"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if not enqueue_generation(config, warm_start_version=warm_start):
+            return Response(
+                {"error": "Timetable generation is already queued or running for this configuration"},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response(
-            {"status": "error", "message": "Timetable generation functionality is currently disabled.", "log": config.generation_log},
-            status=status.HTTP_501_NOT_IMPLEMENTED
+            {"status": "queued", "message": "Timetable generation has been queued.", "id": config.id},
+            status=status.HTTP_202_ACCEPTED
         )
     
     @action(detail=False, methods=['get'])
@@ -235,7 +396,12 @@ class TimetableGenerationViewSet(viewsets.ModelViewSet):
                 "is_generated": config.is_generated,
                 "created_at": config.created_at,
                 "generated_at": config.generation_completed_at,
-                "created_by": config.created_by.username
+                "created_by": config.created_by.username,
+                "generation_status": config.generation_status,
+                "phase": config.generation_phase,
+                "best_score": config.best_score,
+                "constraint_violations": config.constraint_violations,
+                "progress_updated_at": config.progress_updated_at
             })
         
         return Response(results)
@@ -252,5 +418,81 @@ class TimetableGenerationViewSet(viewsets.ModelViewSet):
             "created_at": config.created_at,
             "started_at": config.generation_started_at,
             "completed_at": config.generation_completed_at,
+            "generation_status": config.generation_status,
+            "phase": config.generation_phase,
+            "best_score": config.best_score,
+            "constraint_violations": config.constraint_violations,
+            "progress_updated_at": config.progress_updated_at,
             "log": config.generation_log
         })
+
+
+class TimetableVersionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Immutable timetable versions: take one, compare two, roll back to one"""
+    queryset = TimetableVersion.objects.defer('data')
+    serializer_class = TimetableVersionSerializer
+    
+    def get_queryset(self):
+        queryset = TimetableVersion.objects.defer('data')
+        config_id = self.request.query_params.get('config_id')
+        if config_id:
+            queryset = queryset.filter(config_id=config_id)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        """Save the current timetable as a new version"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        version = create_version(
+            serializer.validated_data['name'],
+            config=serializer.validated_data.get('config'),
+            user=request.user if request.user.is_authenticated else None,
+            note=serializer.validated_data.get('note', ''),
+        )
+        return Response(self.get_serializer(version).data, status=status.HTTP_201_CREATED)
+    
+    def _arrays(self, value):
+        if value == 'current':
+            return capture()
+        return version_arrays(get_object_or_404(TimetableVersion, id=value))
+    
+    @action(detail=False, methods=['get'])
+    def diff(self, request):
+        """Sessions moved, added and removed between two versions ("current" is the live timetable)"""
+        old, new = request.query_params.get('from'), request.query_params.get('to', 'current')
+        if not old:
+            return Response({"error": "from parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            filters = {
+                name: int(request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('teacher_id', 'room_id', 'assignment_id')
+            }
+            if old != 'current':
+                int(old)
+            if new != 'current':
+                int(new)
+        except ValueError:
+            return Response(
+                {"error": "from and to must be version ids or 'current'; filters must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        report = diff_report(self._arrays(old), self._arrays(new), **filters)
+        report.update({"from": old, "to": new})
+        return Response(report)
+    
+    @action(detail=True, methods=['post'])
+    def rollback(self, request, pk=None):
+        """Replace the live timetable with this version; the current one is saved as a version first"""
+        version = self.get_object()
+        user = request.user if request.user.is_authenticated else None
+        backup, restored, created, deleted, skipped = restore_version(version, user=user)
+        return Response({
+            "message": f"Timetable rolled back to version '{version.name}'",
+            "backup_version": self.get_serializer(backup).data,
+            "restored_entries": restored,
+            "recreated_entries": created,
+            "deleted_entries": deleted,
+            "skipped_entries": skipped,
+        })
@@ -0,0 +1,126 @@
+"""
+Warm-start generation from an earlier timetable version.
+
+Most of a timetable carries over between semesters. Instead of solving from
+scratch, the entries of a TimetableVersion are matched back to the sessions
+of the new problem by course section (TeacherCourse) and session type, and
+every placement that still satisfies the hard constraints is kept:
+
+    - the section still exists and still has the same teacher
+    - the room and slots still exist, the room still fits the session and the
+      day and slot type are still allowed for the teacher
+    - it does not clash with placements kept before it
+
+Kept placements are pinned and only the rest -- new sections, sessions of
+replaced teachers, sessions whose room or slot went away -- is solved. If
+some of those cannot be placed around the pinned ones, the pins of sessions
+sharing a teacher or student group with them are released and the search may
+move those too. Like the solver, this module never touches the ORM.
+"""
+import logging
+import time
+
+from .solver import TimetableSolver, MAX_CONSECUTIVE_GAP, MAX_PERIOD_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# Share of the time budget for solving around the pinned placements
+PINNED_BUDGET_SHARE = 0.5
+
+
+def _is_window(slot_id, slot_times):
+    start, end = slot_times[slot_id]
+    return end - start > MAX_PERIOD_MINUTES
+
+
+def _blocks(entries, slot_times):
+    """
+    Split the entries of one section, session type, day and room into runs of consecutive
+    slots; a division window is a block of its own
+    """
+    entries = sorted(entries, key=lambda slot_id: slot_times[slot_id][0])
+    blocks = []
+    for slot_id in entries:
+        if (blocks and not _is_window(slot_id, slot_times) and not _is_window(blocks[-1][-1], slot_times)
+                and slot_times[slot_id][0] - slot_times[blocks[-1][-1]][1] <= MAX_CONSECUTIVE_GAP):
+            blocks[-1].append(slot_id)
+        else:
+            blocks.append([slot_id])
+    return blocks
+
+
+def seed_placements(problem, arrays, session_types):
+    """
+    Placements for the problem's sessions taken from version arrays (see versions.capture),
+    as (session_index, day, [slot_id, ...], room_id). session_types maps the stored session
+    type codes back to names. Entries of another teacher than the session's are dropped.
+    """
+    slot_times = {s['id']: (s['start'], s['end']) for s in problem.slots}
+    runs = {}
+    for day, slot_id, room_id, assignment_id, teacher_id, code in zip(
+            arrays['day'].tolist(), arrays['slot'].tolist(), arrays['room'].tolist(),
+            arrays['assignment'].tolist(), arrays['teacher'].tolist(), arrays['session_type'].tolist()):
+        if slot_id in slot_times:
+            key = (assignment_id, session_types[code], teacher_id, day, room_id)
+            runs.setdefault(key, []).append(slot_id)
+
+    blocks = {}
+    for (assignment_id, session_type, teacher_id, day, room_id), slot_ids in sorted(runs.items()):
+        for block in _blocks(slot_ids, slot_times):
+            blocks.setdefault((assignment_id, session_type, teacher_id), []).append((day, block, room_id))
+
+    placements = []
+    for s, session in enumerate(problem.sessions):
+        available = blocks.get((session['assignment_id'], session['session_type'], session['teacher_id']))
+        if not available:
+            continue
+        # Longest blocks first, so a session never takes half of a block another one needs whole
+        available.sort(key=lambda b: -len(b[1]))
+        for i, (day, block, room_id) in enumerate(available):
+            # A window holds the whole session in one entry
+            needed = 1 if _is_window(block[0], slot_times) else session['length']
+            if len(block) >= needed:
+                placements.append((s, day, block[:needed], room_id))
+                rest = block[needed:]
+                if rest:
+                    available[i] = (day, rest, room_id)
+                else:
+                    available.pop(i)
+                break
+    return placements
+
+
+def solve_warm(problem, options, placements, seed=0):
+    """
+    Solve the problem starting from earlier placements; returns (SolverResult, kept)
+    where kept is how many earlier placements survived unchanged
+    """
+    started = time.monotonic()
+    budget = options.timeout if options.timeout and options.timeout > 0 else 600
+    deadline = started + budget
+
+    solver = TimetableSolver(problem, options, seed=seed)
+    kept = solver.warm_start(placements, pin=True)
+    kept_set = set(kept)
+    logger.info(f"Warm start kept {len(kept)} of {len(placements)} earlier placements; "
+                f"solving {len(problem.sessions) - len(kept)} sessions")
+
+    result = solver.solve(deadline=started + budget * PINNED_BUDGET_SHARE)
+    if result.unplaced and time.monotonic() < deadline:
+        # Let the search move the kept sessions sharing a teacher or student group with an
+        # unplaced one, to make room for it
+        teachers = {problem.sessions[s]['teacher_id'] for s in result.unplaced}
+        groups = {problem.sessions[s]['group'] for s in result.unplaced}
+        solver.pinned -= {s for s in kept if problem.sessions[s]['teacher_id'] in teachers
+                          or problem.sessions[s]['group'] in groups}
+        retry = solver.solve(deadline=deadline)
+        if (len(retry.unplaced), retry.score) < (len(result.unplaced), result.score):
+            result = retry
+
+    unchanged = {(s, day, tuple(slot_ids), room_id) for s, day, slot_ids, room_id in placements if s in kept_set}
+    still_kept = sum(1 for s, day, slot_ids, room_id in result.placements
+                     if (s, day, tuple(slot_ids), room_id) in unchanged)
+    result.stats['warm_start_kept'] = still_kept
+    result.stats['warm_start_seeded'] = len(placements)
+    result.stats['wall_seconds'] = round(time.monotonic() - started, 3)
+    return result, still_kept